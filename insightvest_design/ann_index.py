@@ -0,0 +1,112 @@
+# ann_index.py
+# FAISS 索引选项：flat（精确）/ ivf_flat / ivf_pq / hnsw（近似最近邻），通过 faiss.index_factory 构建
+# 查询参数 nprobe（IVF）/ efSearch（HNSW）/ k_factor（精排）记录在 manifest 中，加载时通过 ParameterSpace 设置
+#
+# ivf_pq 默认使用 4-bit fast-scan PQ（每个子空间 16 个中心）：训练比 8-bit PQ 快一个数量级以上，
+# 查询用 SIMD 查表；refine=True 时额外保存原始向量，对候选做精确重排（召回接近 flat，内存不再压缩）
+
+import math
+
+import faiss
+import numpy as np
+
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+DEFAULT_INDEX_TYPE = "flat"
+
+# === 默认参数 ===
+DEFAULT_NPROBE = 16
+DEFAULT_EF_SEARCH = 64
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 80
+PQ_BITS = 4                        # 4（fast-scan）或 8（经典 PQ，训练慢但单条编码更精确）
+REFINE_K_FACTOR = 16               # 精排时先取 k × 16 个候选
+TRAIN_POINTS_PER_LIST = 39         # faiss k-means 建议每个聚类至少 39 个训练点
+MAX_TRAIN_VECTORS = 262_144        # 超过时随机抽样训练
+# 向量数低于下限时 IVF 训练不充分，且 flat 本身已足够快：退回 flat
+MIN_VECTORS = {"ivf_flat": 16 * TRAIN_POINTS_PER_LIST, "ivf_pq": 10_000}
+
+
+def needs_training(index_type):
+    return index_type in ("ivf_flat", "ivf_pq")
+
+
+def default_nlist(n_vectors):
+    """聚类数 ≈ 4·√N，且保证每个聚类有足够训练点"""
+    nlist = int(min(65536, max(16, 4 * math.sqrt(n_vectors))))
+    return max(1, min(nlist, n_vectors // TRAIN_POINTS_PER_LIST))
+
+
+def default_pq_m(dimension, pq_bits=PQ_BITS):
+    """PQ 子空间数。4-bit：每 4 维一个子空间（384 → 96，1536 → 384）；8-bit：每个子空间至少 16 维（1536 → 96）"""
+    if pq_bits == 4:
+        m = dimension // 4
+        return m if m % 2 == 0 and dimension % m == 0 else 2 * max(1, dimension // 8)
+    for m in (96, 64, 48, 32, 24, 16, 8, 4, 2, 1):
+        if dimension % m == 0 and dimension // m >= 16:
+            return m
+    return 1
+
+
+def index_spec(index_type, dimension, n_vectors, nlist=None, pq_m=None, pq_bits=PQ_BITS, refine=False,
+               hnsw_m=HNSW_M, nprobe=DEFAULT_NPROBE, ef_search=DEFAULT_EF_SEARCH, k_factor=REFINE_K_FACTOR):
+    """确定实际使用的索引类型和 index_factory 字符串（写入 manifest）"""
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type {index_type!r}; expected one of {INDEX_TYPES}")
+    spec = {"type": index_type}
+    if n_vectors < MIN_VECTORS.get(index_type, 0):
+        spec = {"type": "flat", "requested": index_type}
+    if spec["type"] == "flat":
+        spec["factory"] = "Flat"
+    elif spec["type"] == "hnsw":
+        spec.update(factory=f"HNSW{hnsw_m}", ef_search=ef_search)
+    else:
+        nlist = nlist or default_nlist(n_vectors)
+        spec.update(factory=f"IVF{nlist},Flat", nprobe=min(nprobe, nlist))
+        if spec["type"] == "ivf_pq":
+            fast_scan = "fs" if pq_bits == 4 else ""
+            spec["factory"] = f"IVF{nlist},PQ{pq_m or default_pq_m(dimension, pq_bits)}x{pq_bits}{fast_scan}"
+            spec["pq_bits"] = pq_bits
+            if refine:
+                spec.update(factory=spec["factory"] + ",RFlat", refine=True, k_factor=k_factor)
+    return spec
+
+
+def create_index(spec, dimension, train_vectors=None):
+    """按 spec 创建空索引；IVF 类需要 train_vectors（float32, N×d）"""
+    index = faiss.index_factory(dimension, spec["factory"])
+    if spec["type"] == "hnsw":
+        faiss.downcast_index(index).hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+    if not index.is_trained:
+        train_vectors = np.ascontiguousarray(train_vectors, dtype=np.float32)
+        if len(train_vectors) > MAX_TRAIN_VECTORS:
+            sample = np.random.default_rng(0).choice(len(train_vectors), MAX_TRAIN_VECTORS, replace=False)
+            train_vectors = train_vectors[sample]
+        index.train(train_vectors)
+    apply_search_params(index, spec.get("nprobe"), spec.get("ef_search"), spec.get("k_factor"))
+    return index
+
+
+def apply_search_params(index, nprobe=None, ef_search=None, k_factor=None):
+    params = faiss.ParameterSpace()
+    concrete = faiss.downcast_index(index)
+    if nprobe and faiss.try_extract_index_ivf(index) is not None:
+        params.set_index_parameter(index, "nprobe", int(nprobe))
+    if ef_search and isinstance(concrete, faiss.IndexHNSW):
+        params.set_index_parameter(index, "efSearch", int(ef_search))
+    if k_factor and isinstance(concrete, faiss.IndexRefine):
+        params.set_index_parameter(index, "k_factor_rf", float(k_factor))
+
+
+def exact_vectors(index):
+    """能否无损取回向量（IVF-PQ 只能取回量化后的近似值；带 RFlat 精排的可以）"""
+    if isinstance(faiss.downcast_index(index), faiss.IndexRefine):
+        return True
+    ivf = faiss.try_extract_index_ivf(index)
+    return ivf is None or isinstance(ivf, faiss.IndexIVFFlat)
+
+
+def reconstruct_all(index):
+    concrete = faiss.downcast_index(index)
+    if isinstance(concrete, faiss.IndexIVF):
+        concrete.make_direct_map()
+    return index.reconstruct_n(0, index.ntotal)
@@ -4,7 +4,6 @@ streamlit run insightvest_design/app_insightvest_design.py
 
 # main app
 import os
-import time
 
 import streamlit as st
 st.set_page_config(layout="wide")
@@ -21,10 +20,12 @@ from section3_summarizer import render_summary_ui
 from section2_upload_pdf import handle_pdf_upload
 from section_6_general_financial_qa import render_general_financial_qa
 from rag_qa_ui import render_rag_ui
+from prompt_analysis_ui import render_prompt_analysis
 from stock_portfolio import render_portfolio_analyzer
 from financial_cards_edu import render_flashcard_module
 from prompt_registry import PROMPT_REGISTRY  # 确保已加载你的 prompt 库
 from financial_metric import render_tiingo_statements_trend_cards
+from batch_ingest import ingest_filings, load_risk_trends, DEFAULT_MAX_WORKERS
 
 import yfinance as yf
 import plotly.graph_objects as go
@@ -33,6 +34,7 @@ from datetime import datetime, timedelta
 # Load environment variables
 load_dotenv()
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+DEFAULT_RISK_COMPANY = "mycompany"
 
 # === 插入动态图标横条（必须放函数外顶层） ===
 st.markdown("""
@@ -364,9 +366,20 @@ if st.session_state["section_selected"] == "analysis":
                     if st.button("Process Document", key="process_doc"):
                         with st.spinner("📊 Processing document..."):
                             progress_bar = st.progress(0)
-                            for i in range(100):
-                                time.sleep(0.01)
-                                progress_bar.progress(i + 1)
+                            status = st.empty()
+
+                            def report_progress(done, total, message):
+                                progress_bar.progress(done / total)
+                                status.caption(message)
+
+                            # 提取（命中缓存时即时返回）→ 风险分类 → 写入风险趋势库
+                            results = ingest_filings(
+                                [(uploaded_file["name"], st.session_state["file_upload_main"].getvalue())],
+                                company=st.session_state.get("risk_trend_company", DEFAULT_RISK_COMPANY),
+                                progress_callback=report_progress
+                            )
+                            if results[0]["error"]:
+                                st.warning(f"⚠️ Risk trend data not updated: {results[0]['error']}")
 
                             # 检查是否已有提取结果
                             paragraphs = st.session_state.get("paragraphs", [])
@@ -408,11 +421,13 @@ if st.session_state["section_selected"] == "analysis":
                 prompt_meta = PROMPT_REGISTRY.get(pid, {})
                 description = prompt_meta.get("description", "No description available.")
                 template = prompt_meta.get("template", "[No template provided.]")
+                sections = ", ".join(prompt_meta.get("sections", [])) or "All"
 
                 st.markdown(f"""
                 <div style='margin-bottom: 1.5rem; padding: 1rem; background-color: #111827; border-left: 4px solid #f97316;'>
                     <h4 style='color:#facc15;'>🟠 {pid}</h4>
                     <p style='color:#9ca3af;'><b>Description:</b> {description}</p>
+                    <p style='color:#9ca3af;'><b>10-K Sections:</b> {sections}</p>
                     <p style='color:#d1d5db;'><b>Template:</b></p>
                     <pre style='background-color: #1f2937; color: #d1d5db; padding: 0.75rem; border-radius: 5px;'>{template}</pre>
                 </div>
@@ -429,7 +444,8 @@ if st.session_state["section_selected"] == "analysis":
             elif "paragraphs" not in st.session_state:
                 st.warning("📥 Please upload and process a 10-K document first.")
             else:
-                st.markdown("Enhanced Prompt Analysis")
+                render_prompt_analysis(selected_prompt_ids, st.session_state["paragraphs"],
+                                       st.session_state.get("paragraph_sections"))
 
         # Risk Trend Visuals with Sample Data
         with st.container():
@@ -445,7 +461,43 @@ if st.session_state["section_selected"] == "analysis":
 
                 # Generate sample data
                 dfs_by_year = create_sample_data()
+            else:
+                # 批量导入多年度 10-K，结果按年份写入风险趋势库
+                company = st.text_input("🏢 Company / Ticker", value=DEFAULT_RISK_COMPANY, key="risk_trend_company")
+                batch_files = st.file_uploader(
+                    "Upload several years of 10-K filings",
+                    type="pdf",
+                    accept_multiple_files=True,
+                    key="batch_10k_upload"
+                )
+                max_workers = st.slider("Filings processed in parallel", 1, 8, DEFAULT_MAX_WORKERS,
+                                        key="batch_max_workers")
+
+                if st.button("📥 Ingest Filings", key="ingest_filings"):
+                    if not batch_files:
+                        st.warning("Please upload at least one 10-K filing.")
+                    else:
+                        progress_bar = st.progress(0)
+                        status = st.empty()
+
+                        def report_batch_progress(done, total, message):
+                            progress_bar.progress(done / total)
+                            status.caption(message)
+
+                        results = ingest_filings(
+                            [(f.name, f.getvalue()) for f in batch_files],
+                            company=company,
+                            max_workers=max_workers,
+                            progress_callback=report_batch_progress
+                        )
+                        failed = [r for r in results if r["error"]]
+                        st.success(f"✅ Ingested {len(results) - len(failed)} of {len(results)} filings.")
+                        for r in failed:
+                            st.error(f"❌ {r['name']}: {r['error']}")
+
+                dfs_by_year = load_risk_trends(company)
 
+            if dfs_by_year:
                 # Display summary metrics
                 st.markdown("### Risk Analysis Overview")
                 metrics_cols = st.columns(len(dfs_by_year))
@@ -556,12 +608,8 @@ if st.session_state["section_selected"] == "analysis":
                 else:
                     st.warning("Please select at least one risk type to display trends.")
             else:
-                if st.session_state.get("doc_processed", False):
-                    st.info(
-                        "Sample data is disabled. Risk trend analysis will be available once multiple documents are processed.")
-                else:
-                    st.info(
-                        "Please upload and process a document first to enable risk trend analysis, or enable sample data.")
+                st.info("No processed filings for this company yet. Ingest several years of 10-Ks above, "
+                        "or process an uploaded document.")
             st.markdown('</div>', unsafe_allow_html=True)
 
     # Right Column: Q&A and Auxiliary Tools
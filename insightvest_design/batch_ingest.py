@@ -0,0 +1,205 @@
+# batch_ingest.py
+# 多年度 10-K 批量导入：并发执行 提取 → 章节识别 → 风险分类，按年份写入风险趋势库
+#   python insightvest_design/batch_ingest.py <PDF目录> <公司名或股票代码>
+
+import os
+import queue
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from extraction_cache import file_sha256
+from filing_sections import detect_fiscal_year, select_paragraphs
+from keyword_matcher import get_matcher
+from section2_upload_pdf import extract_filing
+
+RISK_TREND_DIR = "cache/risk_trends"
+DEFAULT_MAX_WORKERS = 3
+
+# === 风险分类关键词（与 Risk Trend Visuals 中的风险类别一致） ===
+RISK_TYPE_KEYWORDS = {
+    "Financial": ["indebtedness", "debt", "liquidity", "credit rating", "interest rate", "covenant",
+                  "impairment", "cash flow", "capital resources", "refinanc"],
+    "Operational": ["supply chain", "supplier", "manufacturing", "disruption", "inventory", "workforce",
+                    "logistics", "key personnel", "natural disaster", "pandemic"],
+    "Regulatory": ["regulation", "regulatory", "compliance", "legislation", "government", "tax law",
+                   "antitrust", "litigation", "legal proceedings", "sanctions"],
+    "Cybersecurity": ["cyber", "data breach", "security breach", "ransomware", "privacy", "unauthorized access",
+                      "information technology systems", "hacking"],
+    "Market": ["competition", "competitor", "demand", "pricing pressure", "economic conditions", "inflation",
+               "foreign currency", "exchange rate", "recession", "market volatility"],
+    "Strategic": ["acquisition", "strategy", "strategic", "integration", "new products", "innovation",
+                  "joint venture", "divestiture", "transformation"],
+    "Reputational": ["reputation", "brand", "negative publicity", "public perception", "esg",
+                     "social media", "customer trust"],
+}
+# 严重程度信号词：基础分 1，每类命中加分，上限 5
+SEVERITY_TERMS = {
+    2: ["substantial doubt", "going concern", "bankruptcy", "default", "insolvency"],
+    1: ["material adverse", "materially adverse", "materially and adversely", "significant", "substantial"],
+}
+RISK_SECTIONS = ["1A", "7A"]
+
+
+def classify_risk(paragraph):
+    """关键词分类：返回 (risk_type, severity)；不含风险信号时返回 (None, None)"""
+    hits = {risk_type: len(get_matcher(keywords).matched_keywords(paragraph))
+            for risk_type, keywords in RISK_TYPE_KEYWORDS.items()}
+    risk_type, count = max(hits.items(), key=lambda item: item[1])
+    if count == 0:
+        return None, None
+    severity = 1 + min(1, count // 3)
+    for weight, terms in SEVERITY_TERMS.items():
+        if get_matcher(terms).search(paragraph):
+            severity += weight
+    return risk_type, min(severity, 5)
+
+
+def _excerpt(paragraph, max_chars=200):
+    sentence = re.split(r"(?<=[.!?])\s", paragraph.strip(), maxsplit=1)[0]
+    return sentence if len(sentence) <= max_chars else sentence[:max_chars].rstrip() + "..."
+
+
+def classify_filing(record):
+    """对一份提取结果做风险分类，返回与 create_sample_data() 同结构的 DataFrame"""
+    paragraphs = select_paragraphs(record["paragraphs"], record.get("paragraph_sections"), RISK_SECTIONS)
+    if paragraphs is None:
+        paragraphs = [p for p in record["paragraphs"] if get_matcher(["risk"]).search(p)]
+
+    rows = []
+    for paragraph in paragraphs:
+        risk_type, severity = classify_risk(paragraph)
+        if risk_type:
+            rows.append({
+                "Paragraph": paragraph,
+                "risk_type_1": risk_type,
+                "severity_1": str(severity),
+                "excerpt": _excerpt(paragraph),
+            })
+    return pd.DataFrame(rows, columns=["Paragraph", "risk_type_1", "severity_1", "excerpt"])
+
+
+# === 风险趋势库：cache/risk_trends/<company>/<year>.csv ===
+def _company_dir(company):
+    safe = re.sub(r"[^A-Za-z0-9_.-]+", "_", company.strip()) or "default"
+    return os.path.join(RISK_TREND_DIR, safe)
+
+
+def save_year_results(company, year, df):
+    path = _company_dir(company)
+    os.makedirs(path, exist_ok=True)
+    tmp_path = os.path.join(path, f".{year}.csv.tmp")
+    df.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, os.path.join(path, f"{year}.csv"))
+
+
+def load_risk_trends(company):
+    """读取某公司各年度风险分类结果 {year: DataFrame}"""
+    path = _company_dir(company)
+    if not os.path.isdir(path):
+        return {}
+    return {
+        name[:-4]: pd.read_csv(os.path.join(path, name), dtype={"severity_1": str})
+        for name in sorted(os.listdir(path)) if name.endswith(".csv")
+    }
+
+
+def list_companies():
+    if not os.path.isdir(RISK_TREND_DIR):
+        return []
+    return sorted(name for name in os.listdir(RISK_TREND_DIR) if os.path.isdir(os.path.join(RISK_TREND_DIR, name)))
+
+
+def iter_filings_from_directory(directory):
+    """yield (文件名, 字节内容)"""
+    for name in sorted(os.listdir(directory)):
+        if name.lower().endswith(".pdf"):
+            with open(os.path.join(directory, name), "rb") as f:
+                yield name, f.read()
+
+
+# === 批量导入 ===
+def ingest_filings(filings, company, max_workers=DEFAULT_MAX_WORKERS, progress_callback=None):
+    """并发处理多份 10-K，并把每年的风险分类结果写入趋势库
+
+    filings: [(文件名, 字节内容)]；progress_callback(done, total, message) 在调用线程中执行，
+    可直接更新 Streamlit 进度条。每份文件两步（提取、分类），total = 2 × 文件数。
+    工作线程不调用 st.*：提取失败、无法识别财年等错误写入结果的 "error" 并通过 progress_callback 汇报。
+    同一批中多份文件识别为同一财年时只写入排在最前的一份，其余标记为错误，不互相覆盖 <year>.csv。
+    返回 [{"name", "year", "paragraphs", "risks", "error"}]（顺序与 filings 一致）。
+    """
+    filings = list(filings)
+    total = 2 * len(filings)
+    # 各文件的 PDF 提取进程池共享 CPU，避免 max_workers × cpu_count 个进程
+    pdf_workers = max(1, (os.cpu_count() or 1) // max(1, min(max_workers, len(filings))))
+    events = queue.Queue()
+
+    def process(name, file_content):
+        result = {"name": name, "year": None, "paragraphs": 0, "risks": 0, "error": None, "df": None}
+        steps = 0
+
+        def step(message):
+            nonlocal steps
+            steps += 1
+            events.put(message)
+
+        try:
+            record = extract_filing(file_content, file_sha256(file_content), max_workers=pdf_workers,
+                                    raise_errors=True)
+            if not record["paragraphs"]:
+                raise ValueError("no paragraphs extracted")
+            step(f"📖 Extracted {name}")
+            result["year"] = record.get("fiscal_year") or detect_fiscal_year("", fallback_name=name)
+            if result["year"] is None:
+                raise ValueError("could not determine fiscal year")
+            df = classify_filing(record)
+            result.update(paragraphs=len(record["paragraphs"]), risks=len(df), df=df)
+            step(f"🏷️ Classified {name} (FY{result['year']}, {len(df)} risks)")
+        except Exception as e:
+            result["error"] = str(e)
+            step(f"❌ {name}: {e}")
+        finally:
+            # 失败时补齐剩余步骤，保证进度条能走完
+            while steps < 2:
+                step(None)
+        return result
+
+    done = 0
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(process, name, content) for name, content in filings]
+        while done < total:
+            message = events.get()
+            done += 1
+            if progress_callback and message:
+                progress_callback(done, total, message)
+        results = [future.result() for future in futures]
+
+    # 全部完成后按上传顺序写入，同一财年的结果不会随完成先后互相覆盖
+    saved = {}
+    for result in results:
+        df = result.pop("df")
+        if result["error"]:
+            continue
+        if result["year"] in saved:
+            result["error"] = (f"duplicate fiscal year FY{result['year']} (already ingested from "
+                               f"{saved[result['year']]}); not saved")
+            if progress_callback:
+                progress_callback(done, total, f"⚠️ {result['name']}: {result['error']}")
+            continue
+        try:
+            save_year_results(company, result["year"], df)
+            saved[result["year"]] = result["name"]
+        except OSError as e:
+            result["error"] = f"could not save risk trend data: {e}"
+            if progress_callback:
+                progress_callback(done, total, f"❌ {result['name']}: {result['error']}")
+    return results
+
+
+if __name__ == "__main__":
+    directory, company = sys.argv[1], sys.argv[2]
+    for result in ingest_filings(iter_filings_from_directory(directory), company,
+                                 progress_callback=lambda d, t, m: print(f"[{d}/{t}] {m}")):
+        print(result)
@@ -0,0 +1,75 @@
+# bench_ann_index.py
+# 各索引类型相对 flat（精确）的 recall@10、单条查询延迟、索引大小和构建耗时
+#   python insightvest_design/benchmarks/bench_ann_index.py [n_vectors] [dimension]
+#
+# 数据为带聚类结构的合成向量（模拟同一公司多年 10-K chunk 的主题聚集），查询取自同一分布。
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import faiss
+import numpy as np
+
+from ann_index import apply_search_params, create_index, index_spec
+
+N_QUERIES = 300
+K = 10
+CONFIGS = [
+    ("flat", {}, [{}]),
+    ("ivf_flat", {}, [{"nprobe": p} for p in (4, 16, 64)]),
+    ("ivf_pq", {}, [{"nprobe": p} for p in (16, 64)]),
+    ("ivf_pq", {"refine": True}, [{"nprobe": 16, "k_factor": kf} for kf in (4, 16)]),
+    ("hnsw", {}, [{"ef_search": ef} for ef in (16, 64, 128)]),
+]
+
+
+def make_vectors(n, d, n_topics=None, seed=0):
+    rng = np.random.default_rng(seed)
+    n_topics = n_topics or max(50, n // 200)
+    centers = rng.normal(size=(n_topics, d)).astype(np.float32)
+    assign = rng.integers(0, n_topics, n + N_QUERIES)
+    vectors = centers[assign] + 0.35 * rng.normal(size=(n + N_QUERIES, d)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors[:n], vectors[n:]
+
+
+def measure(index, queries, ground_truth):
+    latencies, hits = [], 0
+    for q, truth in zip(queries, ground_truth):
+        start = time.perf_counter()
+        _, found = index.search(q[None, :], K)
+        latencies.append((time.perf_counter() - start) * 1000)
+        hits += len(set(found[0]) & set(truth))
+    return hits / (K * len(queries)), np.mean(latencies), np.percentile(latencies, 95)
+
+
+def run(n=50_000, d=384):
+    vectors, queries = make_vectors(n, d)
+    flat = faiss.IndexFlatL2(d)
+    flat.add(vectors)
+    _, ground_truth = flat.search(queries, K)
+    print(f"{n} vectors × {d} dims, {N_QUERIES} queries, recall@{K} vs flat, single-query latency "
+          f"(faiss threads: {faiss.omp_get_max_threads()})")
+    print(f"{'index':>28} | {'params':>20} | recall | mean ms | p95 ms |   size MB | build s")
+
+    for index_type, options, search_params in CONFIGS:
+        spec = index_spec(index_type, d, n, **options)
+        start = time.perf_counter()
+        index = create_index(spec, d, vectors)
+        index.add(vectors)
+        build_seconds = time.perf_counter() - start
+        size_mb = faiss.serialize_index(index).nbytes / 1e6
+        for params in search_params:
+            apply_search_params(index, params.get("nprobe"), params.get("ef_search"),
+                                params.get("k_factor", spec.get("k_factor")))
+            recall, mean_ms, p95_ms = measure(index, queries, ground_truth)
+            label = ",".join(f"{k}={v}" for k, v in params.items()) or "-"
+            print(f"{spec['factory']:>28} | {label:>20} | {recall:6.3f} | {mean_ms:7.3f} | {p95_ms:6.3f} |"
+                  f" {size_mb:9.1f} | {build_seconds:7.1f}")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 50_000, int(sys.argv[2]) if len(sys.argv) > 2 else 384)
@@ -0,0 +1,109 @@
+# bench_chunker.py
+# 对比原按页 RecursiveCharacterTextSplitter(800 字符) 与 SectionAwareChunker 的 chunk 数、token 数和检索命中率
+#   python insightvest_design/benchmarks/bench_chunker.py
+#
+# 检索用本地 TF-IDF 余弦相似度代替 embedding（不调用 API），两种切分方式使用同一打分器。
+
+import math
+import os
+import re
+import sys
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_core.documents import Document
+
+from chunk_dedupe import BoilerplateLineFilter
+from chunker import SectionAwareChunker, iter_filing_chunks
+from filing_sections import SectionIndexer
+from synthetic_filing import make_filing_pages
+from token_utils import count_tokens
+
+# (章节, 植入的事实句, 问题)
+FACTS = [
+    ("1A", "A prolonged outage at our Singapore wafer fabrication plant would halt shipments of our Orion "
+           "processors and could reduce annual revenue by up to 40 percent.",
+     "What happens if the Singapore wafer plant has an outage?"),
+    ("1A", "Our largest customer, Northwind Logistics, accounted for 22 percent of net sales and may terminate "
+           "its master agreement with ninety days notice.",
+     "How concentrated are sales with Northwind Logistics?"),
+    ("1A", "New Basel III endgame capital rules could raise the cost of our warehouse lending lines.",
+     "How could Basel III capital rules affect warehouse lending?"),
+    ("7", "Gross margin expanded 310 basis points to 47.2 percent, driven by lower freight costs and a richer "
+          "mix of subscription software.",
+     "Why did gross margin expand and by how many basis points?"),
+    ("7", "The revolving credit facility of 750 million dollars matures in March 2029 and requires a maximum "
+          "net leverage ratio of 3.5 times.",
+     "When does the revolving credit facility mature and what leverage covenant applies?"),
+    ("7A", "A hypothetical 10 percent strengthening of the euro would reduce operating income by approximately "
+           "18 million dollars.",
+     "What is the impact of a 10 percent stronger euro on operating income?"),
+    ("8", "We recorded a goodwill impairment charge of 212 million dollars in the Industrial Sensors reporting "
+          "unit during the fourth quarter.",
+     "Was there a goodwill impairment in Industrial Sensors?"),
+    ("8", "Deferred revenue from multi-year maintenance contracts totaled 1.1 billion dollars at year end.",
+     "How much deferred revenue comes from maintenance contracts?"),
+]
+
+
+def _terms(text):
+    return re.findall(r"[a-z0-9]+", text.lower())
+
+
+class TfidfIndex:
+    def __init__(self, texts):
+        self.vectors = [Counter(_terms(t)) for t in texts]
+        df = Counter(term for vec in self.vectors for term in vec)
+        self.idf = {term: math.log(len(texts) / count) + 1 for term, count in df.items()}
+        self.norms = [math.sqrt(sum((tf * self.idf[t]) ** 2 for t, tf in vec.items())) or 1 for vec in self.vectors]
+
+    def search(self, query, k):
+        q = Counter(_terms(query))
+        scores = []
+        for i, vec in enumerate(self.vectors):
+            dot = sum(q[t] * self.idf.get(t, 0) * vec[t] * self.idf.get(t, 0) for t in q if t in vec)
+            scores.append((dot / self.norms[i], i))
+        return [i for _, i in sorted(scores, reverse=True)[:k]]
+
+
+def baseline_chunks(pages):
+    splitter = RecursiveCharacterTextSplitter(chunk_size=800, chunk_overlap=100)
+    return [c.page_content for c in splitter.split_documents(pages)]
+
+
+def section_aware_chunks(pages):
+    return [c.page_content for c in iter_filing_chunks(pages, SectionIndexer(), line_filter=BoilerplateLineFilter(),
+                                                       chunker=SectionAwareChunker())]
+
+
+def evaluate(label, chunks, k=5):
+    index = TfidfIndex(chunks)
+    hits_1 = hits_k = context_tokens = 0
+    for _, fact, question in FACTS:
+        top = index.search(question, k)
+        found = [i for i in top if fact in " ".join(chunks[i].split())]
+        hits_1 += bool(found and found[0] == top[0])
+        hits_k += bool(found)
+        context_tokens += sum(count_tokens(chunks[i]) for i in top)
+    tokens = sum(count_tokens(c) for c in chunks)
+    print(f"{label:>22} | chunks {len(chunks):5d} | tokens {tokens:7d} | hit@1 {hits_1}/{len(FACTS)}"
+          f" | hit@{k} {hits_k}/{len(FACTS)} | avg context tokens @k={k}: {context_tokens / len(FACTS):.0f}")
+
+
+def run(n_pages=300):
+    facts = {}
+    for item, fact, _ in FACTS:
+        facts.setdefault(item, []).append(fact)
+    pages = [Document(page_content=text, metadata={"page": i})
+             for i, text in enumerate(make_filing_pages(n_pages, facts=facts))]
+    print(f"Synthetic 10-K: {n_pages} pages, {len(FACTS)} planted facts")
+    baseline, section_aware = baseline_chunks(pages), section_aware_chunks(pages)
+    for k in (3, 5):
+        evaluate("Recursive 800 chars", baseline, k)
+        evaluate("SectionAware 300 tok", section_aware, k)
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 300)
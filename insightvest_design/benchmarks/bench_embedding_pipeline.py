@@ -0,0 +1,92 @@
+# bench_embedding_pipeline.py
+# 对比逐批顺序请求（LangChain 默认路径）与 EmbeddingPipeline（token 打包 + 并发 + 重试）的耗时
+#   python insightvest_design/benchmarks/bench_embedding_pipeline.py [n_pages]
+#
+# 使用模拟后端（不调用 API）：每次请求 = 固定往返延迟 + 按 token 计的处理时间，并按一定概率失败。
+
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from chunk_dedupe import BoilerplateLineFilter
+from chunker import SectionAwareChunker, iter_filing_chunks
+from embedding_pipeline import EmbeddingPipeline
+from filing_sections import SectionIndexer
+from synthetic_filing import make_filing_pages
+from token_utils import count_tokens
+
+REQUEST_LATENCY = 0.25        # 秒/请求
+SECONDS_PER_1K_TOKENS = 0.01
+FAILURE_RATE = 0.05
+
+
+class SimulatedEmbeddings(Embeddings):
+    model = "simulated"
+
+    def __init__(self, failure_rate=FAILURE_RATE, seed=7):
+        self.failure_rate = failure_rate
+        self.requests = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def embed_documents(self, texts):
+        with self._lock:
+            self.requests += 1
+            fail = self._rng.random() < self.failure_rate
+        time.sleep(REQUEST_LATENCY + SECONDS_PER_1K_TOKENS * sum(count_tokens(t) for t in texts) / 1000)
+        if fail:
+            raise RuntimeError("simulated 429 / timeout")
+        return [[float(len(t)), 0.0] for t in texts]
+
+    def embed_query(self, text):
+        return [float(len(text)), 0.0]
+
+
+def sequential(texts, chunk_size=16):
+    """LangChain 旧版默认：每批固定条数、顺序请求，失败后整批重试"""
+    backend = SimulatedEmbeddings()
+    start = time.perf_counter()
+    for i in range(0, len(texts), chunk_size):
+        while True:
+            try:
+                backend.embed_documents(texts[i:i + chunk_size])
+                break
+            except RuntimeError:
+                time.sleep(1.0)
+    return time.perf_counter() - start, backend.requests
+
+
+def pipelined(texts, **kwargs):
+    backend = SimulatedEmbeddings()
+    pipeline = EmbeddingPipeline(backend, **kwargs)
+    start = time.perf_counter()
+    first = None
+    for _ in pipeline.iter_batches(texts):
+        first = first or time.perf_counter() - start
+    return time.perf_counter() - start, backend.requests, first, pipeline.stats
+
+
+def run(n_pages=600):
+    pages = [Document(page_content=text, metadata={"page": i})
+             for i, text in enumerate(make_filing_pages(n_pages))]
+    texts = [c.page_content for c in iter_filing_chunks(pages, SectionIndexer(), line_filter=BoilerplateLineFilter(),
+                                                        chunker=SectionAwareChunker())]
+    print(f"{len(texts)} chunks, {sum(count_tokens(t) for t in texts)} tokens")
+
+    elapsed, requests = sequential(texts)
+    print(f"{'sequential x16':>24} | {elapsed:6.2f}s | {requests:4d} requests")
+    for concurrency in (1, 4, 8):
+        elapsed, requests, first, stats = pipelined(texts, max_batch_tokens=8_000, max_concurrency=concurrency)
+        print(f"{f'pipeline c={concurrency}':>24} | {elapsed:6.2f}s | {requests:4d} requests"
+              f" | first batch {first:5.2f}s | retries {stats['retries']}")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 600)
@@ -0,0 +1,73 @@
+# bench_filtered_retrieval.py
+# 严格 metadata 条件下的检索对比：LangChain FAISS 的后过滤（先取 fetch_k 再过滤）与 retrieval.filtered_search 的预过滤
+#   python insightvest_design/benchmarks/bench_filtered_retrieval.py [n_chunks]
+#
+# 条件只匹配约 0.4% 的 chunk；记录每次查询返回的结果数（期望 k）与平均耗时。
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import faiss
+import numpy as np
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+
+from embedding_backends import HASHING_FEATURES, HashingEmbeddings
+from rag_vectorstore import load_vectorstore
+from retrieval import filtered_search
+from vectorstore_storage import save_version
+
+K = 5
+TICKERS = ["AAPL", "MSFT", "NVDA", "AMZN", "GOOG"]
+YEARS = list(range(2015, 2025))
+SECTIONS = ["1", "1A", "7", "7A", "8"]
+QUERIES = ["liquidity risk from revolving credit facility covenants", "revenue growth by segment",
+           "cybersecurity incidents", "foreign exchange exposure", "share repurchase program"]
+
+
+def make_store(n, seed=0):
+    rng = np.random.default_rng(seed)
+    index = faiss.IndexFlatL2(HASHING_FEATURES)
+    index.add(rng.normal(size=(n, HASHING_FEATURES)).astype(np.float32))
+    ids = [f"doc:{i:07d}" for i in range(n)]
+    docs = {}
+    for i, _id in enumerate(ids):
+        metadata = {"ticker": TICKERS[i % 5], "year": YEARS[(i // 5) % 10], "section": SECTIONS[(i // 50) % 5],
+                    "page": i % 300, "doc_id": f"doc{i % 50}"}
+        docs[_id] = Document(page_content=f"chunk {i}", metadata=metadata)
+    return FAISS(HashingEmbeddings(), index, InMemoryDocstore(docs), dict(enumerate(ids)))
+
+
+def _time(fn):
+    counts, start = [], time.perf_counter()
+    for query in QUERIES:
+        counts.append(len(fn(query)))
+    return (time.perf_counter() - start) / len(QUERIES) * 1000, sum(counts) / len(counts)
+
+
+def run(n=50_000):
+    metadata_filter = {"ticker": "NVDA", "year": 2020, "section": "7"}
+    langchain_filter = dict(metadata_filter)
+    with tempfile.TemporaryDirectory() as tmp:
+        store_path = os.path.join(tmp, "store.faiss")
+        save_version(store_path, make_store(n), {"embedding_backend": "hashing", "embedding_model": "hashing-1024",
+                                                 "dimension": HASHING_FEATURES, "filings": {}})
+        vectorstore = load_vectorstore(store_path)
+        print(f"{n} chunks × {HASHING_FEATURES} dims, filter {metadata_filter}")
+        print(f"{'method':>34} | ms/query | results (k={K})")
+        for label, fn in (
+                ("post-filter fetch_k=20", lambda q: vectorstore.similarity_search(q, k=K, filter=langchain_filter)),
+                ("post-filter fetch_k=1000",
+                 lambda q: vectorstore.similarity_search(q, k=K, filter=langchain_filter, fetch_k=1000)),
+                ("pre-filter (SQLite + IDSelector)", lambda q: filtered_search(vectorstore, q, K, metadata_filter))):
+            ms, found = _time(fn)
+            print(f"{label:>34} | {ms:8.1f} | {found:.1f}")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 50_000)
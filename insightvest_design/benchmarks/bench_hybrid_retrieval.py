@@ -0,0 +1,93 @@
+# bench_hybrid_retrieval.py
+# 纯向量检索与 hybrid（向量 + BM25，RRF 融合）检索的命中率和单条查询延迟
+#   python insightvest_design/benchmarks/bench_hybrid_retrieval.py [n_chunks] [backend]
+#
+# 语料为合成 10-K 段落；每个专有术语（"Basel III"、"covenant waiver" 等）只埋入一个 chunk，
+# 问题用自然语言提问该术语，命中 = 该 chunk 出现在前 k 个结果中。backend 默认 hashing（离线可跑）。
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import faiss
+import numpy as np
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+
+from embedding_backends import get_embeddings
+from rag_vectorstore import load_vectorstore
+from retrieval import filtered_search, hybrid_search
+from synthetic_filing import FILLER, VOCAB
+from vectorstore_storage import save_version
+
+K = 3
+NEEDLES = [
+    ("Basel III", "How exposed is the bank to Basel III capital requirements?"),
+    ("covenant waiver", "Did lenders grant a covenant waiver on the credit facility?"),
+    ("material weakness", "Was a material weakness reported in internal control?"),
+    ("going concern", "Is there substantial doubt about the going concern assumption?"),
+    ("LIBOR transition", "What is the impact of the LIBOR transition on borrowing costs?"),
+    ("ASC 842", "How did adopting ASC 842 change lease obligations?"),
+    ("Tier 1 leverage ratio", "What was the Tier 1 leverage ratio at year end?"),
+    ("CECL allowance", "How large is the CECL allowance for credit losses?"),
+    ("Section 404(b)", "Is the company subject to Section 404(b) auditor attestation?"),
+    ("rare earth magnets", "Does the supply chain depend on rare earth magnets?"),
+    ("ransomware attack", "Has the company suffered a ransomware attack?"),
+    ("Pillar Two", "How will the OECD Pillar Two minimum tax affect the effective rate?"),
+]
+
+
+def _chunk_text(rng, n_sentences=10):
+    return ". ".join(" ".join(rng.choice(VOCAB if rng.random() < 0.55 else FILLER) for _ in range(rng.randint(12, 24)))
+                     for _ in range(n_sentences)).capitalize() + "."
+
+
+def make_store(n, embeddings, seed=0):
+    rng = random.Random(seed)
+    texts = [_chunk_text(rng) for _ in range(n)]
+    targets = rng.sample(range(n), len(NEEDLES))
+    for position, (term, _) in zip(targets, NEEDLES):
+        sentences = texts[position].split(". ")
+        sentences.insert(rng.randrange(len(sentences)), f"We continue to monitor the {term} closely")
+        texts[position] = ". ".join(sentences)
+    vectors = np.asarray(embeddings.embed_documents(texts), dtype=np.float32)
+    index = faiss.IndexFlatL2(vectors.shape[1])
+    index.add(vectors)
+    ids = [f"doc:{i:07d}" for i in range(n)]
+    docs = {_id: Document(page_content=text, metadata={"position": i, "section": "7", "doc_id": "doc"})
+            for i, (_id, text) in enumerate(zip(ids, texts))}
+    return FAISS(embeddings, index, InMemoryDocstore(docs), dict(enumerate(ids))), targets, vectors.shape[1]
+
+
+def measure(search, vectorstore, targets):
+    hits, latencies = 0, []
+    for target, (_, question) in zip(targets, NEEDLES):
+        start = time.perf_counter()
+        results = search(vectorstore, question, K)
+        latencies.append((time.perf_counter() - start) * 1000)
+        hits += any(doc.metadata["position"] == target for doc, _ in results)
+    return hits / len(NEEDLES), np.mean(latencies), np.percentile(latencies, 95)
+
+
+def run(n=20_000, backend="hashing"):
+    embeddings, model_name = get_embeddings(backend)
+    vectorstore, targets, dimension = make_store(n, embeddings)
+    with tempfile.TemporaryDirectory() as tmp:
+        store_path = os.path.join(tmp, "store.faiss")
+        save_version(store_path, vectorstore, {"embedding_backend": backend, "embedding_model": model_name,
+                                               "dimension": dimension, "filings": {}})
+        vectorstore = load_vectorstore(store_path)
+        print(f"{n} chunks, backend {model_name}, {len(NEEDLES)} exact-term questions, hit@{K}")
+        print(f"{'retrieval':>16} | hit@{K} | mean ms | p95 ms")
+        for label, search in (("vector only", filtered_search), ("hybrid (RRF)", hybrid_search)):
+            hit_rate, mean_ms, p95_ms = measure(search, vectorstore, targets)
+            print(f"{label:>16} | {hit_rate:5.2f} | {mean_ms:7.1f} | {p95_ms:6.1f}")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 20_000, sys.argv[2] if len(sys.argv) > 2 else "hashing")
@@ -0,0 +1,61 @@
+# bench_keyword_matcher.py
+# 对比原实现（每个关键词都重新 text.lower()）与 KeywordMatcher 在整份合成 10-K 上的耗时
+#   python insightvest_design/benchmarks/bench_keyword_matcher.py [份数]
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import keyword_matcher
+from keyword_matcher import KeywordMatcher
+from synthetic_filing import VOCAB, make_filing_pages
+
+KEYWORD_SETS = {
+    "section2 (6 kw)": ["risk factors", "item 1a", "item 7", "management’s discussion", "footnotes", "note"],
+    "section3 (3 kw)": ["management's discussion", "risk factors", "financial condition"],
+    "extended (60 kw)": [f"{a} {b}" for a, b in zip(VOCAB, VOCAB[1:])][:60],
+}
+
+
+def _naive_filter(pages, keywords):
+    return [any(kw.lower() in p.lower() for kw in keywords) for p in pages]
+
+
+def _naive_positions(pages, keywords):
+    hits = 0
+    for page in pages:
+        for kw in keywords:
+            text = page.lower()
+            start = text.find(kw.lower())
+            while start != -1:
+                hits += 1
+                start = text.find(kw.lower(), start + 1)
+    return hits
+
+
+def _timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def run(n_filings=10):
+    backend = "aho-corasick" if keyword_matcher.ahocorasick is not None else "substring"
+    pages = [p for seed in range(n_filings) for p in make_filing_pages(300, seed=seed)]
+    print(f"{n_filings} synthetic filings, {len(pages)} pages, {sum(map(len, pages)) / 1e6:.1f}M chars, matcher backend: {backend}")
+    for label, keywords in KEYWORD_SETS.items():
+        matcher = KeywordMatcher(keywords)
+        naive, t_naive = _timed(_naive_filter, pages, keywords)
+        fast, t_fast = _timed(lambda: [matcher.search(p) for p in pages])
+        assert all(f for n, f in zip(naive, fast) if n)
+        n_naive, t_naive_pos = _timed(_naive_positions, pages, keywords)
+        n_fast, t_fast_pos = _timed(lambda: sum(1 for p in pages for _ in matcher.finditer(p)))
+        print(f"{label:>17} | filter: naive {t_naive * 1e3:7.1f}ms  matcher {t_fast * 1e3:7.1f}ms"
+              f" | positions: naive {t_naive_pos * 1e3:7.1f}ms ({n_naive})"
+              f"  matcher {t_fast_pos * 1e3:7.1f}ms ({n_fast})")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 10)
@@ -0,0 +1,117 @@
+# bench_map_reduce_summary.py
+# 10-K 摘要的覆盖率与耗时：原 30 段关键词/章节截取 + 单次调用 vs 全文 map-reduce（token 预算 + chain.batch 并行）
+#   python insightvest_design/benchmarks/bench_map_reduce_summary.py [n_pages] [max_concurrency]
+#
+# 合成 10-K 经与上传流程相同的分块；在各章节植入事实句，统计最终摘要 prompt 中保留下来的事实数。
+# 使用模拟 LLM（不调用 API）：每次请求 = 往返延迟 + 按输出 token 计的生成时间；
+# 模拟的"笔记"原样保留输入中的事实句，其余用占位文字填到输出上限。
+
+import os
+import sys
+import tempfile
+import time
+from typing import List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_core.documents import Document
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+import map_reduce_summarizer
+from chunk_dedupe import BoilerplateLineFilter, ChunkDeduplicator
+from chunker import SectionAwareChunker, iter_filing_chunks
+from filing_sections import CORE_SECTIONS, SectionIndexer, select_paragraphs
+from llm_cache import LLMCache
+from map_reduce_summarizer import MAP_OUTPUT_TOKENS, summary_content
+from synthetic_filing import make_filing_pages
+from token_utils import count_tokens
+
+REQUEST_LATENCY = 0.4          # 秒/请求（往返 + 首 token）
+SECONDS_PER_OUTPUT_TOKEN = 0.002
+OLD_MAX_PARAGRAPHS = 30
+OLD_SECTIONS = ["1", "1A", "7"]
+FACTS = {
+    "1": ["Our Orion processors are sold through 14 distributors in 31 countries."],
+    "1A": ["Our largest customer, Northwind Logistics, accounted for 22 percent of net sales.",
+           "A prolonged outage at our Singapore wafer plant could reduce annual revenue by up to 40 percent."],
+    "7": ["Gross margin expanded 310 basis points to 47.2 percent.",
+          "The revolving credit facility of 750 million dollars matures in March 2029."],
+    "7A": ["A 10 percent strengthening of the euro would reduce operating income by about 38 million dollars."],
+    "8": ["We recorded a goodwill impairment charge of 212 million dollars in the Industrial Sensors unit.",
+          "Deferred revenue from multi-year maintenance contracts totaled 1.1 billion dollars."],
+}
+ALL_FACTS = [fact for facts in FACTS.values() for fact in facts]
+
+
+class SimulatedNotesModel(BaseChatModel):
+    model_name: str = "simulated"
+    temperature: float = 0.0
+    max_tokens: Optional[int] = MAP_OUTPUT_TOKENS
+    requests: int = 0
+
+    @property
+    def _llm_type(self):
+        return "simulated-notes"
+
+    def _generate(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs):
+        self.requests += 1
+        text = " ".join(" ".join(m.content.split()) for m in messages)
+        notes = [f"- {fact}" for fact in ALL_FACTS if fact in text]
+        filler = "- Segment results, liquidity and outlook were discussed."
+        while count_tokens("\n".join(notes + [filler])) < self.max_tokens * 0.8:
+            notes.append(filler)
+        time.sleep(REQUEST_LATENCY + SECONDS_PER_OUTPUT_TOKEN * count_tokens("\n".join(notes)))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="\n".join(notes)))])
+
+
+def filing_paragraphs(n_pages):
+    pages = [Document(page_content=text, metadata={"page": i})
+             for i, text in enumerate(make_filing_pages(n_pages, facts=FACTS))]
+    chunks = list(iter_filing_chunks(pages, SectionIndexer(), line_filter=BoilerplateLineFilter(),
+                                     deduplicator=ChunkDeduplicator(), chunker=SectionAwareChunker(300, 30),
+                                     keep_sections=CORE_SECTIONS))
+    return [c.page_content for c in chunks], [c.metadata["section"] for c in chunks]
+
+
+def facts_in(text):
+    text = " ".join(text.split())
+    return sum(fact in text for fact in ALL_FACTS)
+
+
+def run(n_pages=300, max_concurrency=map_reduce_summarizer.MAP_CONCURRENCY):
+    paragraphs, sections = filing_paragraphs(n_pages)
+    total_tokens = sum(count_tokens(p) for p in paragraphs)
+    print(f"Synthetic 10-K: {n_pages} pages → {len(paragraphs)} paragraphs, {total_tokens:,} tokens, "
+          f"{len(ALL_FACTS)} planted facts")
+    print(f"{'summary input':>30} | paragraphs | facts kept | LLM calls | largest call tok | wall s")
+
+    old = select_paragraphs(paragraphs, sections, OLD_SECTIONS, limit=OLD_MAX_PARAGRAPHS)
+    old_text = "\n".join(old)
+    print(f"{'30 paragraphs, single call':>30} | {len(old):10d} | {facts_in(old_text):4d} / {len(ALL_FACTS):<3d} | "
+          f"{1:9d} | {count_tokens(old_text):16,d} | {'-':>6}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        llm = SimulatedNotesModel()
+        cache = LLMCache(os.path.join(tmp, "llm_responses.sqlite"))
+        start = time.perf_counter()
+        content, stats = summary_content(paragraphs, sections, llm=llm, max_concurrency=max_concurrency, cache=cache)
+        elapsed = time.perf_counter() - start
+        calls = stats["map_calls"] + stats["reduce_calls"]
+        per_call = REQUEST_LATENCY + SECONDS_PER_OUTPUT_TOKEN * MAP_OUTPUT_TOKENS * 0.8
+        print(f"{f'map-reduce c={max_concurrency}':>30} | {stats['paragraphs']:10d} | "
+              f"{facts_in(content):4d} / {len(ALL_FACTS):<3d} | {calls:9d} | {stats['max_call_tokens']:16,d} | "
+              f"{elapsed:6.1f}")
+        print(f"{'(same calls run serially)':>30} | {'':10} | {'':10} | {'':9} | {'':16} | {calls * per_call:6.1f}")
+        print(f"map calls {stats['map_calls']}, reduce levels {stats['reduce_levels']} ({stats['reduce_calls']} calls), "
+              f"final prompt content {stats['content_tokens']:,} tokens")
+
+        start = time.perf_counter()
+        summary_content(paragraphs, sections, llm=llm, max_concurrency=max_concurrency, cache=cache)
+        print(f"re-run (llm_cache hits): {time.perf_counter() - start:.2f} s")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 300,
+        int(sys.argv[2]) if len(sys.argv) > 2 else map_reduce_summarizer.MAP_CONCURRENCY)
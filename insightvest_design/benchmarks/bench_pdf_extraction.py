@@ -0,0 +1,35 @@
+# bench_pdf_extraction.py
+# 对比单进程与进程池页段分片提取合成 10-K PDF 的耗时
+#   python insightvest_design/benchmarks/bench_pdf_extraction.py [页数]
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pdf_extraction import iter_pdf_pages
+from synthetic_filing import make_filing_pages, make_pdf_bytes
+
+
+def run(n_pages=300):
+    pdf_bytes = make_pdf_bytes(make_filing_pages(n_pages))
+    cpus = os.cpu_count() or 1
+    # 单核机器上默认 worker 数为 1 会直接走单进程路径，至少用 2 个 worker 才能测到进程池
+    pool_workers = max(2, cpus)
+    print(f"Synthetic PDF: {n_pages} pages, {len(pdf_bytes) / 1024:.0f} KB")
+
+    timings = {}
+    for label, workers in [("sequential", 1), ("process pool", pool_workers)]:
+        start = time.perf_counter()
+        pages = list(iter_pdf_pages(pdf_bytes, max_workers=workers))
+        timings[label] = time.perf_counter() - start
+        assert [p.metadata["page"] for p in pages] == list(range(n_pages))
+        print(f"{label:>14}: {timings[label]:.2f}s ({len(pages)} pages, {workers} workers)")
+
+    print(f"Speed-up: {timings['sequential'] / timings['process pool']:.1f}x "
+          f"(os.cpu_count() = {os.cpu_count()}, pool workers = {pool_workers})")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 300)
@@ -0,0 +1,88 @@
+# bench_prompt_engine.py
+# 逐个串行调用 LLM 与 PromptEngine（asyncio 有界并发 + 退避重试 + schema 校验）执行 (prompt × 段落) 任务的耗时
+#   python insightvest_design/benchmarks/bench_prompt_engine.py [n_paragraphs] [max_concurrency]
+#
+# 使用模拟 LLM（不调用 API）：每次请求 = 往返延迟 + 按输出 token 计的生成时间，并按一定概率失败或返回不合法 JSON。
+# 串行耗时按单次请求的期望耗时估算（300 段实际串行跑需要数分钟）。
+
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import prompt_engine
+from llm_cache import LLMCache
+from prompt_engine import PromptEngine, build_jobs
+
+REQUEST_LATENCY = 0.4         # 秒/请求（往返 + 首 token）
+SECONDS_PER_OUTPUT_TOKEN = 0.01
+OUTPUT_TOKENS = 120
+FAILURE_RATE = 0.05
+INVALID_RATE = 0.05
+PROMPT_IDS = ["risk_fast_screen_prompt", "investment_decision_prompt"]
+
+
+class SimulatedChatModel:
+    model_name = "simulated"
+    temperature = 0.0
+    max_tokens = None
+
+    def __init__(self, seed=7):
+        self.requests = 0
+        self._rng = random.Random(seed)
+
+    async def ainvoke(self, prompt):
+        self.requests += 1
+        roll = self._rng.random()
+        await asyncio.sleep(REQUEST_LATENCY + SECONDS_PER_OUTPUT_TOKEN * OUTPUT_TOKENS)
+        if roll < FAILURE_RATE:
+            raise RuntimeError("simulated 429 / timeout")
+        if roll < FAILURE_RATE + INVALID_RATE:
+            return _Message('Here is the analysis: {"risk_type": "Legal"')
+        return _Message(json.dumps({"risk_type": "Financial", "severity": 3, "explanation": "Debt rose.",
+                                    "investor_tip": "Watch leverage.", "signal": "Neutral", "impact": "Medium",
+                                    "investment_advice": "Hold", "confidence": 3}))
+
+
+class _Message:
+    def __init__(self, content):
+        self.content = content
+
+
+def run(n_paragraphs=300, max_concurrency=prompt_engine.MAX_CONCURRENCY):
+    prompt_engine.BACKOFF_BASE_SECONDS = 0.2
+    paragraphs = [f"Paragraph {i}: our revolving credit facility contains leverage covenants."
+                  for i in range(n_paragraphs)]
+    sections = ["1A" if i % 2 else "7" for i in range(n_paragraphs)]
+    jobs = build_jobs(PROMPT_IDS, paragraphs, sections)
+    request_seconds = REQUEST_LATENCY + SECONDS_PER_OUTPUT_TOKEN * OUTPUT_TOKENS
+    serial_seconds = len(jobs) * request_seconds / (1 - FAILURE_RATE - INVALID_RATE)
+
+    llm = SimulatedChatModel()
+    cache_dir = tempfile.TemporaryDirectory()
+    engine = PromptEngine(llm=llm, max_concurrency=max_concurrency,
+                          cache=LLMCache(os.path.join(cache_dir.name, "llm_responses.sqlite")))
+    start = time.perf_counter()
+    first = None
+    for result in engine.run(jobs):
+        first = first or time.perf_counter() - start
+    elapsed = time.perf_counter() - start
+    print(f"{len(jobs)} jobs ({n_paragraphs} paragraphs × {len(PROMPT_IDS)} prompts, filtered by section)")
+    print(f"serial (estimated)        : {serial_seconds:7.1f} s")
+    print(f"PromptEngine c={max_concurrency:<3}        : {elapsed:7.1f} s  first result after {first:.2f} s, "
+          f"{llm.requests} requests, stats {dict(engine.stats)}")
+
+    start = time.perf_counter()
+    list(PromptEngine(llm=llm, max_concurrency=max_concurrency, cache=engine.cache).run(jobs))
+    print(f"re-run (llm_cache hits)   : {time.perf_counter() - start:7.2f} s")
+    cache_dir.cleanup()
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 300,
+        int(sys.argv[2]) if len(sys.argv) > 2 else prompt_engine.MAX_CONCURRENCY)
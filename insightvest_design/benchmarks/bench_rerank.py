@@ -0,0 +1,100 @@
+# bench_rerank.py
+# RAG 上下文对比：相似度前 5 个直接放入 prompt vs 取 20 个候选后本地重排 + MMR 保留 3 个
+#   python insightvest_design/benchmarks/bench_rerank.py [n_filler_chunks] [backend]
+#
+# 合成语料模拟同一公司 5 年的 10-K：每个主题段落逐年只改动个别数字（近似重复），其余为普通正文。
+# 每个问题同时涉及两个主题；记录上下文覆盖的主题比例、上下文 token 数和检索耗时。
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import faiss
+import numpy as np
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+
+from embedding_backends import get_embeddings
+from rerank import RERANK_FETCH_K, rerank_documents
+from retrieval import hybrid_search
+from synthetic_filing import FILLER, VOCAB
+from token_utils import count_tokens
+
+YEARS = range(2019, 2024)
+TOPICS = {
+    "covenant waiver": "Our lenders granted a covenant waiver for the leverage ratio under the revolving credit facility "
+                       "through the end of fiscal {year}, subject to a minimum liquidity of ${n} million.",
+    "LIBOR transition": "Borrowings under the term loan moved from LIBOR to SOFR as part of the LIBOR transition; "
+                        "the spread adjustment added {n} basis points to interest expense in {year}.",
+    "goodwill impairment": "We recorded a goodwill impairment of ${n} million in the industrial segment in {year} after "
+                           "lowering our long-term growth assumptions in the annual test.",
+    "ransomware attack": "A ransomware attack on a logistics vendor disrupted shipments for {n} days in {year}; "
+                         "we have since expanded third-party cybersecurity assessments.",
+    "rare earth magnets": "Our motors depend on rare earth magnets sourced from {n} suppliers concentrated in one region, "
+                          "and export restrictions in {year} raised input costs.",
+    "Pillar Two": "The OECD Pillar Two global minimum tax is expected to raise our effective tax rate by {n} basis points "
+                  "beginning after fiscal {year}.",
+}
+QUESTIONS = [
+    ("How do the covenant waiver and the LIBOR transition affect liquidity?", ["covenant waiver", "LIBOR transition"]),
+    ("Describe the goodwill impairment and the ransomware attack.", ["goodwill impairment", "ransomware attack"]),
+    ("What are the risks from rare earth magnets and Pillar Two?", ["rare earth magnets", "Pillar Two"]),
+    ("Explain the covenant waiver and the goodwill impairment.", ["covenant waiver", "goodwill impairment"]),
+    ("How do the ransomware attack and rare earth magnets affect supply?", ["ransomware attack", "rare earth magnets"]),
+    ("What do the LIBOR transition and Pillar Two mean for expenses?", ["LIBOR transition", "Pillar Two"]),
+]
+
+
+def _filler(rng, n_sentences=8):
+    return ". ".join(" ".join(rng.choice(VOCAB if rng.random() < 0.55 else FILLER) for _ in range(rng.randint(12, 24)))
+                     for _ in range(n_sentences)).capitalize() + "."
+
+
+def make_store(n_filler, embeddings, seed=0):
+    rng = random.Random(seed)
+    docs = []
+    for topic, template in TOPICS.items():
+        background = _filler(rng, 4)
+        for year in YEARS:
+            docs.append(Document(page_content=f"{template.format(year=year, n=rng.randint(5, 95))} {background}",
+                                 metadata={"topic": topic, "year": year}))
+    docs += [Document(page_content=_filler(rng), metadata={"topic": None}) for _ in range(n_filler)]
+    vectors = np.asarray(embeddings.embed_documents([d.page_content for d in docs]), dtype=np.float32)
+    index = faiss.IndexFlatL2(vectors.shape[1])
+    index.add(vectors)
+    ids = [f"doc:{i:07d}" for i in range(len(docs))]
+    return FAISS(embeddings, index, InMemoryDocstore(dict(zip(ids, docs))), dict(enumerate(ids)))
+
+
+def measure(retrieve, vectorstore):
+    coverage, tokens, latencies = [], [], []
+    for question, topics in QUESTIONS:
+        start = time.perf_counter()
+        docs = retrieve(vectorstore, question)
+        latencies.append((time.perf_counter() - start) * 1000)
+        found = {d.metadata.get("topic") for d in docs}
+        coverage.append(sum(t in found for t in topics) / len(topics))
+        tokens.append(count_tokens("\n\n".join(d.page_content for d in docs)))
+    return np.mean(coverage), np.mean(tokens), np.mean(latencies)
+
+
+def run(n_filler=5_000, backend="hashing"):
+    embeddings, model_name = get_embeddings(backend)
+    vectorstore = make_store(n_filler, embeddings)
+    hybrid_search(vectorstore, "warm up", 1)
+    print(f"{vectorstore.index.ntotal} chunks, backend {model_name}, {len(QUESTIONS)} two-topic questions")
+    print(f"{'context':>34} | topic coverage | context tokens | retrieval ms")
+    for label, retrieve in (
+            ("top-5 (hybrid)", lambda vs, q: [d for d, _ in hybrid_search(vs, q, 5)]),
+            (f"top-{RERANK_FETCH_K} → rerank + MMR → 3",
+             lambda vs, q: [d for d, _ in rerank_documents(q, [d for d, _ in hybrid_search(vs, q, RERANK_FETCH_K)], 3)])):
+        coverage, tokens, ms = measure(retrieve, vectorstore)
+        print(f"{label:>34} | {coverage:14.2f} | {tokens:14.0f} | {ms:12.1f}")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 5_000, sys.argv[2] if len(sys.argv) > 2 else "hashing")
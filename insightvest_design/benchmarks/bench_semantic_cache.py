@@ -0,0 +1,93 @@
+# bench_semantic_cache.py
+# 通用金融问答的缓存对比：精确匹配 (问题, 风格) vs 语义缓存（规范化问题的 embedding 相似度 + 阈值）
+#   python insightvest_design/benchmarks/bench_semantic_cache.py [backend] [llm_latency_s]
+#
+# 问题流由若干概念的不同问法组成（每个概念第一次出现时必然未命中），两种风格交替提问；
+# 未命中时模拟一次 LLM 调用。记录命中率、误命中（返回了另一概念的回答）和命中 / 未命中的平均耗时。
+# 概念中包含只差方向的成对问题（ROE > ROA vs ROA > ROE、high vs low PEG），它们的误命中单独统计。
+# backend 默认取 INSIGHTVEST_EMBEDDING_BACKEND（生产默认 openai，需要 OPENAI_API_KEY）；hashing 后端是词袋，
+# 对词序完全不敏感，不能代表 openai 的误命中率。
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from embedding_backends import default_backend, get_embeddings
+import semantic_cache
+from semantic_cache import DEFAULT_THRESHOLDS, SemanticCache
+
+STYLES = ["📘 Plain English", "📊 Analytical"]
+PARAPHRASES = {
+    "roe": ["What is ROE?", "what does ROE mean", "Explain return on equity", "Can you explain what ROE is?",
+            "Define return on equity."],
+    "roa": ["What is ROA?", "Explain return on assets", "what does ROA mean?"],
+    "peg": ["What is a high PEG ratio?", "What does a high PEG ratio mean?", "Explain a high PEG ratio simply"],
+    "low_peg": ["What is a low PEG ratio?", "What does a low PEG ratio mean?"],
+    "roe_gt_roa": ["Why is ROE higher than ROA?", "Why would return on equity be higher than return on assets?"],
+    "roa_gt_roe": ["Why is ROA higher than ROE?", "Why would return on assets be higher than return on equity?"],
+    "rising_rates": ["How do rising interest rates affect bond prices?"],
+    "falling_rates": ["How do falling interest rates affect bond prices?"],
+    "fcf": ["How is free cash flow calculated?", "How is FCF calculated?", "how is free cash flow calculated"],
+    "ebitda": ["What is EBITDA?", "Explain EBITDA", "What does EBITDA mean?"],
+    "wacc": ["What is WACC?", "Explain the weighted average cost of capital", "what is wacc"],
+    "dividend": ["What is a dividend yield?", "Explain dividend yield", "What does dividend yield mean?"],
+    "short": ["What is short selling?", "Explain short selling", "Can you explain short selling?"],
+}
+# 只差方向的概念对：互相命中即为方向性误命中
+OPPOSITES = {("peg", "low_peg"), ("roe_gt_roa", "roa_gt_roe"), ("rising_rates", "falling_rates")}
+
+
+def question_stream(seed=0):
+    rng = random.Random(seed)
+    asked = [(concept, q, style) for concept, questions in PARAPHRASES.items() for q in questions for style in STYLES]
+    rng.shuffle(asked)
+    return asked
+
+
+def run(backend=None, llm_latency=1.5):
+    backend = backend or default_backend()
+    embeddings, model_name = get_embeddings(backend)
+    asked = question_stream()
+    print(f"{len(asked)} questions ({len(PARAPHRASES)} concepts × {len(STYLES)} styles), backend {model_name}, "
+          f"simulated LLM {llm_latency:.1f} s")
+    print(f"{'cache':>18} | hit rate | false hits | direction | avg hit ms | avg miss ms | total s")
+
+    # 精确匹配：相当于 llm_cache 的 (渲染后的 prompt) 键
+    exact, hits, start = {}, 0, time.perf_counter()
+    for concept, question, style in asked:
+        if (question, style) in exact:
+            hits += 1
+        else:
+            exact[(question, style)] = concept
+    exact_total = (len(asked) - hits) * llm_latency + time.perf_counter() - start
+    print(f"{'exact (q, style)':>18} | {hits / len(asked):8.2f} | {0:10d} | {0:9d} | {'-':>10} | {llm_latency * 1000:11.0f} | "
+          f"{exact_total:7.1f}")
+
+    # 对照：关闭方向检查，只看向量相似度
+    for label, direction_check in [("semantic, no dir.", lambda question, cached: True),
+                                   ("semantic", semantic_cache.same_direction)]:
+        semantic_cache.same_direction = direction_check
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = SemanticCache(os.path.join(tmp, "semantic_qa.sqlite"), embeddings=embeddings,
+                                  threshold=DEFAULT_THRESHOLDS[backend])
+            false_hits, direction_hits, miss_ms = 0, 0, []
+            for concept, question, style in asked:
+                hit = cache.lookup(question, style)
+                if hit is not None:
+                    false_hits += hit.answer != concept
+                    direction_hits += (concept, hit.answer) in OPPOSITES or (hit.answer, concept) in OPPOSITES
+                    continue
+                start = time.perf_counter()
+                cache.add(question, style, concept, elapsed=llm_latency)
+                miss_ms.append((time.perf_counter() - start) * 1000)
+            stats = cache.stats()
+            total = stats["misses"] * llm_latency + (stats["hits"] * (stats["avg_hit_ms"] or 0) + sum(miss_ms)) / 1000
+            print(f"{label:>18} | {stats['hit_rate']:8.2f} | {false_hits:10d} | {direction_hits:9d} | "
+                  f"{stats['avg_hit_ms'] or 0:10.1f} | {stats['avg_miss_ms']:11.0f} | {total:7.1f}")
+
+if __name__ == "__main__":
+    run(sys.argv[1] if len(sys.argv) > 1 else None, float(sys.argv[2]) if len(sys.argv) > 2 else 1.5)
@@ -0,0 +1,76 @@
+# bench_vectorstore_load.py
+# 冷启动对比：LangChain save_local（index.faiss + index.pkl，整体读入内存）与
+# 版本目录格式（mmap 索引 + SQLite docstore）的加载耗时、首次查询耗时和进程常驻内存增量（Linux /proc）
+#   python insightvest_design/benchmarks/bench_vectorstore_load.py [n_chunks]
+#
+# 每种格式在独立子进程中加载，避免共享已加载的对象；向量为随机数据，查询使用 hashing 后端。
+
+import os
+import subprocess
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import faiss
+import numpy as np
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+
+from embedding_backends import HASHING_FEATURES, HashingEmbeddings
+from vectorstore_storage import save_version
+
+_CHILD = """
+import os, sys, time
+sys.path.insert(0, {root!r})
+from rag_vectorstore import load_vectorstore
+from langchain_community.vectorstores import FAISS
+from embedding_backends import HashingEmbeddings
+rss = lambda: int(open("/proc/self/statm").read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+base = rss()
+start = time.perf_counter()
+if {legacy}:
+    vs = FAISS.load_local({path!r}, HashingEmbeddings(), allow_dangerous_deserialization=True)
+else:
+    vs = load_vectorstore({path!r})
+loaded = time.perf_counter()
+vs.similarity_search("liquidity risk from revolving credit facility covenants", k=5)
+queried = time.perf_counter()
+print(loaded - start, queried - loaded, rss() - base)
+"""
+
+
+def make_store(n, dimension=HASHING_FEATURES, seed=0):
+    rng = np.random.default_rng(seed)
+    index = faiss.IndexFlatL2(dimension)
+    for start in range(0, n, 50_000):
+        index.add(rng.normal(size=(min(50_000, n - start), dimension)).astype(np.float32))
+    ids = [f"doc:{i:07d}" for i in range(n)]
+    docs = {_id: Document(page_content=f"chunk {i} " + "liquidity risk covenant revenue " * 40,
+                          metadata={"page": i % 300, "section": "7", "doc_id": "doc"}) for i, _id in enumerate(ids)}
+    return FAISS(HashingEmbeddings(), index, InMemoryDocstore(docs), dict(enumerate(ids)))
+
+
+def run(n=100_000):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    with tempfile.TemporaryDirectory() as tmp:
+        vectorstore = make_store(n)
+        legacy_path, store_path = os.path.join(tmp, "legacy.faiss"), os.path.join(tmp, "store.faiss")
+        vectorstore.save_local(legacy_path)
+        save_version(store_path, vectorstore, {"embedding_backend": "hashing", "embedding_model": "hashing-1024",
+                                               "dimension": HASHING_FEATURES, "filings": {}})
+        del vectorstore
+
+        print(f"{n} chunks × {HASHING_FEATURES} dims")
+        print(f"{'format':>26} | load ms | first query ms | RSS +MB")
+        for label, path, legacy in (("save_local (pickle)", legacy_path, True),
+                                    ("mmap + SQLite docstore", store_path, False)):
+            out = subprocess.run([sys.executable, "-c", _CHILD.format(root=root, path=path, legacy=legacy)],
+                                 capture_output=True, text=True, check=True).stdout.split()
+            load_s, query_s, rss_mb = map(float, out[-3:])
+            print(f"{label:>26} | {load_s * 1000:7.1f} | {query_s * 1000:14.1f} | {rss_mb:7.1f}")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
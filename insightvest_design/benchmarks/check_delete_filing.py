@@ -0,0 +1,81 @@
+# check_delete_filing.py
+# 各索引类型的 delete_filing → 查询一致性检查：删除一个文件并追加另一个文件后，剩余 chunk 以原文查询应能检索到自己
+# （索引标签与 docstore 一致），且不会返回已删除文件的 chunk
+#   python insightvest_design/benchmarks/check_delete_filing.py [n_pages]
+#
+# 使用 hashing 后端（不调用 API）和合成 10-K PDF；为了让小规模数据也能建出 IVF-PQ，临时放宽 ann_index.MIN_VECTORS。
+
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ann_index
+from extraction_cache import file_sha256
+from rag_vectorstore import add_filings_to_vectorstore, delete_filing, load_vectorstore, read_manifest
+from synthetic_filing import make_filing_pages, make_pdf_bytes
+
+CONFIGS = [
+    ("flat", {}),
+    ("ivf_flat", {}),
+    ("ivf_pq", {}),
+    ("ivf_pq", {"refine": True}),
+    ("hnsw", {}),
+]
+SELF_QUERIES = 40
+MIN_SELF_RECALL = 0.8      # IVF-PQ 为有损压缩，不要求全部命中
+
+
+def _filing(name, n_pages, seed):
+    return name, make_pdf_bytes(make_filing_pages(n_pages, company=name.upper(), seed=seed))
+
+
+def check(index_type, options, filings, tmp):
+    path = os.path.join(tmp, f"{index_type}{'_refine' if options else ''}.faiss")
+    add_filings_to_vectorstore(path, filings[:2], backend="hashing", index_type=index_type, index_options=options)
+    deleted = file_sha256(filings[0][1])
+    delete_filing(path, deleted)
+    add_filings_to_vectorstore(path, filings[2:], backend="hashing")
+    added = file_sha256(filings[2][1])
+
+    vectorstore = load_vectorstore(path)
+    errors = []
+    remaining = [vectorstore.docstore.search(vectorstore.index_to_docstore_id[i])
+                 for i in range(0, vectorstore.index.ntotal, max(1, vectorstore.index.ntotal // SELF_QUERIES))]
+    if any(d.metadata.get("doc_id") == deleted for d in remaining):
+        errors.append("docstore still contains chunks of the deleted filing")
+    # 以剩余 chunk 的原文查询，应能检索到它自己；标签错位时会返回其他 chunk 或 KeyError
+    found = 0
+    for doc in remaining:
+        try:
+            results = vectorstore.similarity_search(doc.page_content, k=10)
+        except Exception as e:
+            errors.append(f"query raised {type(e).__name__}: {e}")
+            break
+        found += any(r.page_content == doc.page_content for r in results)
+        if any(r.metadata.get("doc_id") == deleted for r in results):
+            errors.append("query returned a chunk of the deleted filing")
+            break
+    if found < MIN_SELF_RECALL * len(remaining):
+        errors.append(f"only {found}/{len(remaining)} remaining chunks retrieve themselves")
+    if not any(d.metadata.get("doc_id") == added for d in remaining):
+        errors.append("filing added after the delete is missing from the docstore")
+    factory = read_manifest(path)["index"]["factory"]
+    print(f"{factory:>28} | ntotal {vectorstore.index.ntotal:5d} | self-recall {found}/{len(remaining)} | "
+          f"{'OK' if not errors else 'FAILED'}")
+    for error in errors:
+        print(f"{'':>28}   {error}")
+    return not errors
+
+
+def run(n_pages=40):
+    ann_index.MIN_VECTORS = {key: 0 for key in ann_index.MIN_VECTORS}
+    filings = [_filing(f"filing{i}", n_pages, seed=i) for i in range(3)]
+    with tempfile.TemporaryDirectory() as tmp:
+        results = [check(index_type, options, filings, tmp) for index_type, options in CONFIGS]
+    sys.exit(0 if all(results) else 1)
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 40)
@@ -0,0 +1,111 @@
+# synthetic_filing.py
+# 生成结构类似 10-K 的合成文本/PDF，供 benchmarks 使用（无需真实财报或第三方 PDF 库）
+
+import random
+import textwrap
+
+ITEMS = [
+    ("1", "Business"),
+    ("1A", "Risk Factors"),
+    ("1B", "Unresolved Staff Comments"),
+    ("2", "Properties"),
+    ("3", "Legal Proceedings"),
+    ("7", "Management's Discussion and Analysis of Financial Condition and Results of Operations"),
+    ("7A", "Quantitative and Qualitative Disclosures About Market Risk"),
+    ("8", "Financial Statements and Supplementary Data"),
+    ("9A", "Controls and Procedures"),
+]
+# 各 Item 占正文页数的权重
+ITEM_WEIGHTS = {"1": 3, "1A": 5, "1B": 0.2, "2": 0.5, "3": 0.5, "7": 5, "7A": 1, "8": 8, "9A": 0.8}
+
+VOCAB = (
+    "revenue liquidity capital debt covenant interest rate exposure foreign currency supply chain "
+    "customers competition regulatory compliance cybersecurity litigation goodwill impairment "
+    "operating margin cash flow credit facility inventory demand pricing tax reserve pension "
+    "derivative hedging counterparty segment growth acquisition integration workforce climate "
+    "disclosure controls audit estimate assumption fair value lease obligation dividend repurchase"
+).split()
+FILLER = "the our we may could would which and of to in for with on by as from under".split()
+
+LINES_PER_PAGE = 60
+LINE_WIDTH = 100
+
+
+def _sentence(rng):
+    words = [rng.choice(VOCAB if rng.random() < 0.55 else FILLER) for _ in range(rng.randint(12, 24))]
+    return " ".join(words).capitalize() + "."
+
+
+def _paragraph(rng):
+    return " ".join(_sentence(rng) for _ in range(rng.randint(3, 7)))
+
+
+def make_filing_pages(n_pages=300, company="ACME CORP", year=2023, seed=0, facts=None):
+    """返回 n_pages 页纯文本；facts 为 {item: [句子]}，会被插入对应 Item 的正文中"""
+    rng = random.Random(seed)
+    header = f"{company} | {year} Annual Report on Form 10-K"
+    facts = facts or {}
+
+    pages = [
+        f"UNITED STATES SECURITIES AND EXCHANGE COMMISSION\nFORM 10-K\n"
+        f"ANNUAL REPORT PURSUANT TO SECTION 13 OR 15(d)\nFor the fiscal year ended December 31, {year}\n"
+        f"{company}\nTrading Symbol(s): ACME\n",
+        "TABLE OF CONTENTS\n" + "\n".join(f"Item {item}. {title} {i * 7 + 3}"
+                                          for i, (item, title) in enumerate(ITEMS)),
+    ]
+
+    body_pages = n_pages - len(pages)
+    total_weight = sum(ITEM_WEIGHTS.values())
+    lines = []
+    for item, title in ITEMS:
+        item_lines = max(LINES_PER_PAGE // 2, int(body_pages * LINES_PER_PAGE * ITEM_WEIGHTS[item] / total_weight))
+        lines.append(f"Item {item}. {title}")
+        paragraphs = []
+        while sum(len(p) // LINE_WIDTH + 2 for p in paragraphs) < item_lines:
+            paragraphs.append(_paragraph(rng))
+        for fact in facts.get(item, []):
+            paragraphs.insert(rng.randrange(len(paragraphs) + 1), fact)
+        for paragraph in paragraphs:
+            lines.extend(textwrap.wrap(paragraph, LINE_WIDTH))
+            lines.append("")
+
+    per_page = LINES_PER_PAGE - 2
+    for start in range(0, len(lines), per_page):
+        if len(pages) >= n_pages:
+            break
+        page_no = len(pages) + 1
+        pages.append("\n".join([header] + lines[start:start + per_page] + [str(page_no)]))
+    return pages
+
+
+def _escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def make_pdf_bytes(pages):
+    """将每页文本写成最小化的 PDF 1.4（Helvetica，单栏）"""
+    n = len(pages)
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        ("<< /Type /Pages /Kids [%s] /Count %d >>"
+         % (" ".join(f"{4 + 2 * i} 0 R" for i in range(n)), n)).encode(),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    for i, text in enumerate(pages):
+        stream = "BT /F1 9 Tf 11 TL 40 760 Td\n" + "".join(
+            f"({_escape(line)}) Tj T*\n" for line in text.split("\n")) + "ET"
+        stream = stream.encode("latin-1", "replace")
+        objects.append(("<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                        "/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % (5 + 2 * i)).encode())
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref_offset = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref_offset)
+    return bytes(out)
@@ -0,0 +1,50 @@
+# bm25_index.py
+# 关键词倒排索引（SQLite FTS5，BM25 打分）：补足 embedding 检索对专有名词（"goodwill impairment"、"Basel III"、
+# "covenant"）的遗漏，并与向量检索结果做 reciprocal rank fusion
+#
+# FTS5 表以 external content 方式挂在 docstore 的 chunks 表上（rowid = FAISS position），
+# 只保存倒排表、不重复保存正文，随版本目录一起写出、只读打开。
+
+import re
+
+FTS_TABLE = "chunks_fts"
+FTS_TOKENIZER = "porter unicode61"    # 小写化 + Porter 词干（impairment / impairments 视为同一词）
+RRF_K = 60                            # RRF 平滑常数（Cormack et al. 的经验值）
+
+_QUERY_TOKEN_RE = re.compile(r"[A-Za-z0-9]+")
+# 问句中的功能词：匹配几乎所有 chunk，只会拖慢 FTS 查询
+_STOPWORDS = frozenset(
+    "a an and are as at be by did do does for from has have how in is it its of on or that the their this to "
+    "was were what when where which who why will with about describe describes company companys".split()
+)
+
+
+def create_text_index(conn, content_table="chunks"):
+    """在已写入的 chunks 表上建立 FTS5 倒排索引"""
+    conn.execute(f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+                 f"text, content='{content_table}', content_rowid='position', tokenize='{FTS_TOKENIZER}')")
+    conn.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+    conn.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')")
+
+
+def query_terms(query):
+    """问题中的检索词（小写、去重、去掉功能词），保持原顺序"""
+    terms = []
+    for token in _QUERY_TOKEN_RE.findall(query.lower()):
+        if token not in _STOPWORDS and token not in terms:
+            terms.append(token)
+    return terms
+
+
+def match_expression(query):
+    """自然语言问题 → FTS5 查询：各检索词 OR 连接（BM25 对命中词数和稀有度加权）"""
+    return " OR ".join(f'"{t}"' for t in query_terms(query))
+
+
+def reciprocal_rank_fusion(rankings, k=RRF_K):
+    """rankings: 多个按相关性降序的 position 列表 → [(position, RRF 分数)]，分数降序"""
+    scores = {}
+    for ranking in rankings:
+        for rank, position in enumerate(ranking):
+            scores[position] = scores.get(position, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores.items(), key=lambda item: -item[1])
@@ -0,0 +1,142 @@
+# chunk_dedupe.py
+# Embedding / LLM 调用前的去重：页眉页脚等样板行、完全重复 chunk、近似重复 chunk（MinHash + LSH）
+
+import hashlib
+import re
+import zlib
+from collections import Counter
+
+import numpy as np
+
+from token_utils import count_tokens
+
+# === MinHash 参数 ===
+SHINGLE_WORDS = 5             # 以 5 个词为一个 shingle
+NUM_PERM = 64                 # 签名长度
+LSH_BANDS = 16                # 16 band × 4 行：Jaccard ≈ 0.8 以上几乎必进同一桶
+NEAR_DUP_THRESHOLD = 0.85     # 签名估计的 Jaccard 相似度达到该值视为近似重复
+
+_PRIME = (1 << 31) - 1
+_rng = np.random.default_rng(20240601)
+_PERM_A = _rng.integers(1, _PRIME, NUM_PERM, dtype=np.uint64)
+_PERM_B = _rng.integers(0, _PRIME, NUM_PERM, dtype=np.uint64)
+
+# 样板行：页码（"12"、"Page 12 of 80"），以及多数页面的顶部 / 底部都出现的短行（页眉、页脚、公司名横幅）
+_PAGE_NUMBER_RE = re.compile(r"^(?:page\s*)?#(?:\s*(?:of|/)\s*#)?$")
+_WORD_RE = re.compile(r"[a-z]{2,}")
+# 含金额 / 百分比 / 千分位或小数的行是表格数据，按原文比较（不把数字归一化）
+_FIGURE_RE = re.compile(r"[$€£¥%]|\d\.\d|\d,\d{3}")
+
+
+def _normalize(text):
+    return re.sub(r"\s+", " ", text.lower()).strip()
+
+
+def minhash_signature(text):
+    words = _normalize(text).split()
+    shingles = {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(max(1, len(words) - SHINGLE_WORDS + 1))}
+    hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles))
+    # a < 2^31, h < 2^32：乘积不会溢出 uint64
+    return ((_PERM_A[:, None] * hashes[None, :] + _PERM_B[:, None]) % _PRIME).min(axis=1)
+
+
+class BoilerplateLineFilter:
+    """逐页去除样板行；可在流式解析时使用
+
+    只检查每页开头 / 结尾 edge_lines 行（页眉页脚的位置）：一行已在此前至少 min_pages 页、
+    且不少于已读页数 min_share 比例的页面的同一位置出现过，即视为页眉/页脚，从本页删除。
+    正文和财务报表中的重复行（"Total assets ..."）不在页眉页脚位置，不受影响；
+    页码之外的行还须含两个以上英文单词，数字只在不含金额 / 百分比的行中归一化（页码、年份变化的页脚）。
+    """
+
+    def __init__(self, min_pages=3, min_share=0.5, edge_lines=3, max_line_chars=120):
+        self.min_pages = min_pages
+        self.min_share = min_share
+        self.edge_lines = edge_lines
+        self.max_line_chars = max_line_chars
+        self.tokens_removed = 0
+        self._pages = 0
+        self._line_pages = Counter()
+
+    def _key(self, line):
+        normalized = _normalize(line)
+        return normalized if _FIGURE_RE.search(normalized) else re.sub(r"\d+", "#", normalized)
+
+    def clean(self, page_text):
+        lines = page_text.split("\n")
+        content = [i for i, line in enumerate(lines) if line.strip()]
+        edge = set(content[:self.edge_lines] + content[-self.edge_lines:])
+        threshold = max(self.min_pages, self.min_share * self._pages)
+        kept, removed, seen = [], [], set()
+        for i, line in enumerate(lines):
+            if i in edge:
+                key = self._key(line)
+                if _PAGE_NUMBER_RE.match(re.sub(r"\d+", "#", _normalize(line))):
+                    removed.append(line)
+                    continue
+                if len(key) <= self.max_line_chars and len(_WORD_RE.findall(key)) >= 2:
+                    seen.add(key)
+                    if self._line_pages[key] >= threshold:
+                        removed.append(line)
+                        continue
+            kept.append(line)
+        self._line_pages.update(seen)
+        self._pages += 1
+        if removed:
+            self.tokens_removed += count_tokens("\n".join(removed))
+        return "\n".join(kept)
+
+
+class ChunkDeduplicator:
+    """精确去重（规范化文本 SHA-1）+ 近似去重（MinHash 签名 + LSH 分桶）；先出现的 chunk 保留"""
+
+    def __init__(self, threshold=NEAR_DUP_THRESHOLD, bands=LSH_BANDS):
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = NUM_PERM // bands
+        self.stats = Counter()
+        self._exact = set()
+        self._buckets = [dict() for _ in range(bands)]
+        self._signatures = []
+
+    def is_duplicate(self, text):
+        """返回 "exact" / "near" / None；非重复的 chunk 会被登记"""
+        tokens = count_tokens(text)
+        self.stats["chunks_in"] += 1
+        self.stats["tokens_in"] += tokens
+
+        digest = hashlib.sha1(_normalize(text).encode("utf-8")).digest()
+        if digest in self._exact:
+            return self._count_duplicate("exact", tokens)
+
+        signature = minhash_signature(text)
+        band_keys = [signature[b * self.rows:(b + 1) * self.rows].tobytes() for b in range(self.bands)]
+        candidates = {i for b, key in enumerate(band_keys) for i in self._buckets[b].get(key, ())}
+        for i in candidates:
+            if np.mean(self._signatures[i] == signature) >= self.threshold:
+                return self._count_duplicate("near", tokens)
+
+        self._exact.add(digest)
+        index = len(self._signatures)
+        self._signatures.append(signature)
+        for b, key in enumerate(band_keys):
+            self._buckets[b].setdefault(key, []).append(index)
+        self.stats["kept"] += 1
+        return None
+
+    def _count_duplicate(self, kind, tokens):
+        self.stats[f"{kind}_duplicates"] += 1
+        self.stats["tokens_saved"] += tokens
+        return kind
+
+    def filter(self, texts):
+        return [text for text in texts if self.is_duplicate(text) is None]
+
+
+def dedupe_report(deduplicator, line_filter=None):
+    """汇总一份文件的去重结果（可 JSON 序列化）"""
+    stats = {key: int(deduplicator.stats[key]) for key in
+             ("chunks_in", "kept", "exact_duplicates", "near_duplicates", "tokens_in", "tokens_saved")}
+    stats["boilerplate_tokens_removed"] = line_filter.tokens_removed if line_filter else 0
+    stats["total_tokens_saved"] = stats["tokens_saved"] + stats["boilerplate_tokens_removed"]
+    return stats
@@ -0,0 +1,155 @@
+# chunker.py
+# 统一分块：按模型 token 计数打包句子，优先在段落处断开，不跨越 10-K 章节边界
+# section2_upload_pdf（段落提取）与 rag_vectorstore（向量库）共用
+
+import re
+
+from langchain_core.documents import Document
+
+from token_utils import count_tokens
+
+DEFAULT_MAX_TOKENS = 300
+DEFAULT_OVERLAP_TOKENS = 30
+# 当前 chunk 已达该比例时，放不下的新段落另起一个 chunk，而不是被拆到两个 chunk 里
+PARAGRAPH_BREAK_FILL = 0.5
+
+_PARAGRAPH_RE = re.compile(r"\n\s*\n")
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9\"“(])")
+
+
+class SectionAwareChunker:
+    """流式分块器：feed() 一段文本，返回已经完成的 chunk；章节变化时自动结束当前 chunk
+
+    每个 chunk 为 {"text", "page", "section"}，page 为 chunk 首句所在页。
+    overlap_tokens 为相邻 chunk 之间重复的句子 token 上限（同一章节内）。
+    """
+
+    def __init__(self, max_tokens=DEFAULT_MAX_TOKENS, overlap_tokens=DEFAULT_OVERLAP_TOKENS):
+        if overlap_tokens >= max_tokens:
+            raise ValueError("overlap_tokens must be smaller than max_tokens")
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+        self._units = []      # [(text, tokens, page, separator)]
+        self._tokens = 0
+        self._fresh = 0       # 上次输出后新加入的句子数（不含 overlap 带过来的句子）
+        self._section = None
+        self._started = False
+
+    def feed(self, text, page=None, section=None):
+        chunks = []
+        if self._started and section != self._section:
+            chunks.extend(self.flush())
+        self._section, self._started = section, True
+
+        for paragraph in _PARAGRAPH_RE.split(text):
+            sentences = [(s, count_tokens(s)) for s in self._split_sentences(paragraph)]
+            if not sentences:
+                continue
+            paragraph_tokens = sum(n for _, n in sentences)
+            if (self._tokens + paragraph_tokens > self.max_tokens
+                    and self._tokens >= self.max_tokens * PARAGRAPH_BREAK_FILL):
+                self._break(chunks)
+            for i, (sentence, n) in enumerate(sentences):
+                if self._tokens + n > self.max_tokens:
+                    self._break(chunks)
+                    self._trim_overlap(n)
+                self._units.append((sentence, n, page, " " if i else "\n\n"))
+                self._tokens += n
+                self._fresh += 1
+        return chunks
+
+    def flush(self):
+        """结束当前 chunk（不带 overlap）；用于章节结束、跳过页面或文件结束"""
+        chunks = [self._emit(carry_overlap=False)] if self._fresh else []
+        self._units, self._tokens, self._fresh = [], 0, 0
+        self._started = False
+        return chunks
+
+    def split_text(self, text):
+        return [chunk["text"] for chunk in self.feed(text) + self.flush()]
+
+    def _split_sentences(self, paragraph):
+        for sentence in _SENTENCE_RE.split(paragraph.strip()):
+            sentence = sentence.strip()
+            if not sentence:
+                continue
+            if count_tokens(sentence) <= self.max_tokens:
+                yield sentence
+            else:
+                yield from self._split_oversized(sentence)
+
+    def _split_oversized(self, text):
+        """没有句号的超长文本（表格等）：先按行、再按词切到 max_tokens 以内"""
+        # 按拼接后的整段计数：逐词计数之和会低估（分词与 4 字符估算都不可加）
+        piece = ""
+        for part in re.split(r"(?<=\n)|(?<= )", text):
+            if piece.strip() and count_tokens((piece + part).strip()) > self.max_tokens:
+                yield piece.strip()
+                piece = ""
+            piece += part
+        if piece.strip():
+            yield piece.strip()
+
+    def _break(self, chunks):
+        if self._fresh:
+            chunks.append(self._emit(carry_overlap=True))
+        else:
+            # 只剩 overlap 带过来的句子，不单独成块
+            self._units, self._tokens = [], 0
+
+    def _trim_overlap(self, n):
+        """overlap 带过来的句子加上新句子仍超过 max_tokens 时，从最前面丢弃 overlap 句子"""
+        while self._units and self._tokens + n > self.max_tokens:
+            _, dropped, _, _ = self._units.pop(0)
+            self._tokens -= dropped
+
+    def _emit(self, carry_overlap):
+        units = self._units
+        text = units[0][0] + "".join(sep + unit for unit, _, _, sep in units[1:])
+        chunk = {"text": text, "page": units[0][2], "section": self._section}
+
+        carried, carried_tokens = [], 0
+        if carry_overlap:
+            for unit in reversed(units[1:]):
+                if carried_tokens + unit[1] > self.overlap_tokens:
+                    break
+                carried.insert(0, unit)
+                carried_tokens += unit[1]
+        self._units, self._tokens, self._fresh = carried, carried_tokens, 0
+        return chunk
+
+
+def iter_filing_chunks(pages, indexer, line_filter=None, deduplicator=None, chunker=None,
+                       keep_sections=None, page_filter=None):
+    """10-K 分块流水线：逐页 去样板行 → 识别章节 → 按章节分块 → 去重，yield Document
+
+    pages: 按页顺序的 Document（metadata 含 page）；keep_sections 为空表示保留全部章节。
+    文件尚未出现任何 Item 标题时（封面、非 10-K 文件），只保留 page_filter 返回 True 的页面。
+    """
+    chunker = chunker or SectionAwareChunker()
+
+    def accepted(chunks):
+        for chunk in chunks:
+            if deduplicator is None or deduplicator.is_duplicate(chunk["text"]) is None:
+                yield Document(page_content=chunk["text"],
+                               metadata={"page": chunk["page"], "section": chunk["section"]})
+
+    for doc in pages:
+        page = doc.metadata["page"]
+        text = line_filter.clean(doc.page_content) if line_filter else doc.page_content
+        skip_page = indexer.feed(page, text)  # 目录页
+        if not skip_page and indexer.current is None and page_filter is not None:
+            skip_page = not page_filter(text)
+        if skip_page:
+            yield from accepted(chunker.flush())
+            continue
+
+        for start, end, section in indexer.split_page(page, text):
+            # 按片段自身的章节过滤：同一页里新标题之前的文字仍属于上一章节；
+            # 第一个 Item 标题之前的文字（section 为 None）只在尚未出现标题的页面保留
+            if (keep_sections is not None and section not in keep_sections
+                    and (section is not None or indexer.current is not None)):
+                yield from accepted(chunker.flush())
+                continue
+            yield from accepted(chunker.feed(text[start:end], page, section))
+    yield from accepted(chunker.flush())
@@ -0,0 +1,91 @@
+# embedding_backends.py
+# 可插拔的 embedding 后端：OpenAI（默认）、本地 CPU transformer（从磁盘加载）、哈希词袋（无依赖，离线兜底）
+# 每个向量库在 manifest 中记录构建时使用的后端，加载时用同一后端计算查询向量
+
+import os
+import re
+import zlib
+from functools import lru_cache
+from typing import List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from embedding_cache import CachedEmbeddings
+from embedding_pipeline import EmbeddingPipeline
+
+BACKEND_ENV = "INSIGHTVEST_EMBEDDING_BACKEND"
+LOCAL_MODEL_ENV = "INSIGHTVEST_LOCAL_EMBEDDING_MODEL"
+DEFAULT_BACKEND = "openai"
+DEFAULT_LOCAL_MODEL_PATH = "models/all-MiniLM-L6-v2"
+BACKENDS = ("openai", "local", "hashing")
+
+HASHING_FEATURES = 1024
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:[.'][a-z0-9]+)*")
+
+
+class HashingEmbeddings(Embeddings):
+    """特征哈希词袋（unigram + bigram，带符号，次线性 tf，L2 归一化）
+
+    无需模型文件或网络，适合离线部署和测试；语义能力弱于 transformer，但对 10-K 中的专有名词、数字检索效果尚可。
+    """
+
+    def __init__(self, n_features=HASHING_FEATURES):
+        self.n_features = n_features
+        self.model = f"hashing-{n_features}"
+
+    def _embed(self, text):
+        terms = _TOKEN_RE.findall(text.lower())
+        terms += [f"{a} {b}" for a, b in zip(terms, terms[1:])]
+        vector = np.zeros(self.n_features, dtype=np.float32)
+        if not terms:
+            return vector
+        hashes = np.fromiter((zlib.crc32(t.encode("utf-8")) for t in terms), dtype=np.uint64, count=len(terms))
+        buckets = (hashes % self.n_features).astype(np.int64)
+        signs = np.where((hashes >> 31) & 1, -1.0, 1.0).astype(np.float32)
+        np.add.at(vector, buckets, signs)
+        vector = np.sign(vector) * np.log1p(np.abs(vector))
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(t).tolist() for t in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text).tolist()
+
+
+def _local_transformer(model_path):
+    """从本地目录加载 sentence-transformers 模型（如 all-MiniLM-L6-v2，384 维），CPU 推理"""
+    if not os.path.isdir(model_path):
+        raise FileNotFoundError(f"Local embedding model not found at {model_path} (set {LOCAL_MODEL_ENV})")
+    try:
+        from langchain_community.embeddings import HuggingFaceEmbeddings
+    except ImportError as e:
+        raise ImportError("The local embedding backend requires sentence-transformers "
+                          "(pip install sentence-transformers)") from e
+    return HuggingFaceEmbeddings(model_name=model_path, model_kwargs={"device": "cpu"},
+                                 encode_kwargs={"normalize_embeddings": True, "batch_size": 64})
+
+
+def default_backend():
+    return os.getenv(BACKEND_ENV, DEFAULT_BACKEND).lower()
+
+
+@lru_cache(maxsize=None)
+def get_embeddings(backend=None, model_path=None):
+    """返回 (Embeddings, 模型标识)；同一进程内每个后端只初始化一次（首次查询时才加载模型 / 创建客户端）"""
+    backend = backend or default_backend()
+    if backend == "openai":
+        from langchain_community.embeddings import OpenAIEmbeddings
+        embeddings = CachedEmbeddings(EmbeddingPipeline(OpenAIEmbeddings()))
+        return embeddings, embeddings.model_name
+    if backend == "local":
+        model_path = model_path or os.getenv(LOCAL_MODEL_ENV, DEFAULT_LOCAL_MODEL_PATH)
+        embeddings = CachedEmbeddings(_local_transformer(model_path),
+                                      model_name=f"local:{os.path.basename(os.path.normpath(model_path))}")
+        return embeddings, embeddings.model_name
+    if backend == "hashing":
+        embeddings = HashingEmbeddings()
+        return embeddings, embeddings.model
+    raise ValueError(f"Unknown embedding backend {backend!r}; expected one of {BACKENDS}")
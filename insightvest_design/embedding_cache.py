@@ -0,0 +1,137 @@
+# embedding_cache.py
+# 内容寻址的 embedding 持久化缓存：键为 (模型, chunk 文本 SHA-256)，只有新文本才调用 embedding API
+
+import hashlib
+import os
+import sqlite3
+import threading
+from typing import List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+EMBEDDING_CACHE_PATH = "cache/embeddings.sqlite"
+_SQLITE_MAX_VARIABLES = 900
+
+
+def text_sha256(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """SQLite 存储（WAL 模式），多线程、多进程可同时读写"""
+
+    def __init__(self, path=EMBEDDING_CACHE_PATH):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    model TEXT NOT NULL,
+                    text_hash TEXT NOT NULL,
+                    vector BLOB NOT NULL,
+                    PRIMARY KEY (model, text_hash)
+                ) WITHOUT ROWID
+            """)
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get_many(self, model, hashes):
+        """返回 {text_hash: 向量}，未命中的不在结果中"""
+        found = {}
+        conn = self._connect()
+        unique = list(dict.fromkeys(hashes))
+        for start in range(0, len(unique), _SQLITE_MAX_VARIABLES):
+            batch = unique[start:start + _SQLITE_MAX_VARIABLES]
+            rows = conn.execute(
+                f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({','.join('?' * len(batch))})",
+                [model, *batch]
+            )
+            for text_hash, blob in rows:
+                found[text_hash] = np.frombuffer(blob, dtype=np.float32).tolist()
+        return found
+
+    def put_many(self, model, hashes, vectors):
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, vector) VALUES (?, ?, ?)",
+                [(model, h, np.asarray(v, dtype=np.float32).tobytes()) for h, v in zip(hashes, vectors)]
+            )
+
+
+def embedding_model_name(embeddings):
+    """用于缓存键的模型标识，如 "OpenAIEmbeddings:text-embedding-ada-002"；批处理等包装层不影响键"""
+    while getattr(embeddings, "inner", None) is not None:
+        embeddings = embeddings.inner
+    name = getattr(embeddings, "model", None) or getattr(embeddings, "model_name", None) or ""
+    return f"{type(embeddings).__name__}:{name}"
+
+
+class CachedEmbeddings(Embeddings):
+    """包装任意 LangChain Embeddings：命中缓存的文本直接返回，只把未见过的文本交给底层模型
+
+    同一批中重复的文本只计算一次。只缓存文档（chunk）向量：用户查询各不相同、缓存表又没有淘汰机制，
+    逐条写入只会让表无限增长；重复提问由 llm_cache / semantic_cache 在回答层面命中。
+    """
+
+    def __init__(self, underlying: Embeddings, cache: EmbeddingCache = None, model_name: str = None):
+        self.underlying = underlying
+        self.cache = cache or EmbeddingCache()
+        self.model_name = model_name or embedding_model_name(underlying)
+        self.hits = 0
+        self.misses = 0
+
+    def iter_embedded(self, texts: List[str]):
+        """按完成顺序 yield (原始下标列表, 向量列表)：先返回缓存命中，再返回新计算的批次"""
+        hashes = [text_sha256(t) for t in texts]
+        cached = self.cache.get_many(self.model_name, hashes)
+        hit_indices = [i for i, h in enumerate(hashes) if h in cached]
+        self.hits += len(hit_indices)
+        if hit_indices:
+            yield hit_indices, [cached[hashes[i]] for i in hit_indices]
+
+        pending = {}
+        for i, h in enumerate(hashes):
+            if h not in cached:
+                pending.setdefault(h, []).append(i)
+        if not pending:
+            return
+        miss_hashes = list(pending)
+        miss_texts = [texts[pending[h][0]] for h in miss_hashes]
+        self.misses += len(miss_texts)
+
+        for batch_positions, vectors in self._embed_misses(miss_texts):
+            batch_hashes = [miss_hashes[p] for p in batch_positions]
+            self.cache.put_many(self.model_name, batch_hashes, vectors)
+            indices, out = [], []
+            for h, vector in zip(batch_hashes, vectors):
+                for i in pending[h]:
+                    indices.append(i)
+                    out.append(vector)
+            yield indices, out
+
+    def _embed_misses(self, texts):
+        # 底层是 EmbeddingPipeline 时逐批返回，每批完成即写入缓存
+        iter_batches = getattr(self.underlying, "iter_batches", None)
+        if iter_batches is not None:
+            yield from iter_batches(texts)
+        else:
+            yield list(range(len(texts))), self.underlying.embed_documents(texts)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        result = [None] * len(texts)
+        for indices, vectors in self.iter_embedded(texts):
+            for i, vector in zip(indices, vectors):
+                result[i] = vector
+        return result
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.underlying.embed_query(text)
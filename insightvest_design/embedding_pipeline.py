@@ -0,0 +1,150 @@
+# embedding_pipeline.py
+# 批量并发 embedding：按 token 上限打包 chunk，多个批次并发请求，共享每分钟 token 预算，
+# 失败批次退避重试并拆半，结果按完成顺序流式返回（可边算边写入向量索引）
+
+import random
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import List
+
+from langchain_core.embeddings import Embeddings
+
+from token_utils import count_tokens
+
+# === 默认参数（OpenAI embeddings：单次请求 ≤ 2048 条、≤ 300k token） ===
+MAX_BATCH_TOKENS = 60_000
+MIN_BATCH_TOKENS = 2_000
+MAX_BATCH_SIZE = 512
+MAX_CONCURRENCY = 4
+TOKENS_PER_MINUTE = 1_000_000
+MAX_RETRIES = 5
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 30.0
+GROW_AFTER_SUCCESSES = 4   # 连续成功若干批后，批次 token 上限恢复 ×1.5
+
+
+class TokenRateLimiter:
+    """令牌桶：所有并发请求共享每分钟 token 预算"""
+
+    def __init__(self, tokens_per_minute=TOKENS_PER_MINUTE):
+        self.capacity = tokens_per_minute
+        self.rate = tokens_per_minute / 60.0
+        self._available = float(tokens_per_minute)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens):
+        tokens = min(tokens, self.capacity)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._available = min(self.capacity, self._available + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._available >= tokens:
+                    self._available -= tokens
+                    return
+                wait_seconds = (tokens - self._available) / self.rate
+            time.sleep(wait_seconds)
+
+
+class EmbeddingPipeline(Embeddings):
+    """包装 LangChain Embeddings，对 embed_documents 做批量、并发、限速和重试
+
+    批次大小自适应：请求失败时当前 token 上限减半、失败批次拆成两半重试；
+    连续成功后逐步恢复。单条文本重试 max_retries 次仍失败则抛出异常。
+    """
+
+    def __init__(self, inner: Embeddings, max_batch_tokens=MAX_BATCH_TOKENS, max_batch_size=MAX_BATCH_SIZE,
+                 max_concurrency=MAX_CONCURRENCY, tokens_per_minute=TOKENS_PER_MINUTE, max_retries=MAX_RETRIES):
+        self.inner = inner
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_size = max_batch_size
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.limiter = TokenRateLimiter(tokens_per_minute)
+        self.stats = Counter()
+        self._batch_tokens = max_batch_tokens
+        self._successes = 0
+
+    def iter_batches(self, texts: List[str]):
+        """按完成顺序 yield (texts 中的下标列表, 向量列表)"""
+        tokens = [count_tokens(t) for t in texts]
+        fresh = deque(range(len(texts)))
+        retry = deque()
+        in_flight = {}
+        pool = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="embed")
+        try:
+            while fresh or retry or in_flight:
+                while len(in_flight) < self.max_concurrency and (fresh or retry):
+                    positions, attempt = retry.popleft() if retry else (self._pack(fresh, tokens), 0)
+                    future = pool.submit(self._embed_batch, [texts[i] for i in positions],
+                                         sum(tokens[i] for i in positions), self._backoff(attempt))
+                    in_flight[future] = (positions, attempt)
+
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    positions, attempt = in_flight.pop(future)
+                    try:
+                        vectors = future.result()
+                        if len(vectors) != len(positions):
+                            raise ValueError(f"expected {len(positions)} embeddings, got {len(vectors)}")
+                    except Exception:
+                        if attempt >= self.max_retries:
+                            raise
+                        self.stats["retries"] += 1
+                        self._shrink()
+                        mid = len(positions) // 2
+                        halves = [positions[:mid], positions[mid:]] if mid else [positions]
+                        retry.extend((half, attempt + 1) for half in halves)
+                        continue
+                    self._grow()
+                    self.stats["batches"] += 1
+                    self.stats["texts"] += len(positions)
+                    self.stats["tokens"] += sum(tokens[i] for i in positions)
+                    yield positions, vectors
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        result = [None] * len(texts)
+        for positions, vectors in self.iter_batches(texts):
+            for i, vector in zip(positions, vectors):
+                result[i] = vector
+        return result
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.inner.embed_query(text)
+
+    # === 批次调度 ===
+    def _pack(self, fresh, tokens):
+        positions, total = [], 0
+        while fresh and len(positions) < self.max_batch_size:
+            n = tokens[fresh[0]]
+            if positions and total + n > self._batch_tokens:
+                break
+            positions.append(fresh.popleft())
+            total += n
+        return positions
+
+    def _embed_batch(self, batch, batch_tokens, delay):
+        if delay:
+            time.sleep(delay)
+        self.limiter.acquire(batch_tokens)
+        return self.inner.embed_documents(batch)
+
+    def _backoff(self, attempt):
+        if not attempt:
+            return 0
+        return min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** (attempt - 1)) * random.uniform(0.5, 1.0)
+
+    def _shrink(self):
+        self._batch_tokens = max(MIN_BATCH_TOKENS, self._batch_tokens // 2)
+        self._successes = 0
+
+    def _grow(self):
+        self._successes += 1
+        if self._successes >= GROW_AFTER_SUCCESSES and self._batch_tokens < self.max_batch_tokens:
+            self._batch_tokens = min(self.max_batch_tokens, int(self._batch_tokens * 1.5))
+            self._successes = 0
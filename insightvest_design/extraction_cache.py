@@ -0,0 +1,78 @@
+# extraction_cache.py
+# 按文件内容 SHA-256 持久化 PDF 提取结果：跨用户、跨进程、重启后均可复用
+# 同一文件的预生成摘要保存在旁边的 {hash}.summaries.json（提取结果写入后不再改动，摘要按风格陆续写入）
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+EXTRACTION_CACHE_DIR = "cache/extractions"
+# 提取逻辑（过滤/切分/记录字段）变化时递增，旧缓存自动失效
+EXTRACTION_CACHE_VERSION = 6
+
+
+def file_sha256(file_content):
+    return hashlib.sha256(file_content).hexdigest()
+
+
+_summaries_lock = threading.Lock()
+
+
+def _cache_path(file_hash):
+    return os.path.join(EXTRACTION_CACHE_DIR, f"{file_hash}.json")
+
+
+def _summaries_path(file_hash):
+    return os.path.join(EXTRACTION_CACHE_DIR, f"{file_hash}.summaries.json")
+
+
+def load_extraction(file_hash):
+    """读取缓存的提取结果；不存在、损坏或版本不符时返回 None"""
+    try:
+        with open(_cache_path(file_hash), "r", encoding="utf-8") as f:
+            record = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if record.get("version") != EXTRACTION_CACHE_VERSION:
+        return None
+    return record
+
+
+def _write_json(path, data):
+    """原子写入（临时文件 + os.replace），多个 worker 同时写同一文件也不会读到半截内容"""
+    os.makedirs(EXTRACTION_CACHE_DIR, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=EXTRACTION_CACHE_DIR, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def save_extraction(file_hash, record):
+    record = dict(record, version=EXTRACTION_CACHE_VERSION, file_hash=file_hash)
+    _write_json(_cache_path(file_hash), record)
+    return record
+
+
+def load_summaries(file_hash):
+    """{摘要风格: {"text", "stats", "prompt_version", "map_prompt_version", "combine_prompt_version",
+    "extraction_version"}}；没有时返回 {}"""
+    try:
+        with open(_summaries_path(file_hash), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_summary(file_hash, style, summary):
+    """写入（覆盖）一种风格的摘要，保留其他风格"""
+    with _summaries_lock:
+        summaries = load_summaries(file_hash)
+        summaries[style] = summary
+        _write_json(_summaries_path(file_hash), summaries)
@@ -43,6 +43,9 @@ NEWS_CACHE_DIR = "cache/news"
 os.makedirs(PRICE_CACHE_DIR, exist_ok=True)
 os.makedirs(NEWS_CACHE_DIR, exist_ok=True)
 
+# GPT 技术分析 prompt 版本（修改 generate_tech_summary_gpt 中的模板时递增，使 llm_cache 中的旧摘要失效）
+TECH_SUMMARY_PROMPT_VERSION = "v1"
+
 
 def fetch_tiingo_prices(ticker, start_date, end_date, api_key, auth_method='headers'):
     """使用 Tiingo API 获取历史价格数据，带缓存"""
@@ -765,19 +768,19 @@ def render_fancy_stock_chart():
             # 显示图表
             st.plotly_chart(fig, use_container_width=True)
 
-            # GPT 技术分析摘要（使用 OpenAI 密钥）
-            def get_gpt_summary(prompt: str) -> str:
+            # GPT 技术分析摘要（使用 OpenAI 密钥；逐 token 流式输出）
+            def get_gpt_summary(prompt: str):
                 from langchain.chat_models import ChatOpenAI
+                from llm_streaming import stream_llm
                 try:
                     llm = ChatOpenAI(
                         model="gpt-4",
                         temperature=0.5,
                         openai_api_key=OPENAI_API_KEY
                     )
-                    result = llm.invoke(prompt)
-                    return result.content if hasattr(result, "content") else str(result)
+                    yield from stream_llm(llm, prompt, prompt_version=TECH_SUMMARY_PROMPT_VERSION)
                 except Exception as e:
-                    return f"⚠️ GPT 分析生成失败：{e}. 请检查 OPENAI_API_KEY 是否正确（https://platform.openai.com）。"
+                    yield f"⚠️ GPT 分析生成失败：{e}. 请检查 OPENAI_API_KEY 是否正确（https://platform.openai.com）。"
 
             def generate_tech_summary_gpt(ticker, current_price, ma20, ma50, rsi, macd, signal):
                 ma20_str = f"{ma20:.2f}" if pd.notna(ma20) else "N/A"
@@ -828,7 +831,7 @@ def render_fancy_stock_chart():
                     macd=macd,
                     signal=signal
                 )
-                st.markdown(gpt_summary)
+                st.write_stream(gpt_summary)
                 st.markdown("</div>", unsafe_allow_html=True)
 
                 # 价格历史数据表格
@@ -0,0 +1,124 @@
+# federated_retrieval.py
+# 跨多个公司向量库的联邦检索：同一问题并行查询 N 个库，按归一化分数合并 top-k，并为每个结果标注来源公司
+# 用于同业对比（"AAPL 和 MSFT 如何描述供应链风险"），无需把各公司合并成一个大索引；各库仍经注册表共享加载
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import List
+
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from pydantic import ConfigDict
+
+from bm25_index import RRF_K
+from rerank import RERANK_FETCH_K, rerank_documents
+from retrieval import filtered_search, hybrid_search
+from vectorstore_registry import get_registry
+
+MAX_PARALLEL_STORES = 8
+
+
+@lru_cache(maxsize=1)
+def _executor():
+    """进程内共用的线程池（faiss 搜索和 SQLite 读取都会释放 GIL）"""
+    return ThreadPoolExecutor(max_workers=MAX_PARALLEL_STORES, thread_name_prefix="federated")
+
+
+def store_name(path):
+    return os.path.splitext(os.path.basename(os.path.normpath(path)))[0]
+
+
+def normalized_score(score, hybrid):
+    """把各库的分数换算到 [0, 1]（越大越相关），使不同库的结果可以直接比较
+
+    向量检索：embedding 均为单位向量，L2² 距离 d 对应余弦相似度 1 - d / 2；
+    hybrid：RRF 分数除以两路都排第一时的最大值。
+    """
+    if hybrid:
+        return score / (2.0 / (RRF_K + 1))
+    return max(0.0, 1.0 - score / 2.0)
+
+
+def _search_store(registry, path, query, k, metadata_filter, hybrid):
+    search = hybrid_search if hybrid else filtered_search
+    with registry.lease(path) as vectorstore:
+        results = search(vectorstore, query, k, metadata_filter)
+    tagged = []
+    for doc, score in results:
+        # InMemoryDocstore 返回的是库中对象本身，复制后再加标注
+        metadata = dict(doc.metadata, company=doc.metadata.get("ticker") or store_name(path), store=path)
+        tagged.append((Document(page_content=doc.page_content, metadata=metadata), normalized_score(score, hybrid)))
+    return tagged
+
+
+def federated_search(store_paths, query, k, metadata_filter=None, hybrid=False, registry=None, per_store_k=None):
+    """[(Document, 归一化分数)]，分数降序，最多 k 个；metadata["company"] 为来源公司（ticker，缺省为库名）
+
+    每个库取 per_store_k 个候选（默认 k），合并后候选总数随库的数量线性增长。
+    """
+    registry = registry or get_registry()
+    per_store_k = per_store_k or k
+    futures = [_executor().submit(_search_store, registry, path, query, per_store_k, metadata_filter, hybrid)
+               for path in store_paths]
+    merged = [item for future in futures for item in future.result()]
+    merged.sort(key=lambda item: -item[1])
+    return merged[:k]
+
+
+def ensure_each_store(selected, candidates, k):
+    """同业对比时每家有候选的公司至少保留一个结果：用缺席公司的最佳候选替换结果最多的公司中排名最低的一个
+
+    selected / candidates 均为按相关性降序的 Document 列表；公司数多于 k 时只保证前 k 家。
+    """
+    selected = list(selected[:k])
+    present = {doc.metadata["store"] for doc in selected}
+    for doc in candidates:
+        store = doc.metadata["store"]
+        if store in present:
+            continue
+        present.add(store)
+        if len(selected) < k:
+            selected.append(doc)
+            continue
+        counts = {}
+        for kept in selected:
+            counts[kept.metadata["store"]] = counts.get(kept.metadata["store"], 0) + 1
+        # 从后往前找结果多于一个的公司
+        for i in range(len(selected) - 1, -1, -1):
+            if counts[selected[i].metadata["store"]] > 1:
+                selected[i] = doc
+                break
+        else:
+            break
+    return selected
+
+
+class FederatedRetriever(BaseRetriever):
+    """LangChain 检索器：在 store_paths 的每个库中检索（同一 metadata_filter），合并后取 k 个
+
+    rerank=True 时每个库取 fetch_k 个候选，合并后统一重排 + MMR（不同公司的段落天然互不重复）。
+    合并后的结果中每家有命中的公司至少保留一个（见 ensure_each_store），避免对比时某家公司整个缺席。
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    store_paths: list
+    k: int = 6
+    metadata_filter: dict = {}
+    hybrid: bool = False
+    rerank: bool = False
+    fetch_k: int = RERANK_FETCH_K
+    registry: object = None
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        fetch_k = max(self.fetch_k, self.k) if self.rerank else self.k
+        candidates = [doc for doc, _ in federated_search(self.store_paths, query, fetch_k * len(self.store_paths),
+                                                         self.metadata_filter, self.hybrid, self.registry,
+                                                         per_store_k=fetch_k)]
+        if self.rerank:
+            selected = [doc for doc, _ in rerank_documents(query, candidates, self.k)]
+        else:
+            selected = candidates[:self.k]
+        return ensure_each_store(selected, candidates, self.k)
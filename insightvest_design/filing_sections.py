@@ -0,0 +1,186 @@
+# filing_sections.py
+# 10-K 结构解析：识别 Item 标题（1, 1A, 7, 7A, 8 ...）及财报附注，记录页码与字符偏移
+
+import re
+
+SECTION_TITLES = {
+    "1": "Business",
+    "1A": "Risk Factors",
+    "1B": "Unresolved Staff Comments",
+    "1C": "Cybersecurity",
+    "2": "Properties",
+    "3": "Legal Proceedings",
+    "4": "Mine Safety Disclosures",
+    "5": "Market for Registrant's Common Equity",
+    "6": "Reserved",
+    "7": "Management's Discussion and Analysis",
+    "7A": "Quantitative and Qualitative Disclosures About Market Risk",
+    "8": "Financial Statements and Supplementary Data",
+    "9": "Changes in and Disagreements with Accountants",
+    "9A": "Controls and Procedures",
+    "9B": "Other Information",
+    "10": "Directors, Executive Officers and Corporate Governance",
+    "11": "Executive Compensation",
+    "12": "Security Ownership",
+    "13": "Certain Relationships and Related Transactions",
+    "14": "Principal Accountant Fees and Services",
+    "15": "Exhibits and Financial Statement Schedules",
+    "16": "Form 10-K Summary",
+    "Notes": "Notes to Financial Statements",
+}
+
+# 摘要 / RAG / Prompt 默认关注的章节
+CORE_SECTIONS = ["1", "1A", "7", "7A", "8", "Notes"]
+
+# 标题必须位于行首，正文中的 "see Item 7" 之类交叉引用不会误判
+_ITEM_RE = re.compile(r"^[ \t]*item[ \t]+(\d{1,2}[abc]?)\b[ \t]*[.:\-–—]?", re.IGNORECASE | re.MULTILINE)
+_NOTES_RE = re.compile(r"^[ \t]*notes[ \t]+to[ \t]+(?:the[ \t]+)?(?:consolidated[ \t]+)?financial[ \t]+statements\b",
+                       re.IGNORECASE | re.MULTILINE)
+# 正文开始前，同一页出现这么多不同 Item 标题时视为目录页，忽略其中的标题
+# （正文中篇幅很短的 Item 2/3/4/5 可能同在一页，因此识别出首个正文章节后不再按数量判断）
+TOC_MIN_HEADINGS = 4
+# 目录条目：不超过 TOC_ENTRY_MAX_CHARS 的标题行以点线引导符或页码结尾（"Item 7. Management's Discussion ....... 35"）
+_TOC_ENTRY_RE = re.compile(r"(?:\.{3,}|[ \t]\d{1,3})[ \t]*$")
+TOC_ENTRY_MAX_CHARS = 120
+
+# 封面上的 "For the fiscal year ended December 31, 2023"
+_FISCAL_YEAR_RE = re.compile(r"fiscal\s+year\s+ended\s+[A-Za-z]+\s+\d{1,2},?\s+((?:19|20)\d{2})", re.IGNORECASE)
+_YEAR_RE = re.compile(r"(?<!\d)((?:19|20)\d{2})(?!\d)")
+
+
+def detect_fiscal_year(text, fallback_name=None):
+    """从封面文本识别财年；识别不到时尝试从文件名中取四位年份"""
+    m = _FISCAL_YEAR_RE.search(text or "")
+    if m:
+        return m.group(1)
+    m = _YEAR_RE.search(fallback_name or "")
+    return m.group(1) if m else None
+
+
+def _is_toc_entry(line):
+    return len(line.strip()) <= TOC_ENTRY_MAX_CHARS and _TOC_ENTRY_RE.search(line) is not None
+
+
+class SectionIndexer:
+    """逐页增量识别章节；可在流式解析 PDF 时边读边用
+
+    字符偏移以各页文本用 "\\n" 拼接后的全文为准。每个 Item 只取目录之后的首次出现，
+    "Item 1A. Risk Factors (continued)" 这类重复标题不会重新开始章节。
+    """
+
+    def __init__(self):
+        self.sections = []
+        self.fiscal_year = None
+        self.page_offsets = {}
+        self._seen = set()
+        self._char_offset = 0
+
+    @property
+    def current(self):
+        return self.sections[-1]["id"] if self.sections else None
+
+    def feed(self, page_number, text):
+        """读入一页；返回该页是否为目录页"""
+        headings = [(m.start(), m.group(1).upper()) for m in _ITEM_RE.finditer(text)]
+        headings += [(m.start(), "Notes") for m in _NOTES_RE.finditer(text)]
+        headings.sort()
+
+        if self.fiscal_year is None and not self.sections:
+            self.fiscal_year = detect_fiscal_year(text)
+
+        page_start = self._char_offset
+        self.page_offsets[page_number] = page_start
+        self._char_offset += len(text) + 1
+
+        is_toc = not self.sections and len({section_id for _, section_id in headings}) >= TOC_MIN_HEADINGS
+        if is_toc:
+            return True
+        # 跨页目录的续页可能不足 TOC_MIN_HEADINGS 个标题，带页码的条目逐行排除
+        headings = [(offset, section_id) for offset, section_id in headings
+                    if not _is_toc_entry(text[offset:].split("\n", 1)[0])]
+
+        for offset, section_id in headings:
+            if section_id in self._seen or section_id not in SECTION_TITLES:
+                continue
+            if self.sections:
+                self.sections[-1]["char_end"] = page_start + offset
+                self.sections[-1]["page_end"] = page_number
+            self._seen.add(section_id)
+            self.sections.append({
+                "id": section_id,
+                "title": SECTION_TITLES[section_id],
+                "page_start": page_number,
+                "page_end": page_number,
+                "char_start": page_start + offset,
+                "char_end": None,
+            })
+        if self.sections:
+            self.sections[-1]["page_end"] = page_number
+        return False
+
+    def section_at(self, page_number, char_in_page=0):
+        """返回某页某位置所属章节 id；位于首个标题之前时返回 None"""
+        page_start = self.page_offsets.get(page_number)
+        if page_start is None:
+            return None
+        position = page_start + char_in_page
+        found = None
+        for section in self.sections:
+            if section["char_start"] <= position:
+                found = section["id"]
+            else:
+                break
+        return found
+
+    def split_page(self, page_number, text):
+        """按章节边界切分已 feed 的一页，返回 [(start, end, section_id)]（页内偏移）"""
+        page_start = self.page_offsets[page_number]
+        cuts = [section["char_start"] - page_start for section in self.sections
+                if page_start < section["char_start"] < page_start + len(text)]
+        bounds = [0] + cuts + [len(text)]
+        return [(start, end, self.section_at(page_number, start))
+                for start, end in zip(bounds, bounds[1:]) if end > start]
+
+    def finish(self):
+        """结束解析，补齐最后一个章节的结束偏移，返回章节索引列表"""
+        if self.sections and self.sections[-1]["char_end"] is None:
+            self.sections[-1]["char_end"] = self._char_offset
+        return [dict(section) for section in self.sections]
+
+
+def build_section_index(pages):
+    """pages 为按页顺序的文本列表"""
+    indexer = SectionIndexer()
+    for page_number, text in enumerate(pages):
+        indexer.feed(page_number, text)
+    return indexer.finish()
+
+
+def select_paragraphs(paragraphs, paragraph_sections, wanted, limit=None):
+    """按章节挑选段落（保持原文顺序）；有 limit 时各章节轮流取，避免名额全落在第一个章节
+
+    没有章节信息（旧缓存或非 10-K 文件）或未选中任何段落时返回 None，调用方应回退到关键词过滤。
+    """
+    indices = select_paragraph_indices(paragraph_sections, wanted, limit)
+    return [paragraphs[index] for index in indices] if indices else None
+
+
+def select_paragraph_indices(paragraph_sections, wanted, limit=None):
+    """同 select_paragraphs，返回升序的段落下标；没有章节信息时返回 None"""
+    if not paragraph_sections:
+        return None
+    buckets = {section_id: [] for section_id in wanted}
+    for index, section_id in enumerate(paragraph_sections):
+        if section_id in buckets:
+            buckets[section_id].append(index)
+
+    queues = [bucket for bucket in buckets.values() if bucket]
+    if limit is None:
+        chosen = [index for bucket in queues for index in bucket]
+    else:
+        chosen, depth = [], 0
+        while queues and len(chosen) < limit:
+            queues = [bucket for bucket in queues if depth < len(bucket)]
+            chosen.extend(bucket[depth] for bucket in queues[:limit - len(chosen)])
+            depth += 1
+    return sorted(chosen)
@@ -0,0 +1,66 @@
+# keyword_matcher.py
+# 多关键词匹配器，section2（页面过滤）与 section3（段落过滤）共用
+#
+# 安装了 pyahocorasick 时编译为 Aho-Corasick 自动机，对文本只扫描一次；
+# 否则文本只做一次小写归一化，再逐关键词用 C 层子串查找（比正则交替式快得多）。
+
+from functools import lru_cache
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+
+def _normalize(text):
+    # 弯引号统一为直引号，"management’s" 与 "management's" 视为同一关键词
+    return text.lower().replace("’", "'").replace("‘", "'")
+
+
+class KeywordMatcher:
+    """编译一组关键词，返回命中与否或全部命中位置（可重叠）"""
+
+    def __init__(self, keywords):
+        self.keywords = tuple(dict.fromkeys(_normalize(kw) for kw in keywords if kw))
+        self._automaton = None
+        if ahocorasick is not None and self.keywords:
+            self._automaton = ahocorasick.Automaton()
+            for kw in self.keywords:
+                self._automaton.add_word(kw, kw)
+            self._automaton.make_automaton()
+
+    def finditer(self, text):
+        """按起始位置顺序 yield (start, end, keyword)"""
+        text = _normalize(text)
+        if self._automaton is not None:
+            for end, kw in self._automaton.iter(text):
+                yield end - len(kw) + 1, end + 1, kw
+            return
+
+        hits = []
+        for kw in self.keywords:
+            start = text.find(kw)
+            while start != -1:
+                hits.append((start, start + len(kw), kw))
+                start = text.find(kw, start + 1)
+        yield from sorted(hits)
+
+    def search(self, text):
+        """是否命中任一关键词（命中第一个即返回）"""
+        text = _normalize(text)
+        if self._automaton is not None:
+            return next(self._automaton.iter(text), None) is not None
+        return any(kw in text for kw in self.keywords)
+
+    def matched_keywords(self, text):
+        return {kw for _, _, kw in self.finditer(text)}
+
+
+@lru_cache(maxsize=64)
+def _compile(keywords):
+    return KeywordMatcher(keywords)
+
+
+def get_matcher(keywords):
+    """按关键词列表取编译好的匹配器；同一列表只编译一次"""
+    return _compile(tuple(keywords))
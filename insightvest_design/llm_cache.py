@@ -0,0 +1,126 @@
+# llm_cache.py
+# 跨进程共享的 LLM 回答持久化缓存（SQLite，WAL 模式）：同一 prompt 在任何 worker 上重复请求时不再调用 API
+# 键为 (模型, temperature, max_tokens, prompt 版本, 渲染后的完整 prompt) 的 SHA-256；
+# 流式输出完整结束后才写入（中途出错 / 用户离开页面的半截回答不会被缓存）。
+# 过期（TTL）条目在读取时丢弃；总大小超出上限时按最近使用时间淘汰。
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+
+LLM_CACHE_PATH = "cache/llm_responses.sqlite"
+TTL_ENV = "INSIGHTVEST_LLM_CACHE_TTL_HOURS"
+MAX_SIZE_ENV = "INSIGHTVEST_LLM_CACHE_MAX_MB"
+DEFAULT_TTL_HOURS = 24 * 7
+DEFAULT_MAX_SIZE_MB = 256
+EVICT_EVERY_WRITES = 100      # 每写入若干条检查一次总大小
+
+
+def llm_cache_key(model, temperature, max_tokens, prompt_version, prompt_text):
+    payload = json.dumps([model, temperature, max_tokens, prompt_version, prompt_text], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """SQLite 存储，多线程、多进程可同时读写；hits / misses 为本进程的计数"""
+
+    def __init__(self, path=LLM_CACHE_PATH, ttl_seconds=None, max_bytes=None):
+        if ttl_seconds is None:
+            ttl_seconds = float(os.getenv(TTL_ENV, DEFAULT_TTL_HOURS)) * 3600
+        if max_bytes is None:
+            max_bytes = int(float(os.getenv(MAX_SIZE_ENV, DEFAULT_MAX_SIZE_MB)) * 1e6)
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.hits = self.misses = self.evictions = 0
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    model TEXT,
+                    prompt_version TEXT,
+                    response TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_used ON responses (last_used)")
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        conn = self._connect()
+        row = conn.execute("SELECT response, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+        now = time.time()
+        if row is None or now - row[1] > self.ttl_seconds:
+            if row is not None:
+                with conn:
+                    conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            with self._lock:
+                self.misses += 1
+            return None
+        with conn:
+            conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+        with self._lock:
+            self.hits += 1
+        return row[0]
+
+    def put(self, key, response, model=None, prompt_version=None):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, prompt_version, response, size, created_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, model, prompt_version, response, len(response.encode("utf-8")), now, now)
+            )
+        with self._lock:
+            self._writes += 1
+            due = self._writes % EVICT_EVERY_WRITES == 0
+        if due:
+            self.evict()
+
+    def evict(self):
+        """删除过期条目，再按最近使用时间从旧到新删除直到总大小不超过上限；返回删除的条数"""
+        conn = self._connect()
+        with conn:
+            removed = conn.execute("DELETE FROM responses WHERE created_at < ?",
+                                   (time.time() - self.ttl_seconds,)).rowcount
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            if total > self.max_bytes:
+                stale = []
+                for key, size in conn.execute("SELECT key, size FROM responses ORDER BY last_used"):
+                    if total <= self.max_bytes:
+                        break
+                    stale.append((key,))
+                    total -= size
+                conn.executemany("DELETE FROM responses WHERE key = ?", stale)
+                removed += len(stale)
+        with self._lock:
+            self.evictions += removed
+        return removed
+
+    def stats(self):
+        entries, size = self._connect().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        return {"entries": entries, "size_mb": round(size / 1e6, 2), "max_mb": round(self.max_bytes / 1e6, 1),
+                "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+
+@lru_cache(maxsize=1)
+def get_llm_cache():
+    return LLMCache()
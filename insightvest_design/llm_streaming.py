@@ -0,0 +1,43 @@
+# llm_streaming.py
+# 流式 LLM 输出：逐个 token yield 给 st.write_stream，首个 token 到达即开始渲染；
+# 完整结束后写入 llm_cache（跨进程共享），相同 prompt 再次请求时一次性返回缓存的回答
+
+from llm_cache import get_llm_cache, llm_cache_key
+
+
+def model_settings(llm):
+    """缓存键中的模型参数：(模型名, temperature, max_tokens)"""
+    return (getattr(llm, "model_name", None) or getattr(llm, "model", None),
+            getattr(llm, "temperature", None), getattr(llm, "max_tokens", None))
+
+
+def _cache_key(llm, prompt_value, prompt_version):
+    prompt_text = prompt_value if isinstance(prompt_value, str) else prompt_value.to_string()
+    return llm_cache_key(*model_settings(llm), prompt_version, prompt_text)
+
+
+def cached_response(llm, prompt_value, prompt_version=None, cache=None):
+    """llm_cache 中已有的完整回答；没有时返回 None（不调用 API）"""
+    return (cache or get_llm_cache()).get(_cache_key(llm, prompt_value, prompt_version))
+
+
+def stream_llm(llm, prompt_value, prompt_version=None, cache=None):
+    """llm: ChatOpenAI 等聊天模型；prompt_value: PromptValue（prompt.format_prompt(...)）或字符串
+    prompt_version: 调用方 prompt 模板的版本号，修改模板措辞时递增即可让旧回答失效
+    """
+    cache = cache or get_llm_cache()
+    settings = model_settings(llm)
+    key = _cache_key(llm, prompt_value, prompt_version)
+    cached = cache.get(key)
+    if cached is not None:
+        yield cached
+        return
+
+    parts = []
+    for chunk in llm.stream(prompt_value):
+        text = chunk.content if hasattr(chunk, "content") else str(chunk)
+        if text:
+            parts.append(text)
+            yield text
+    if parts:
+        cache.put(key, "".join(parts), model=settings[0], prompt_version=prompt_version)
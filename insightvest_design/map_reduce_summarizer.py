@@ -0,0 +1,148 @@
+# map_reduce_summarizer.py
+# 10-K 核心章节摘要：按 token 预算把段落打包成批（map），并行提炼要点笔记，再逐层合并笔记（reduce）直到放得进最终摘要 prompt
+#
+#   输入为上传时 extract_filing 保留的全部段落（CORE_SECTIONS：Item 1 / 1A / 7 / 7A / 8 及财报附注），不再只截取前 30 段
+#   段落（~300 token/段，按原文顺序）→ 每批 ≤ MAP_INPUT_TOKENS → chain.batch(max_concurrency) → 每批 ≤ MAP_OUTPUT_TOKENS 的笔记
+#   笔记总量 > content_budget 时分组合并（同样并行），每组输出上限为 content_budget / 组数，重复至放得下
+#
+# 墙钟时间 ≈ ⌈批数 / MAP_CONCURRENCY⌉ 轮 map + 少数几层 reduce，不再随文档长度线性增长。
+# 每次调用前统计 token 数（prompt 模板 + 内容 + 输出上限），确保低于 MODEL_CONTEXT_TOKENS；map / reduce 的结果同样写入 llm_cache。
+
+from langchain.chat_models import ChatOpenAI
+from langchain.prompts import ChatPromptTemplate
+from langchain_core.output_parsers import StrOutputParser
+
+from filing_sections import SECTION_TITLES
+from llm_cache import get_llm_cache, llm_cache_key
+from llm_streaming import model_settings
+from token_utils import count_tokens, truncate_tokens
+
+MODEL_NAME = "gpt-4o"
+MODEL_CONTEXT_TOKENS = 128_000
+MAP_INPUT_TOKENS = 8_000       # 每次 map 调用的原文 token 上限
+MAP_OUTPUT_TOKENS = 500        # 每批笔记的 token 上限
+REDUCE_INPUT_TOKENS = 12_000   # 每次 reduce 调用（以及最终摘要 prompt）的笔记 token 上限
+REDUCE_OUTPUT_TOKENS = 4_000   # 单次 reduce 输出上限（组数少时按 content_budget / 组数分配，不超过此值）
+MAP_CONCURRENCY = 8
+MAP_PROMPT_VERSION = "v1"      # 修改 MAP_PROMPT 时递增，使 llm_cache 中的旧笔记失效
+COMBINE_PROMPT_VERSION = "v1"  # 修改 COMBINE_PROMPT 时递增
+
+MAP_PROMPT = """
+You are a financial analyst reading one part of a company's 10-K report.
+
+Extract the facts an investor needs from this excerpt as concise bullet points: what the business does, segment and financial results (keep exact figures, periods and units), liquidity and debt, material risks, management's outlook and any notable events. Group bullets under the section headings shown in brackets. Do not add information that is not in the excerpt.
+Excerpt:
+{content}
+"""
+
+COMBINE_PROMPT = """
+You are a financial analyst consolidating notes taken on consecutive parts of a company's 10-K report.
+
+Merge the notes into a single set of concise bullet points grouped by topic. Remove duplicates, keep exact figures, periods and units, and keep every distinct risk or event. Do not add information that is not in the notes.
+Notes:
+{content}
+"""
+
+
+def _section_heading(section_id):
+    if section_id is None:
+        return None
+    title = SECTION_TITLES.get(section_id, section_id)
+    return f"[{title}]" if section_id == "Notes" else f"[Item {section_id} — {title}]"
+
+
+def pack_texts(texts, max_tokens, headings=None):
+    """按原文顺序把文本打包成 token 数 ≤ max_tokens 的批；每批开头及章节变化处插入 headings[i]
+
+    单段超过预算时独占一批（上游分块器保证段落远小于预算）。返回 [批文本]。
+    """
+    batches, current, tokens, last_heading = [], [], 0, None
+    for i, text in enumerate(texts):
+        heading = headings[i] if headings else None
+        size = count_tokens(text)
+        heading_size = count_tokens(heading) if heading and heading != last_heading else 0
+        if current and tokens + heading_size + size > max_tokens:
+            batches.append("\n\n".join(current))
+            current, tokens = [], 0
+        if heading and (heading != last_heading or not current):
+            current.append(heading)
+            tokens += count_tokens(heading)
+        current.append(text)
+        tokens += size
+        last_heading = heading
+    if current:
+        batches.append("\n\n".join(current))
+    return batches
+
+
+def _cached_batch(llm, template, prompt_version, contents, max_concurrency, stats, cache):
+    """对每个 content 调用 template | llm，命中 llm_cache 的不调用 API；返回与 contents 对应的文本列表
+
+    stats["max_call_tokens"] 记录单次调用的最大 token 数（prompt + 输出上限），超过模型上下文时报错而不是发出请求。
+    """
+    prompt = ChatPromptTemplate.from_template(template)
+    settings = model_settings(llm)
+    rendered = [prompt.format_prompt(content=c).to_string() for c in contents]
+    call_tokens = max(count_tokens(text) for text in rendered) + (settings[2] or 0)
+    if call_tokens > MODEL_CONTEXT_TOKENS:
+        raise ValueError(f"A summarization call needs {call_tokens} tokens, above the {MODEL_CONTEXT_TOKENS} "
+                         f"token context of {settings[0]}")
+    stats["max_call_tokens"] = max(stats.get("max_call_tokens", 0), call_tokens)
+    keys = [llm_cache_key(*settings, prompt_version, text) for text in rendered]
+    outputs = [cache.get(key) for key in keys]
+    missing = [i for i, output in enumerate(outputs) if output is None]
+    if missing:
+        chain = prompt | llm | StrOutputParser()
+        generated = chain.batch([{"content": contents[i]} for i in missing], config={"max_concurrency": max_concurrency})
+        for i, text in zip(missing, generated):
+            outputs[i] = text
+            cache.put(keys[i], text, model=settings[0], prompt_version=prompt_version)
+    stats["cached_calls"] = stats.get("cached_calls", 0) + len(contents) - len(missing)
+    return outputs
+
+
+def summary_content(paragraphs, paragraph_sections=None, llm=None, max_concurrency=MAP_CONCURRENCY,
+                    content_budget=REDUCE_INPUT_TOKENS, cache=None):
+    """返回 (最终摘要 prompt 的 content, stats)
+
+    paragraphs 为 extract_filing 保留的核心章节段落，paragraph_sections 为对应章节 id（用于在批内插入章节标题）。
+    原文放得进 content_budget 时直接返回原文（一次调用即可）；否则 map + 逐层 reduce，返回合并后的笔记。
+    stats: {"paragraphs", "input_tokens", "map_calls", "reduce_calls", "reduce_levels", "cached_calls",
+            "max_call_tokens", "content_tokens", "truncated"}
+    """
+    texts = list(paragraphs)
+    headings = None
+    if paragraph_sections and len(paragraph_sections) == len(paragraphs):
+        headings = [_section_heading(s) for s in paragraph_sections]
+    input_tokens = sum(count_tokens(t) for t in texts)
+    stats = {"paragraphs": len(texts), "input_tokens": input_tokens, "map_calls": 0, "reduce_calls": 0,
+             "reduce_levels": 0, "cached_calls": 0, "max_call_tokens": 0, "truncated": False}
+
+    if input_tokens <= content_budget:
+        content = "\n\n".join(pack_texts(texts, content_budget, headings))
+    else:
+        llm = llm or ChatOpenAI(model=MODEL_NAME, temperature=0, max_tokens=MAP_OUTPUT_TOKENS)
+        cache = cache or get_llm_cache()
+        batches = pack_texts(texts, MAP_INPUT_TOKENS, headings)
+        notes = _cached_batch(llm, MAP_PROMPT, MAP_PROMPT_VERSION, batches, max_concurrency, stats, cache)
+        stats["map_calls"] = len(batches)
+        # 分组合并，直到全部笔记放得进一次调用
+        while len(notes) > 1 and sum(count_tokens(n) for n in notes) > content_budget:
+            groups = pack_texts(notes, REDUCE_INPUT_TOKENS)
+            if len(groups) == len(notes):
+                break    # 每条笔记都已接近预算，无法再合并
+            # 合并后的笔记要整体放进 content_budget：按组数分配输出上限，不沿用 map 的 MAP_OUTPUT_TOKENS（否则被截断）
+            output_tokens = min(REDUCE_OUTPUT_TOKENS, max(MAP_OUTPUT_TOKENS, content_budget // len(groups)))
+            combine_llm = llm.model_copy(update={"max_tokens": output_tokens})
+            notes = _cached_batch(combine_llm, COMBINE_PROMPT, COMBINE_PROMPT_VERSION, groups, max_concurrency,
+                                  stats, cache)
+            stats["reduce_calls"] += len(groups)
+            stats["reduce_levels"] += 1
+        if sum(count_tokens(n) for n in notes) > content_budget:
+            # 无法再合并（每条笔记都接近预算）：各条按相同份额截断，保证最终调用不超出上下文
+            share = max(1, content_budget // len(notes) - 2)
+            notes = [truncate_tokens(n, share) for n in notes]
+            stats["truncated"] = True
+        content = "\n\n".join(notes)
+    stats["content_tokens"] = count_tokens(content)
+    return content, stats
@@ -0,0 +1,100 @@
+# pdf_extraction.py
+# PDF 文本提取：内存字节流逐页解析，大文件按页段分片到进程池并行提取
+#   python pdf_extraction.py <max_workers>   进程池入口：stdin 读 PDF 字节，stdout 逐页段写出 pickle
+
+import io
+import math
+import multiprocessing
+import os
+import pickle
+import subprocess
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pypdf import PdfReader
+from langchain_core.documents import Document
+
+# === 进程池参数 ===
+PROCESS_POOL_MIN_PAGES = 40   # 少于该页数时进程启动开销大于收益，直接单进程解析
+SHARDS_PER_WORKER = 4         # 每个 worker 分到的页段数，页段越小负载越均衡
+# Streamlit 进程内有多个线程（脚本线程、预生成摘要的线程池、后台批量导入），fork 会把它们持有的锁一并复制到子进程，
+# 可能死锁；改用 forkserver（Windows / 不支持时用 spawn）。worker 只需 pypdf，不依赖父进程状态
+# forkserver / spawn 的子进程会按 __main__.__file__ 重新执行主脚本，而 Streamlit 把页面脚本装成 __main__，
+# 所以进程池不在调用方进程里创建，而是放在以本文件为入口的辅助进程中：子进程重新导入的只是本模块
+_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+# worker 进程内的 PdfReader，由 initializer 创建一次，避免每个页段重复传输/解析整份文件
+_worker_reader = None
+
+
+def _init_worker(file_content):
+    global _worker_reader
+    _worker_reader = PdfReader(io.BytesIO(file_content))
+
+
+def _extract_page_range(start, end):
+    """worker 内执行：提取 [start, end) 页的文本"""
+    return [_worker_reader.pages[i].extract_text() or "" for i in range(start, end)]
+
+
+def _page_shards(n_pages, max_workers):
+    shard_size = max(1, math.ceil(n_pages / (max_workers * SHARDS_PER_WORKER)))
+    return [(start, min(start + shard_size, n_pages)) for start in range(0, n_pages, shard_size)]
+
+
+def iter_pdf_pages(file_content, max_workers=None):
+    """逐页解析内存中的 PDF 字节流，按页码顺序 yield Document（不落盘）
+
+    页数较多时将页段分发到进程池并行提取文本，按原顺序重新拼接；
+    每个页段完成后立即 yield，下游过滤/切分无需等待整份文件。
+    """
+    reader = PdfReader(io.BytesIO(file_content))
+    n_pages = len(reader.pages)
+    max_workers = max_workers or os.cpu_count() or 1
+
+    if max_workers == 1 or n_pages < PROCESS_POOL_MIN_PAGES:
+        for page_number, page in enumerate(reader.pages):
+            yield Document(page_content=page.extract_text() or "", metadata={"page": page_number})
+        return
+
+    yield from _iter_pool_pages(file_content, max_workers)
+
+
+def _iter_pool_pages(file_content, max_workers):
+    """在辅助进程（本文件的 __main__ 入口）中运行进程池，按页段读回结果"""
+    proc = subprocess.Popen([sys.executable, os.path.abspath(__file__), str(max_workers)],
+                            stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+    try:
+        proc.stdin.write(file_content)
+        proc.stdin.close()
+        while True:
+            try:
+                start, texts = pickle.load(proc.stdout)
+            except EOFError:
+                break
+            for offset, text in enumerate(texts):
+                yield Document(page_content=text, metadata={"page": start + offset})
+        if proc.wait() != 0:
+            raise RuntimeError(f"PDF extraction worker exited with code {proc.returncode}")
+    finally:
+        if proc.poll() is None:   # 调用方提前关闭生成器
+            proc.kill()
+            proc.wait()
+        proc.stdout.close()
+
+
+def _pool_page_ranges(file_content, max_workers):
+    """辅助进程内执行：页段分发到进程池，按原顺序 yield (起始页, 页文本列表)"""
+    n_pages = len(PdfReader(io.BytesIO(file_content)).pages)
+    shards = _page_shards(n_pages, max_workers)
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context(_START_METHOD),
+                             initializer=_init_worker, initargs=(file_content,)) as executor:
+        futures = [executor.submit(_extract_page_range, start, end) for start, end in shards]
+        for (start, _), future in zip(shards, futures):
+            yield start, future.result()
+
+
+if __name__ == "__main__":
+    out = sys.stdout.buffer
+    for page_range in _pool_page_ranges(sys.stdin.buffer.read(), int(sys.argv[1])):
+        pickle.dump(page_range, out)
+        out.flush()
@@ -0,0 +1,75 @@
+# prompt_analysis_ui.py
+# "Run GPT Analysis"：用 prompt_engine 并发执行选中的 PROMPT_REGISTRY 模板，结果按完成顺序流入各 prompt 的表格
+
+import json
+import time
+from contextlib import closing
+
+import pandas as pd
+import streamlit as st
+
+from prompt_engine import PromptEngine, build_jobs
+from prompt_registry import PROMPT_REGISTRY
+
+REFRESH_SECONDS = 0.5         # 表格刷新间隔（每个结果都重绘会拖慢主线程）
+EXCERPT_CHARS = 160
+
+
+def _rows_frame(prompt_id, rows):
+    schema = list(PROMPT_REGISTRY[prompt_id].get("expected_output_schema", {}))
+    records = []
+    for result in sorted(rows, key=lambda r: (r["paragraph_index"] is None, r["paragraph_index"] or 0)):
+        record = {"#": result["paragraph_index"], "paragraph": result["source_text"][:EXCERPT_CHARS]}
+        output = result["output"] or {}
+        for field in schema:
+            value = output.get(field)
+            record[field] = json.dumps(value, ensure_ascii=False) if isinstance(value, (dict, list)) else value
+        record["status"] = "✅" if result["status"] == "ok" else f"❌ {result['error']}"
+        records.append(record)
+    return pd.DataFrame(records)
+
+
+def _render_result_tables(placeholders, results):
+    for prompt_id, placeholder in placeholders.items():
+        rows = results.get(prompt_id, [])
+        if not rows:
+            continue
+        display_type = PROMPT_REGISTRY[prompt_id].get("display_type")
+        with placeholder.container():
+            st.markdown(f"#### 🟠 {prompt_id} ({len(rows)})")
+            if display_type == "paragraph_table":
+                st.dataframe(_rows_frame(prompt_id, rows), use_container_width=True, hide_index=True)
+            elif rows[0]["status"] != "ok":
+                st.error(f"❌ {rows[0]['error']}")
+            elif display_type == "summary_narrative":
+                st.markdown(next(iter(rows[0]["output"].values())))
+            else:
+                st.json(rows[0]["output"])
+
+
+def render_prompt_analysis(prompt_ids, paragraphs, paragraph_sections=None):
+    jobs = build_jobs(prompt_ids, paragraphs, paragraph_sections)
+    if not jobs:
+        st.warning("⚠️ No paragraphs matched the selected prompts.")
+        return
+
+    st.markdown(f"### 🧠 Enhanced Prompt Analysis — {len(jobs)} GPT calls")
+    progress = st.progress(0.0)
+    placeholders = {prompt_id: st.empty() for prompt_id in prompt_ids}
+    results = {}
+    engine = PromptEngine()
+    start = last_refresh = time.perf_counter()
+    # rerun / 停止时立即关闭生成器，引擎随之取消尚未完成的请求
+    with closing(engine.run(jobs)) as stream:
+        for done, result in enumerate(stream, 1):
+            results.setdefault(result["prompt_id"], []).append(result)
+            now = time.perf_counter()
+            if now - last_refresh >= REFRESH_SECONDS or done == len(jobs):
+                progress.progress(done / len(jobs), text=f"{done} / {len(jobs)} completed")
+                _render_result_tables(placeholders, results)
+                last_refresh = now
+
+    st.session_state["prompt_analysis_results"] = results
+    stats = engine.stats
+    st.caption(f"⏱️ {time.perf_counter() - start:.1f}s · ✅ {stats['ok']} · ❌ {stats['failed']} · "
+               f"🔁 {stats['retries']} retries · 💾 {stats['cached']} cached")
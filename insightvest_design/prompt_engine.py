@@ -0,0 +1,271 @@
+# prompt_engine.py
+# PROMPT_REGISTRY 批量执行引擎：每个 (prompt × 段落) 任务用 asyncio 有界并发调用 LLM，
+# API 调用失败时退避重试；输出不符合 expected_output_schema 时把校验错误附在 prompt 后重问一次（同一 prompt 在
+# temperature 0 下重发只会得到同样的输出）；结果按完成顺序放入队列，UI 线程边取边刷新表格。
+# 调用方停止读取结果（关闭生成器，如 Streamlit rerun）时取消剩余任务，不再发出请求
+#
+# 含 {paragraph} 的 prompt 对所需章节的每个段落各跑一次；含 {text} 的 prompt 把这些段落拼接后只跑一次。
+# 命中 llm_cache 的任务不调用 API。
+
+import asyncio
+import json
+import queue
+import random
+import re
+import threading
+import time
+from collections import Counter
+
+from langchain.chat_models import ChatOpenAI
+
+from filing_sections import select_paragraph_indices
+from llm_cache import get_llm_cache, llm_cache_key
+from llm_streaming import model_settings
+from prompt_registry import PROMPT_REGISTRY
+from token_utils import count_tokens
+
+MODEL_NAME = "gpt-4o"
+TEMPERATURE = 0.0
+MAX_CONCURRENCY = 16          # 同时在途的请求数
+MAX_RETRIES = 3               # 每个任务最多重试次数（API 错误与 schema 校验失败都计入）
+MAX_SCHEMA_RETRIES = 1        # 其中 schema 校验失败最多重问的次数
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 20.0
+TEXT_PROMPT_MAX_TOKENS = 12_000   # {text} 类 prompt 拼接段落的 token 上限
+
+_JSON_OBJECT_RE = re.compile(r"\{.*\}", re.DOTALL)
+_DONE = object()
+
+SCHEMA_RETRY_PROMPT = """
+
+Your previous answer could not be used: {error}.
+Respond again with ONLY a JSON object containing these fields: {fields}.
+"""
+
+
+class OutputValidationError(ValueError):
+    pass
+
+
+class PromptJob:
+    __slots__ = ("prompt_id", "paragraph_index", "source_text", "prompt_text")
+
+    def __init__(self, prompt_id, paragraph_index, source_text, prompt_text):
+        self.prompt_id = prompt_id
+        self.paragraph_index = paragraph_index      # {text} 类 prompt 为 None
+        self.source_text = source_text
+        self.prompt_text = prompt_text
+
+
+def input_variable(prompt_meta):
+    return "paragraph" if "{paragraph}" in prompt_meta["template"] else "text"
+
+
+def build_jobs(prompt_ids, paragraphs, paragraph_sections=None, registry=PROMPT_REGISTRY):
+    """按各 prompt 的 "sections" 挑选段落并渲染 prompt；没有章节信息时使用全部段落"""
+    jobs = []
+    for prompt_id in prompt_ids:
+        meta = registry[prompt_id]
+        indices = select_paragraph_indices(paragraph_sections, meta["sections"]) if meta.get("sections") else None
+        if not indices:
+            indices = range(len(paragraphs))
+        if input_variable(meta) == "paragraph":
+            jobs.extend(PromptJob(prompt_id, i, paragraphs[i], meta["template"].format(paragraph=paragraphs[i]))
+                        for i in indices)
+        else:
+            text = _join_within_budget([paragraphs[i] for i in indices], TEXT_PROMPT_MAX_TOKENS)
+            jobs.append(PromptJob(prompt_id, None, text, meta["template"].format(text=text)))
+    return jobs
+
+
+def _join_within_budget(texts, max_tokens):
+    kept, total = [], 0
+    for text in texts:
+        tokens = count_tokens(text)
+        if kept and total + tokens > max_tokens:
+            break
+        kept.append(text)
+        total += tokens
+    return "\n".join(kept)
+
+
+# === 输出校验 ===
+def _field_type(spec):
+    return spec.get("type", "string") if isinstance(spec, dict) else spec
+
+
+def _coerce(value, expected, field):
+    if expected == "integer":
+        if isinstance(value, bool):
+            raise OutputValidationError(f"{field!r} should be an integer, got {value!r}")
+        if isinstance(value, int):
+            return value
+        if isinstance(value, float) and value.is_integer():
+            return int(value)
+        if isinstance(value, str) and value.strip().lstrip("-").isdigit():
+            return int(value.strip())
+        raise OutputValidationError(f"{field!r} should be an integer, got {value!r}")
+    if expected == "number":
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            raise OutputValidationError(f"{field!r} should be a number, got {value!r}") from None
+    if expected == "string":
+        if isinstance(value, (dict, list)) or value is None:
+            raise OutputValidationError(f"{field!r} should be a string, got {value!r}")
+        return str(value)
+    if expected == "object" and not isinstance(value, dict):
+        raise OutputValidationError(f"{field!r} should be an object, got {value!r}")
+    return value
+
+
+def parse_output(raw, prompt_meta):
+    """LLM 原始输出 → 符合 expected_output_schema 的 dict；不符合时抛出 OutputValidationError"""
+    schema = prompt_meta.get("expected_output_schema", {})
+    text = raw.strip()
+    if prompt_meta.get("display_type") == "summary_narrative":
+        # 叙述类 prompt 要求纯文本输出
+        if not text:
+            raise OutputValidationError("empty narrative")
+        return {next(iter(schema), "summary_narrative"): text}
+
+    match = _JSON_OBJECT_RE.search(text)
+    if match is None:
+        raise OutputValidationError("no JSON object in output")
+    try:
+        data = json.loads(match.group(0))
+    except json.JSONDecodeError as e:
+        raise OutputValidationError(f"invalid JSON: {e}") from None
+    if not isinstance(data, dict):
+        raise OutputValidationError("output is not a JSON object")
+    for field, spec in schema.items():
+        if field not in data:
+            raise OutputValidationError(f"missing field {field!r}")
+        data[field] = _coerce(data[field], _field_type(spec), field)
+    return data
+
+
+# === 执行引擎 ===
+class PromptEngine:
+    """有界并发执行 PromptJob；run() 在后台线程运行事件循环，按完成顺序 yield 结果 dict
+
+    结果：{"prompt_id", "paragraph_index", "source_text", "status": "ok" | "error", "output", "error",
+           "attempts", "cached", "seconds"}
+    """
+
+    def __init__(self, llm=None, max_concurrency=MAX_CONCURRENCY, max_retries=MAX_RETRIES, registry=PROMPT_REGISTRY,
+                 cache=None):
+        self.llm = llm or ChatOpenAI(model=MODEL_NAME, temperature=TEMPERATURE)
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.registry = registry
+        self.cache = cache or get_llm_cache()
+        self.stats = Counter()
+
+    def run(self, jobs):
+        """生成器；提前关闭（break / close() / 调用方异常）时取消尚未完成的任务"""
+        results = queue.Queue()
+        cancel = threading.Event()
+        running = {}     # 事件循环与任务，由工作线程填入，供取消时使用
+        worker = threading.Thread(target=self._run_loop, args=(jobs, results, cancel, running), name="prompt-engine",
+                                  daemon=True)
+        worker.start()
+        try:
+            while True:
+                item = results.get()
+                if item is _DONE:
+                    break
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            if worker.is_alive():
+                cancel.set()
+                _cancel_tasks(running)
+
+    def _run_loop(self, jobs, results, cancel, running):
+        try:
+            asyncio.run(self._run_all(jobs, results.put, cancel, running))
+        except asyncio.CancelledError:
+            pass
+        except BaseException as e:
+            results.put(e)
+        finally:
+            results.put(_DONE)
+
+    async def _run_all(self, jobs, emit, cancel, running):
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        tasks = [asyncio.create_task(self._run_job(job, semaphore, cancel)) for job in jobs]
+        running.update(loop=asyncio.get_running_loop(), tasks=tasks)
+        if cancel.is_set():
+            _cancel_tasks(running)
+        for finished in asyncio.as_completed(tasks):
+            emit(await finished)
+
+    async def _run_job(self, job, semaphore, cancel=None):
+        meta = self.registry[job.prompt_id]
+        settings = model_settings(self.llm)
+        key = llm_cache_key(*settings, meta.get("version"), job.prompt_text)
+        result = {"prompt_id": job.prompt_id, "paragraph_index": job.paragraph_index, "source_text": job.source_text,
+                  "status": "error", "output": None, "error": None, "attempts": 0, "cached": False}
+        start = time.perf_counter()
+
+        cached = self.cache.get(key)
+        if cached is not None:
+            try:
+                result.update(status="ok", output=parse_output(cached, meta), cached=True)
+                self.stats["cached"] += 1
+            except OutputValidationError:
+                cached = None
+        if cached is None:
+            prompt_text, schema_retries, backoff = job.prompt_text, 0, False
+            for attempt in range(self.max_retries + 1):
+                if attempt:
+                    self.stats["retries"] += 1
+                    if backoff:
+                        await asyncio.sleep(self._backoff(attempt))
+                result["attempts"] = attempt + 1
+                try:
+                    async with semaphore:
+                        if cancel is not None and cancel.is_set():
+                            raise asyncio.CancelledError()
+                        response = await self.llm.ainvoke(prompt_text)
+                    raw = response.content if hasattr(response, "content") else str(response)
+                    output = parse_output(raw, meta)
+                except OutputValidationError as e:
+                    self.stats["invalid_outputs"] += 1
+                    result["error"] = f"schema: {e}"
+                    if schema_retries >= MAX_SCHEMA_RETRIES:
+                        break
+                    # 重问时附上校验错误；缓存键仍用原 prompt，修正后的输出同样可被下次命中
+                    schema_retries += 1
+                    prompt_text = job.prompt_text + SCHEMA_RETRY_PROMPT.format(
+                        error=e, fields=", ".join(meta.get("expected_output_schema", {})))
+                    backoff = False
+                    continue
+                except Exception as e:
+                    self.stats["api_errors"] += 1
+                    result["error"] = f"{type(e).__name__}: {e}"
+                    backoff = True
+                    continue
+                self.cache.put(key, raw, model=settings[0], prompt_version=meta.get("version"))
+                result.update(status="ok", output=output, error=None)
+                break
+
+        self.stats["ok" if result["status"] == "ok" else "failed"] += 1
+        result["seconds"] = time.perf_counter() - start
+        return result
+
+    def _backoff(self, attempt):
+        return min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** (attempt - 1)) * random.uniform(0.5, 1.0)
+
+
+def _cancel_tasks(running):
+    # 从调用方线程取消事件循环中的任务（包括已在等待 API 响应的请求）；循环已结束时忽略
+    loop = running.get("loop")
+    if loop is None:
+        return
+    try:
+        loop.call_soon_threadsafe(lambda: [task.cancel() for task in running["tasks"]])
+    except RuntimeError:
+        pass
@@ -1,5 +1,6 @@
 # prompt_registry.py
 # 注册所有可用的 Prompt 模板，包括版本控制、输出格式、评分机制等
+# "sections": 该 Prompt 需要的 10-K 章节（见 filing_sections.SECTION_TITLES），只把这些章节的段落送入 LLM
 
 PROMPT_REGISTRY = {
     # === 📌 Risk Fast-Screen ===
@@ -68,6 +69,7 @@ PROMPT_REGISTRY = {
             "explanation": "string",
             "investor_tip": "string"
         },
+        "sections": ["1A"],
         "display_type": "paragraph_table",
   "self_eval_instruction": "Rate your confidence (1–5) using the following criteria:\n\
 5 = Strong keyword/context match, unambiguous and specific\n\
@@ -103,6 +105,7 @@ Text:
   "expected_output_schema": {
     "summary_narrative": "string"
   },
+   "sections": ["1A", "7A"],
    "display_type": "summary_narrative",
    "self_eval_instruction": "Rate your confidence (1–5) using the following criteria:\n\
 5 = Strong keyword/context match, unambiguous and specific\n\
@@ -135,12 +138,13 @@ Provide your analysis in the following JSON format:
   "earnings_quality": "A detailed paragraph summarizing the company's revenue trends, profit margins, and earnings sustainability.",
   "bankruptcy_risk": "A detailed paragraph assessing the company's bankruptcy risk, referencing metrics like Altman Z-Score or debt-to-equity ratio.",
   "audit_redflags": "A detailed paragraph identifying any audit concerns, such as non-GAAP adjustments or restatements.",
-  "confidence": "score": 1-5,
+  "confidence": {{"score": 4, "basis": "One sentence on how clearly the text supports this analysis (score 1-5)."}}
 }}
 
 pulling data from all relevant parts of the document. Respond ONLY with the JSON object.
 """,
-        "version": "1.0",
+        "version": "1.1",
+        "sections": ["7", "8", "Notes"],
         "display_type": "raw_text",
         "input_variables": ["text"],
         "expected_output_schema": {
@@ -220,6 +224,7 @@ Return ONLY a valid JSON object following the example format above. Do not inclu
             "investment_advice": "string",
             "confidence": "integer"
         },
+        "sections": ["1", "7"],
         "display_type": "paragraph_table",
         "self_eval_instruction": "Rate your confidence (1–5) using the following criteria:\n\
 5 = Clear and specific information (e.g., exact financial figures or events).\n\
@@ -315,6 +320,7 @@ Return ONLY a valid JSON object following the example format above. Do not inclu
             "investor_tip": "string",
             "confidence": "integer"
         },
+        "sections": ["1", "7"],
         "display_type": "paragraph_table",
         "self_eval_instruction": "Rate your confidence (1–5) using the following criteria:\n\
 5 = Strong keyword/context match, unambiguous and specific\n\
@@ -2,15 +2,24 @@ from langchain.chains import RetrievalQA
 from langchain.prompts import PromptTemplate
 from langchain.chat_models import ChatOpenAI
 from langchain.vectorstores.base import VectorStoreRetriever
+from langchain_core.prompts import format_document
 
-# === 🔧 构造 RAG 问答链 ===
-def build_rag_chain(vectorstore: VectorStoreRetriever, temperature: float = 0.2):
-    llm = ChatOpenAI(model_name="gpt-4o", temperature=temperature)
+from federated_retrieval import FederatedRetriever
+from llm_streaming import stream_llm
+from retrieval import FilteredRetriever
+
+# 默认仍取 5 个 chunk：section-aware chunk 约 300 token，k=3 的上下文量虽与原先 800 字符 × 5 相当，
+# 但跨章节 / 多年度的问题需要的段落数更多；需要更省 token 时由调用方传 k
+# rerank 时先取 RERANK_FETCH_K 个候选，重排 + MMR 去掉各年重复段落后放 k 个进 prompt
+RAG_TOP_K = 5
+
+# 联邦检索（多家公司对比）时每家公司约 2 个 chunk，总数上限 8
+FEDERATED_TOP_K_PER_STORE = 2
+FEDERATED_MAX_K = 8
 
-    # Prompt 模板（可根据任务自定义）
-    prompt_template = PromptTemplate(
-        input_variables=["context", "question"],
-        template="""
+# Prompt 模板（可根据任务自定义；修改时递增 RAG_PROMPT_VERSION，使 llm_cache 中的旧回答失效）
+RAG_PROMPT_VERSION = "v1"
+RAG_PROMPT_TEMPLATE = """
 You are a senior financial risk analyst.
 Use the following context (10-K disclosure) to answer the question.
 
@@ -25,13 +34,68 @@ Answer:
 - Highlight key risk terms
 - If relevant, reference specific regulatory issues (e.g., SOX, SEC 229, Basel)
 - If the answer is not found in the context, say "Not found in context."
-        """
-    )
+"""
+PEER_COMPARISON_INSTRUCTIONS = """- Each context passage is prefixed with its company in brackets
+- Attribute every point to its company
+- Compare the companies explicitly and note where a company's filing is silent on the topic
+"""
+
+
+def _metadata_filter(sections, filters):
+    metadata_filter = dict(filters or {})
+    if sections:
+        metadata_filter["section"] = list(sections)
+    return metadata_filter
+
 
-    rag_chain = RetrievalQA.from_chain_type(
+def _qa_chain(retriever, temperature, peer_comparison=False):
+    llm = ChatOpenAI(model_name="gpt-4o", temperature=temperature)
+    template = RAG_PROMPT_TEMPLATE + (PEER_COMPARISON_INSTRUCTIONS if peer_comparison else "")
+    chain_type_kwargs = {"prompt": PromptTemplate(input_variables=["context", "question"], template=template)}
+    if peer_comparison:
+        chain_type_kwargs["document_prompt"] = PromptTemplate(input_variables=["page_content", "company"],
+                                                              template="[{company}] {page_content}")
+    return RetrievalQA.from_chain_type(
         llm=llm,
-        retriever=vectorstore.as_retriever(search_type="similarity", k=5),
+        retriever=retriever,
         chain_type="stuff",
-        chain_type_kwargs={"prompt": prompt_template}
+        chain_type_kwargs=chain_type_kwargs
     )
-    return rag_chain
+
+
+# === 🔧 构造 RAG 问答链 ===
+def build_rag_chain(vectorstore: VectorStoreRetriever, temperature: float = 0.2, sections: list = None,
+                    filters: dict = None, hybrid: bool = True, rerank: bool = True, k: int = RAG_TOP_K):
+    """sections: 只在这些 10-K 章节（如 ["1A", "7"]）中检索；None 表示全部
+    filters: 其它 metadata 条件，如 {"ticker": ["AAPL"], "year": [2023]}；在向量搜索之前限定候选集
+    hybrid: 向量检索与 BM25 关键词检索融合（精确术语如 "Basel III"、"covenant" 不易被 embedding 漏掉）
+    rerank: 先取较宽的候选集，本地重排 + MMR 去冗余后再放入 prompt
+    k: 放入 prompt 的 chunk 数
+    """
+    retriever = FilteredRetriever(vectorstore=vectorstore, k=k,
+                                  metadata_filter=_metadata_filter(sections, filters), hybrid=hybrid, rerank=rerank)
+    return _qa_chain(retriever, temperature)
+
+
+# === 🏢 多家公司对比的 RAG 问答链 ===
+def build_federated_rag_chain(store_paths: list, temperature: float = 0.2, sections: list = None,
+                              filters: dict = None, hybrid: bool = True, rerank: bool = True, registry=None):
+    """store_paths: 多个公司向量库；提问时并行检索、合并，每段上下文标注来源公司
+    其余参数同 build_rag_chain（filters 对每个库生效）；向量库由注册表按需借用，调用方无需 lease
+    """
+    k = min(FEDERATED_TOP_K_PER_STORE * len(store_paths), FEDERATED_MAX_K)
+    retriever = FederatedRetriever(store_paths=list(store_paths), k=max(k, RAG_TOP_K),
+                                   metadata_filter=_metadata_filter(sections, filters), hybrid=hybrid, rerank=rerank,
+                                   registry=registry)
+    return _qa_chain(retriever, temperature, peer_comparison=True)
+
+
+# === 💬 流式问答 ===
+def stream_rag_answer(rag_chain, question: str):
+    """检索后逐段 yield 回答（供 st.write_stream 使用）；与 rag_chain.run(question) 使用同一 prompt"""
+    docs = rag_chain.retriever.invoke(question)
+    stuff_chain = rag_chain.combine_documents_chain
+    context = stuff_chain.document_separator.join(format_document(doc, stuff_chain.document_prompt) for doc in docs)
+    prompt = stuff_chain.llm_chain.prompt.format_prompt(**{stuff_chain.document_variable_name: context,
+                                                           "question": question})
+    yield from stream_llm(stuff_chain.llm_chain.llm, prompt, prompt_version=RAG_PROMPT_VERSION)
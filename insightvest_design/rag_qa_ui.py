@@ -1,10 +1,11 @@
 import streamlit as st
-from rag_vectorstore import load_vectorstore
-from rag_chain import build_rag_chain
+from rag_vectorstore import read_manifest
+from rag_chain import build_federated_rag_chain, build_rag_chain, stream_rag_answer
+from vectorstore_registry import get_registry
+from vectorstore_storage import list_stores
+from retrieval import get_filter_index
 
-import streamlit as st
-from rag_vectorstore import load_vectorstore
-from rag_chain import build_rag_chain
+from filing_sections import SECTION_TITLES
 
 def render_rag_ui(default_vectorstore="mycompany.faiss"):
     st.markdown("""
@@ -14,6 +15,13 @@ def render_rag_ui(default_vectorstore="mycompany.faiss"):
     </div>
     """, unsafe_allow_html=True)
 
+    # === 🔀 单个向量库问答 / 多家公司对比（并行检索多个向量库） ===
+    rag_mode = st.radio("Query mode", ["📂 Single company", "🏢 Compare companies"], horizontal=True,
+                        key="rag_mode")
+    if rag_mode == "🏢 Compare companies":
+        render_peer_comparison_ui()
+        return
+
     # === 🔍 输入 Vectorstore 路径 ===
     vectorstore_name = st.text_input(
         "📂 Enter Vectorstore Name",
@@ -21,35 +29,47 @@ def render_rag_ui(default_vectorstore="mycompany.faiss"):
         help="This should match your uploaded document's vectorstore path."
     )
 
-    # === ✨ 金色按钮样式（仅设置一次） ===
-    st.markdown("""
-    <style>
-    div.stButton > button:first-child {
-        background: linear-gradient(90deg, #FFD700, #FFA500);
-        color: black;
-        font-weight: bold;
-        border-radius: 8px;
-        padding: 0.5rem 1.2rem;
-        margin-top: 0.5rem;
-    }
-    </style>
-    """, unsafe_allow_html=True)
+    rag_sections = _section_filter("rag_sections")
+    _gold_button_style()
 
-    # === 📦 加载向量库按钮 ===
+    # === 📦 加载向量库按钮（进程级共享：会话中只记录库名，提问时从注册表借用） ===
+    registry = get_registry()
     if st.button("📦 Load Knowledge Base", key="load_rag_vectorstore"):
         try:
-            vectorstore = load_vectorstore(vectorstore_name)
-            rag_chain = build_rag_chain(vectorstore)
-            st.session_state["rag_vectorstore"] = vectorstore
-            st.session_state["rag_chain"] = rag_chain
-            st.success("✅ Vectorstore loaded and RAG chain initialized.")
+            loads_before = registry.stats()["loads"]
+            with registry.lease(vectorstore_name) as vectorstore:
+                filter_index = get_filter_index(vectorstore)
+                st.session_state["rag_store_facets"] = {
+                    "ticker": filter_index.values("ticker"),
+                    "year": filter_index.values("year")
+                }
+            st.session_state["rag_store"] = vectorstore_name
+            # RAG 链在每次提问时按所选章节 / 过滤条件构建，这里只确认向量库可用
+            if registry.stats()["loads"] > loads_before:
+                st.success("✅ Knowledge base loaded. Ask a question below.")
+            else:
+                st.success("✅ Knowledge base ready (already in the shared cache). Ask a question below.")
+            manifest = read_manifest(vectorstore_name)
+            st.caption(f"🧠 Embedding backend: {manifest['embedding_backend']} "
+                       f"({manifest.get('embedding_model', 'OpenAIEmbeddings')})")
         except Exception as e:
             st.error(f"❌ Failed to load vectorstore: {e}")
 
     # === 💬 提问区域 ===
-    if "rag_chain" in st.session_state:
+    if "rag_store" in st.session_state:
         st.markdown("<div style='margin-top:1.5rem'></div>", unsafe_allow_html=True)
 
+        # === 🏢 📅 按公司 / 财年限定检索（在向量搜索之前过滤，为空表示全部） ===
+        facets = st.session_state.get("rag_store_facets", {})
+        rag_filters = {}
+        col_company, col_year = st.columns(2)
+        if len(facets.get("ticker", [])) > 1:
+            with col_company:
+                rag_filters["ticker"] = st.multiselect("🏢 Company", facets["ticker"], default=[], key="rag_tickers")
+        if facets.get("year"):
+            with col_year:
+                rag_filters["year"] = st.multiselect("📅 Fiscal year", facets["year"], default=[], key="rag_years")
+
         risk_question = st.text_area(
             "💬 Enter your risk-related question",
             placeholder="e.g. What operational risks are mentioned in the filing?",
@@ -61,14 +81,78 @@ def render_rag_ui(default_vectorstore="mycompany.faiss"):
             if not risk_question.strip():
                 st.warning("Please enter a question.")
             else:
-                with st.spinner("🔍 Searching vector database..."):
-                    try:
-                        answer = st.session_state["rag_chain"].run(risk_question)
-                        st.markdown("### 📌 GPT Response")
-                        st.markdown(f"<div style='line-height:1.6'>{answer}</div>", unsafe_allow_html=True)
-                    except Exception as e:
-                        st.error(f"❌ Failed to generate response: {e}")
+                try:
+                    st.markdown("### 📌 GPT Response")
+                    with registry.lease(st.session_state["rag_store"]) as vectorstore:
+                        rag_chain = build_rag_chain(vectorstore, sections=rag_sections, filters=rag_filters)
+                        st.write_stream(stream_rag_answer(rag_chain, risk_question))
+                except Exception as e:
+                    st.error(f"❌ Failed to generate response: {e}")
+        stats = registry.stats()
+        st.caption(f"📦 Shared vectorstore cache: {len(stats['stores'])} loaded, "
+                   f"{stats['used_mb']} / {stats['budget_mb']} MB")
     else:
         st.info("ℹ️ Please load a vectorstore before asking a question.")
 
 
+def _section_filter(key):
+    # === 📑 限定检索的 10-K 章节（为空表示全部） ===
+    return st.multiselect(
+        "📑 Limit retrieval to 10-K sections",
+        options=list(SECTION_TITLES.keys()),
+        format_func=lambda sid: f"Item {sid} — {SECTION_TITLES[sid]}" if sid != "Notes" else SECTION_TITLES[sid],
+        default=[],
+        key=key
+    )
+
+
+def _gold_button_style():
+    # === ✨ 金色按钮样式（仅设置一次） ===
+    st.markdown("""
+    <style>
+    div.stButton > button:first-child {
+        background: linear-gradient(90deg, #FFD700, #FFA500);
+        color: black;
+        font-weight: bold;
+        border-radius: 8px;
+        padding: 0.5rem 1.2rem;
+        margin-top: 0.5rem;
+    }
+    </style>
+    """, unsafe_allow_html=True)
+
+
+def render_peer_comparison_ui(store_root="."):
+    """同一问题并行检索多个公司的向量库，合并上下文后由 GPT 对比作答（每段上下文标注来源公司）"""
+    store_names = st.multiselect(
+        "🏢 Companies to compare",
+        options=list_stores(store_root),
+        default=[],
+        help="Each vectorstore is searched in parallel; results are merged and tagged with their company.",
+        key="rag_peer_stores"
+    )
+    peer_sections = _section_filter("rag_peer_sections")
+    _gold_button_style()
+
+    peer_question = st.text_area(
+        "💬 Enter your comparison question",
+        placeholder="e.g. How do these companies describe supply-chain risk?",
+        height=120,
+        key="rag_peer_qa"
+    )
+
+    if st.button("💡 Compare Companies", key="submit_rag_peer_qa"):
+        if len(store_names) < 2:
+            st.warning("Please select at least two vectorstores.")
+        elif not peer_question.strip():
+            st.warning("Please enter a question.")
+        else:
+            try:
+                st.markdown("### 📌 GPT Response")
+                rag_chain = build_federated_rag_chain(store_names, sections=peer_sections)
+                st.write_stream(stream_rag_answer(rag_chain, peer_question))
+            except Exception as e:
+                st.error(f"❌ Failed to generate response: {e}")
+    stats = get_registry().stats()
+    st.caption(f"📦 Shared vectorstore cache: {len(stats['stores'])} loaded, "
+               f"{stats['used_mb']} / {stats['budget_mb']} MB")
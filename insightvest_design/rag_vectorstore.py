@@ -1,42 +1,323 @@
 from langchain_community.vectorstores import FAISS
-from langchain_community.embeddings import OpenAIEmbeddings
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.document_loaders import PyPDFLoader
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from pdf_extraction import iter_pdf_pages
+from filing_sections import SectionIndexer, detect_fiscal_year
+from chunk_dedupe import BoilerplateLineFilter, ChunkDeduplicator, dedupe_report
+from chunker import SectionAwareChunker, iter_filing_chunks
+from embedding_backends import get_embeddings, default_backend, LOCAL_MODEL_ENV, DEFAULT_LOCAL_MODEL_PATH
+from extraction_cache import file_sha256
+from vectorstore_storage import (read_manifest, read_index, save_version, prune_versions, store_exists, store_lock,
+                                 current_dir, hold_version)
+from sqlite_docstore import SQLiteDocstore, DOCSTORE_FILE
+from ann_index import (DEFAULT_INDEX_TYPE, index_spec, create_index, needs_training, apply_search_params,
+                       exact_vectors, reconstruct_all)
+import faiss
+import numpy as np
 import os
+import sys
 from dotenv import load_dotenv
 load_dotenv()
 
-# === Step 1: 文本切分器 ===
-text_splitter = RecursiveCharacterTextSplitter(
-    chunk_size=800,
-    chunk_overlap=100
-)
+# === Step 1: 分块参数（按模型 token 计，不跨越 10-K 章节） ===
+CHUNK_MAX_TOKENS = 300
+CHUNK_OVERLAP_TOKENS = 30
+
+# === Step 2: Embedding 后端（按需创建；向量库的 manifest.json 记录构建时使用的后端和已收录的文件） ===
+def _backend_manifest(backend):
+    embeddings, model_name = get_embeddings(backend)
+    manifest = {"embedding_backend": backend, "embedding_model": model_name, "filings": {}}
+    if backend == "local":
+        manifest["model_path"] = os.getenv(LOCAL_MODEL_ENV, DEFAULT_LOCAL_MODEL_PATH)
+    return embeddings, manifest
+
+
+def _iter_embedded(embeddings, texts):
+    """带缓存/批处理的后端按批流式返回；其它后端一次算完"""
+    if hasattr(embeddings, "iter_embedded"):
+        yield from embeddings.iter_embedded(texts)
+    else:
+        yield list(range(len(texts))), embeddings.embed_documents(texts)
+
+
+# === Step 3: 分块与写入索引 ===
+def chunk_filing(file_content: bytes, source: str, doc_id: str, ticker: str = None):
+    """PDF 字节 → 去重后的 chunk Document（metadata: ticker, year, section, page, source, doc_id）"""
+    line_filter = BoilerplateLineFilter()
+    deduplicator = ChunkDeduplicator()
+    indexer = SectionIndexer()
+    chunks = list(iter_filing_chunks(
+        iter_pdf_pages(file_content),
+        indexer,
+        line_filter=line_filter,
+        deduplicator=deduplicator,
+        chunker=SectionAwareChunker(CHUNK_MAX_TOKENS, CHUNK_OVERLAP_TOKENS)
+    ))
+    fiscal_year = indexer.fiscal_year or detect_fiscal_year(None, fallback_name=os.path.basename(source))
+    for chunk in chunks:
+        chunk.metadata.update(source=source, doc_id=doc_id, ticker=ticker,
+                              year=int(fiscal_year) if fiscal_year else None)
+    stats = dedupe_report(deduplicator, line_filter)
+    print(f"🧹 {source}: dropped {stats['exact_duplicates'] + stats['near_duplicates']} duplicate chunks, "
+          f"~{stats['total_tokens_saved']} tokens saved")
+    return chunks
+
+
+def _chunk_ids(chunks):
+    """docstore id 为 "<doc_id>:<序号>"，便于按文件删除"""
+    counters = {}
+    ids = []
+    for chunk in chunks:
+        doc_id = chunk.metadata["doc_id"]
+        ids.append(f"{doc_id}:{counters.get(doc_id, 0):05d}")
+        counters[doc_id] = counters.get(doc_id, 0) + 1
+    return ids
+
+
+def _empty_vectorstore(embedding_model, index):
+    return FAISS(embedding_function=embedding_model, index=index, docstore=InMemoryDocstore(), index_to_docstore_id={})
+
+
+def _build_from_embeddings(embedding_model, text_embeddings, metadatas, ids, index_type, index_options=None):
+    """用全部向量训练（IVF 类）并构建新索引，返回 (vectorstore, 索引 spec)"""
+    vectors = np.asarray([v for _, v in text_embeddings], dtype=np.float32)
+    spec = index_spec(index_type, vectors.shape[1], len(vectors), **(index_options or {}))
+    vectorstore = _empty_vectorstore(embedding_model, create_index(spec, vectors.shape[1], vectors))
+    vectorstore.add_embeddings(text_embeddings, metadatas=metadatas, ids=ids)
+    return vectorstore, spec
+
+
+def _embed_chunks(vectorstore, embedding_model, chunks, index_type=DEFAULT_INDEX_TYPE, index_options=None):
+    """把 chunk 逐批写入索引，返回 (vectorstore, 新建索引的 spec 或 None)
+
+    vectorstore 为 None 时新建：flat / hnsw 边计算边写入；IVF 类需要先收齐向量训练聚类中心。
+    """
+    ids = _chunk_ids(chunks)
+    spec, pending = None, []
+    hits_before, misses_before = getattr(embedding_model, "hits", 0), getattr(embedding_model, "misses", 0)
+    for indices, vectors in _iter_embedded(embedding_model, [c.page_content for c in chunks]):
+        text_embeddings = [(chunks[i].page_content, v) for i, v in zip(indices, vectors)]
+        metadatas = [chunks[i].metadata for i in indices]
+        batch_ids = [ids[i] for i in indices]
+        if vectorstore is None and not needs_training(index_type):
+            spec = index_spec(index_type, len(vectors[0]), len(chunks), **(index_options or {}))
+            vectorstore = _empty_vectorstore(embedding_model, create_index(spec, len(vectors[0])))
+        if vectorstore is None:
+            pending.append((text_embeddings, metadatas, batch_ids))
+        else:
+            vectorstore.add_embeddings(text_embeddings, metadatas=metadatas, ids=batch_ids)
+    if pending:
+        vectorstore, spec = _build_from_embeddings(
+            embedding_model,
+            [te for batch in pending for te in batch[0]],
+            [m for batch in pending for m in batch[1]],
+            [i for batch in pending for i in batch[2]],
+            index_type, index_options
+        )
+    if hasattr(embedding_model, "hits"):
+        print(f"🧠 Embeddings: {embedding_model.hits - hits_before} cached, "
+              f"{embedding_model.misses - misses_before} new")
+    return vectorstore, spec
+
+
+def _rebuild(vectorstore, spec, keep=None):
+    """按 spec 重建索引（重新训练 IVF）；keep 为要保留的 docstore id 集合，None 表示全部"""
+    index = vectorstore.index
+    ids = [vectorstore.index_to_docstore_id[i] for i in range(index.ntotal)]
+    docs = [vectorstore.docstore.search(_id) for _id in ids]
+    if exact_vectors(index):
+        vectors = reconstruct_all(index) if index.ntotal else []
+    else:
+        # IVF-PQ 只存量化后的向量：重新计算（embedding 缓存命中，不产生 API 调用）
+        vectors = vectorstore.embedding_function.embed_documents([doc.page_content for doc in docs])
+    rows = [(i, v) for i, v in enumerate(vectors) if keep is None or ids[i] in keep]
+    if not rows:
+        return _empty_vectorstore(vectorstore.embedding_function, create_index(index_spec("flat", index.d, 0), index.d)), \
+            index_spec("flat", index.d, 0)
+    index_options = {k: spec[k] for k in ("nlist", "pq_m", "pq_bits", "refine", "hnsw_m", "nprobe", "ef_search", "k_factor")
+                     if k in spec}
+    return _build_from_embeddings(
+        vectorstore.embedding_function,
+        [(docs[i].page_content, list(v)) for i, v in rows],
+        [docs[i].metadata for i, _ in rows],
+        [ids[i] for i, _ in rows],
+        spec.get("requested", spec["type"]), index_options
+    )
+
+
+def _filing_entry(name, chunks):
+    meta = chunks[0].metadata if chunks else {}
+    return {"source": name, "chunks": len(chunks), "ticker": meta.get("ticker"), "year": meta.get("year")}
+
+
+def _store_ticker(path):
+    return os.path.splitext(os.path.basename(os.path.normpath(path)))[0]
 
-# === Step 2: Embedding 模型初始化 ===
-embedding_model = OpenAIEmbeddings()
 
 # === 构建向量数据库函数 ===
-def build_vectorstore_from_pdf(pdf_path: str, save_path: str = None) -> FAISS:
-    """读取PDF，分块并存入FAISS向量数据库"""
-    loader = PyPDFLoader(pdf_path)
-    pages = loader.load()
-    chunks = text_splitter.split_documents(pages)
+def build_vectorstore_from_pdf(pdf_path: str, save_path: str = None, backend: str = None,
+                               index_type: str = DEFAULT_INDEX_TYPE, index_options: dict = None,
+                               ticker: str = None) -> FAISS:
+    """读取PDF，分块并存入FAISS向量数据库（每个 chunk 的 metadata 带 10-K 章节 id）
 
-    vectorstore = FAISS.from_documents(chunks, embedding_model)
+    backend: "openai" / "local" / "hashing"，默认取环境变量 INSIGHTVEST_EMBEDDING_BACKEND
+    index_type: "flat" / "ivf_flat" / "ivf_pq" / "hnsw"；
+    index_options 可指定 nlist、pq_m、pq_bits、refine、hnsw_m、nprobe、ef_search、k_factor（见 ann_index.index_spec）
+    ticker: 写入每个 chunk 的公司标识，默认取 save_path 的文件名（如 mycompany.faiss → mycompany）
+    """
+    backend = backend or default_backend()
+    embedding_model, manifest = _backend_manifest(backend)
+    with open(pdf_path, "rb") as f:
+        file_content = f.read()
+    doc_id = file_sha256(file_content)
+    chunks = chunk_filing(file_content, pdf_path, doc_id, ticker or (_store_ticker(save_path) if save_path else None))
+    if not chunks:
+        raise ValueError(f"❌ No text chunks extracted from {pdf_path}; cannot build a vectorstore")
+    vectorstore, manifest["index"] = _embed_chunks(None, embedding_model, chunks, index_type, index_options)
+    manifest["filings"][doc_id] = _filing_entry(pdf_path, chunks)
+    manifest["dimension"] = vectorstore.index.d
 
     if save_path:
-        vectorstore.save_local(save_path)
+        with store_lock(save_path):
+            save_version(save_path, vectorstore, manifest)
         print(f"✅ Vectorstore saved to {save_path}")
 
     return vectorstore
 
+# === 增量维护：追加 / 删除 / 压缩（均写入新版本后原子切换） ===
+def add_filings_to_vectorstore(path: str, filings, backend: str = None,
+                               index_type: str = DEFAULT_INDEX_TYPE, index_options: dict = None,
+                               ticker: str = None) -> list:
+    """把新文件追加到已保存的向量库（不存在则按 index_type 新建）；已收录的文件（按 SHA-256）直接跳过
+
+    filings: [(文件名, PDF 字节)]；ticker 默认取向量库文件名；返回新加入的 doc_id 列表。
+    追加到已训练的 IVF 索引时沿用原聚类中心，数据分布变化较大后可用 compact_vectorstore 重新训练。
+    """
+    with store_lock(path):
+        if store_exists(path):
+            manifest = read_manifest(path)
+            if backend and backend != manifest["embedding_backend"]:
+                raise ValueError(f"❌ {path} was built with the {manifest['embedding_backend']} backend, not {backend}")
+            vectorstore = load_vectorstore(path, mmap=False)
+            embedding_model = vectorstore.embedding_function
+            manifest.setdefault("filings", {})
+        else:
+            embedding_model, manifest = _backend_manifest(backend or default_backend())
+            vectorstore = None
+
+        added, new_chunks = [], []
+        for name, file_content in filings:
+            doc_id = file_sha256(file_content)
+            if doc_id in manifest["filings"] or doc_id in added:
+                print(f"⏭️ {name} already in {path}")
+                continue
+            chunks = chunk_filing(file_content, name, doc_id, ticker or _store_ticker(path))
+            if not chunks:
+                continue
+            new_chunks.extend(chunks)
+            manifest["filings"][doc_id] = _filing_entry(name, chunks)
+            added.append(doc_id)
+
+        if added:
+            # 所有新文件一起嵌入：批次可跨文件打包，新建 IVF 索引时用全部向量训练
+            vectorstore, spec = _embed_chunks(vectorstore, embedding_model, new_chunks, index_type, index_options)
+            manifest["index"] = spec or manifest.get("index", {"type": "flat", "factory": "Flat"})
+            manifest["dimension"] = vectorstore.index.d
+            version = save_version(path, vectorstore, manifest)
+            print(f"✅ Added {len(added)} filing(s) to {path} ({version})")
+        return added
+
+
+def delete_filing(path: str, doc_id: str) -> int:
+    """按 doc_id 删除一个文件的全部 chunk，返回删除的向量数"""
+    with store_lock(path):
+        manifest = read_manifest(path)
+        vectorstore = load_vectorstore(path, mmap=False)
+        ids = [_id for _id in vectorstore.index_to_docstore_id.values() if _id.startswith(f"{doc_id}:")]
+        if not ids and doc_id not in manifest.get("filings", {}):
+            raise KeyError(f"❌ Filing {doc_id} not found in {path}")
+        if ids and isinstance(faiss.downcast_index(vectorstore.index), faiss.IndexFlat):
+            # flat 索引 remove_ids 后剩余向量顺次前移，与 LangChain 重新编号的 index_to_docstore_id 一致
+            vectorstore.delete(ids)
+        elif ids:
+            # IVF / PQ / 精排 / HNSW：remove_ids 保留原标签（HNSW 不支持删除），与重新编号后的 docstore 对不上，
+            # 一律用剩余向量重建
+            keep = set(vectorstore.index_to_docstore_id.values()) - set(ids)
+            vectorstore, manifest["index"] = _rebuild(vectorstore, _manifest_spec(manifest, vectorstore), keep)
+        manifest.get("filings", {}).pop(doc_id, None)
+        manifest["deleted_since_compaction"] = manifest.get("deleted_since_compaction", 0) + len(ids)
+        save_version(path, vectorstore, manifest)
+        return len(ids)
+
+
+def compact_vectorstore(path: str, index_type: str = None, index_options: dict = None) -> dict:
+    """按剩余 chunk 重建索引（IVF 重新训练）并清理旧版本目录；可同时切换 index_type
+
+    返回 {"vectors", "index", "versions_removed"}
+    """
+    with store_lock(path):
+        manifest = read_manifest(path)
+        vectorstore = load_vectorstore(path, mmap=False)
+        spec = _manifest_spec(manifest, vectorstore)
+        if index_type:
+            spec = {"type": index_type, **(index_options or {})}
+        compacted, manifest["index"] = _rebuild(vectorstore, spec)
+        manifest["deleted_since_compaction"] = 0
+        save_version(path, compacted, manifest)
+        return {"vectors": compacted.index.ntotal, "index": manifest["index"]["factory"],
+                "versions_removed": prune_versions(path, keep=1)}
+
+
+def _manifest_spec(manifest, vectorstore):
+    return manifest.get("index") or index_spec("flat", vectorstore.index.d, vectorstore.index.ntotal)
+
 # === 加载向量数据库函数 ===
-def load_vectorstore(path: str) -> FAISS:
-    """从磁盘加载本地保存的向量数据库"""
+def load_vectorstore(path: str, nprobe: int = None, ef_search: int = None, mmap: bool = True) -> FAISS:
+    """从磁盘加载本地保存的向量数据库；查询向量使用 manifest 中记录的同一后端
+
+    nprobe / ef_search 覆盖 manifest 中记录的 ANN 查询参数（召回率 ↔ 延迟）。
+    mmap=True：索引内存映射、docstore 按需从 SQLite 读取（只读，用于查询）；
+    mmap=False：全部读入内存，可追加 / 删除（add_filings_to_vectorstore 等写操作使用）。
+    """
     if not os.path.exists(path):
         raise FileNotFoundError(f"❌ Vectorstore not found at {path}")
-    return FAISS.load_local(path, embeddings=embedding_model)
+    manifest = read_manifest(path)
+    embedding_model, _ = get_embeddings(manifest["embedding_backend"], manifest.get("model_path"))
+    version_dir = current_dir(path)
+    if os.path.exists(os.path.join(version_dir, DOCSTORE_FILE)):
+        if mmap:
+            # 先持有版本再打开文件：持有期间写入新版本的进程不会删除这个目录
+            lease = hold_version(version_dir)
+            docstore = SQLiteDocstore(os.path.join(version_dir, DOCSTORE_FILE))
+            vectorstore = FAISS(embedding_model, read_index(version_dir, mmap=True), docstore, docstore.id_map)
+            vectorstore.version_lease = lease
+        else:
+            docstore = SQLiteDocstore(os.path.join(version_dir, DOCSTORE_FILE))
+            vectorstore = FAISS(embedding_model, read_index(version_dir, mmap=False),
+                                InMemoryDocstore(dict(docstore.items())), dict(enumerate(docstore.id_map.values())))
+    else:
+        # 旧格式：docstore 为本应用自己写出的 pickle 文件
+        vectorstore = FAISS.load_local(version_dir, embeddings=embedding_model, allow_dangerous_deserialization=True)
+    if manifest.get("dimension") not in (None, vectorstore.index.d):
+        raise ValueError(f"❌ Vectorstore dimension {vectorstore.index.d} does not match manifest {manifest['dimension']}")
+    spec = manifest.get("index", {})
+    apply_search_params(vectorstore.index, nprobe or spec.get("nprobe"), ef_search or spec.get("ef_search"),
+                        spec.get("k_factor"))
+    return vectorstore
 
 # === 用于测试的脚本入口 ===
+#   python rag_vectorstore.py add mycompany.faiss 10k_2023.pdf 10k_2024.pdf
+#   python rag_vectorstore.py delete mycompany.faiss <doc_id>
+#   python rag_vectorstore.py compact mycompany.faiss [flat|ivf_flat|ivf_pq|hnsw]
 if __name__ == "__main__":
-    vs = build_vectorstore_from_pdf("sample.pdf", save_path="data/vector_store")
+    if len(sys.argv) >= 3 and sys.argv[1] == "add":
+        pdfs = []
+        for pdf_path in sys.argv[3:]:
+            with open(pdf_path, "rb") as f:
+                pdfs.append((pdf_path, f.read()))
+        add_filings_to_vectorstore(sys.argv[2], pdfs)
+    elif len(sys.argv) == 4 and sys.argv[1] == "delete":
+        print(f"🗑️ Removed {delete_filing(sys.argv[2], sys.argv[3])} chunks")
+    elif len(sys.argv) in (3, 4) and sys.argv[1] == "compact":
+        print(compact_vectorstore(sys.argv[2], index_type=sys.argv[3] if len(sys.argv) == 4 else None))
+    else:
+        vs = build_vectorstore_from_pdf("sample.pdf", save_path="data/vector_store")
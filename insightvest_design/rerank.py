@@ -0,0 +1,138 @@
+# rerank.py
+# RAG 第二阶段：对较宽的候选集做本地重排 + MMR 去冗余，只把少量、互不重复的 chunk 放进 prompt
+# （同一公司各年 10-K 的风险因素大段重复，只按相似度取前几个时常是同一段话的不同年份）
+#
+# 重排器：设置 INSIGHTVEST_RERANK_MODEL 指向本地 cross-encoder（sentence-transformers，如 ms-marco-MiniLM-L-6-v2）
+# 时逐对打分；否则使用无依赖的词法交叉打分（检索词 IDF 加权覆盖率 + 相邻词组命中），并与第一阶段排名加权。
+
+import math
+import os
+import re
+from collections import Counter
+from functools import lru_cache
+
+import numpy as np
+
+from bm25_index import query_terms
+
+RERANK_MODEL_ENV = "INSIGHTVEST_RERANK_MODEL"
+RERANK_FETCH_K = 20           # 第一阶段候选数
+MMR_LAMBDA = 0.7              # 1.0 = 只看相关性，0.0 = 只看多样性
+NEAR_DUP_SIMILARITY = 0.85    # 与已选 chunk 的词频余弦相似度达到该值时直接跳过
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def _stem(word):
+    """粗略词干：impairments → impairment，covenants → covenant"""
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def _words(text):
+    return [_stem(w) for w in _WORD_RE.findall(text.lower())]
+
+
+class LexicalReranker:
+    """查询与 chunk 的词法交叉打分；IDF 在候选集内计算（候选集里处处出现的词不加分）"""
+
+    weight = 0.5              # 与第一阶段（向量 / RRF）排名各占一半
+
+    def score(self, query, texts):
+        terms = [_stem(t) for t in query_terms(query)]
+        if not terms or not texts:
+            return np.zeros(len(texts))
+        doc_words = [_words(t) for t in texts]
+        doc_sets = [set(words) for words in doc_words]
+        doc_bigrams = [set(zip(words, words[1:])) for words in doc_words]
+        n = len(texts)
+        idf = {t: math.log(1 + n / (1 + sum(t in s for s in doc_sets))) for t in set(terms)}
+        total = sum(idf.values()) or 1.0
+        bigrams = list(zip(terms, terms[1:]))
+        scores = []
+        for words, bigram_set in zip(doc_sets, doc_bigrams):
+            coverage = sum(w for t, w in idf.items() if t in words) / total
+            phrase = sum(b in bigram_set for b in bigrams) / len(bigrams) if bigrams else 0.0
+            scores.append(coverage + 0.5 * phrase)
+        return np.asarray(scores)
+
+
+class CrossEncoderReranker:
+    """本地 cross-encoder，CPU 推理"""
+
+    weight = 1.0
+
+    def __init__(self, model_path):
+        if not os.path.isdir(model_path):
+            raise FileNotFoundError(f"Rerank model not found at {model_path} (set {RERANK_MODEL_ENV})")
+        try:
+            from sentence_transformers import CrossEncoder
+        except ImportError as e:
+            raise ImportError("The cross-encoder reranker requires sentence-transformers "
+                              "(pip install sentence-transformers)") from e
+        self.model = CrossEncoder(model_path, device="cpu")
+
+    def score(self, query, texts):
+        if not texts:
+            return np.zeros(0)
+        return np.asarray(self.model.predict([(query, t) for t in texts], batch_size=32))
+
+
+@lru_cache(maxsize=None)
+def get_reranker(model_path=None):
+    model_path = model_path or os.getenv(RERANK_MODEL_ENV)
+    return CrossEncoderReranker(model_path) if model_path else LexicalReranker()
+
+
+def _normalize(scores):
+    if len(scores) == 0:
+        return scores
+    low, high = scores.min(), scores.max()
+    return (scores - low) / (high - low) if high > low else np.ones_like(scores, dtype=float)
+
+
+def text_similarity(texts):
+    """chunk 两两之间的词频余弦相似度（n × n）"""
+    counts = [Counter(_words(t)) for t in texts]
+    vocab = {w: i for i, w in enumerate({w for c in counts for w in c})}
+    matrix = np.zeros((len(texts), len(vocab)), dtype=np.float32)
+    for row, c in enumerate(counts):
+        for w, n in c.items():
+            matrix[row, vocab[w]] = n
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    matrix /= np.where(norms > 0, norms, 1)
+    return matrix @ matrix.T
+
+
+def mmr_select(relevance, similarity, k, lambda_mult=MMR_LAMBDA, near_dup=NEAR_DUP_SIMILARITY):
+    """Maximal Marginal Relevance：返回选中的下标；近似重复的候选不会入选，因此可能少于 k 个"""
+    selected, remaining = [], list(range(len(relevance)))
+    while remaining and len(selected) < k:
+        best, best_score = None, -np.inf
+        for i in remaining:
+            redundancy = max((similarity[i, j] for j in selected), default=0.0)
+            if redundancy >= near_dup:
+                continue
+            score = lambda_mult * relevance[i] - (1 - lambda_mult) * redundancy
+            if score > best_score:
+                best, best_score = i, score
+        if best is None:
+            break
+        selected.append(best)
+        remaining.remove(best)
+    return selected
+
+
+def rerank_documents(query, docs, k, reranker=None, lambda_mult=MMR_LAMBDA):
+    """docs 按第一阶段相关性降序 → [(Document, 重排分数)]，最多 k 个"""
+    if not docs:
+        return []
+    reranker = reranker or get_reranker()
+    texts = [d.page_content for d in docs]
+    prior = 1.0 - np.arange(len(docs)) / len(docs)
+    relevance = reranker.weight * _normalize(reranker.score(query, texts)) + (1 - reranker.weight) * prior
+    selected = mmr_select(relevance, text_similarity(texts), k, lambda_mult)
+    return [(docs[i], float(relevance[i])) for i in selected]
@@ -0,0 +1,208 @@
+# retrieval.py
+# 带 metadata 预过滤的向量检索：先按 ticker / year / section / page / doc_id 确定候选集，再只在候选集中做向量搜索
+# （LangChain FAISS 的 filter 是先取 fetch_k 个结果再过滤，条件越严格，能返回的结果越少）
+# hybrid 模式下同一候选集上再做一次 BM25 关键词检索，两路排名用 reciprocal rank fusion 合并
+# rerank 模式先取 fetch_k 个候选，经本地重排和 MMR 去冗余后保留 k 个
+
+import sqlite3
+import threading
+import weakref
+from typing import List
+
+import faiss
+import numpy as np
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from pydantic import ConfigDict
+
+from ann_index import exact_vectors
+from bm25_index import reciprocal_rank_fusion
+from rerank import RERANK_FETCH_K, rerank_documents
+from sqlite_docstore import FILTER_FIELDS, SQLiteDocstore, text_search, write_chunks
+
+# 候选集不超过该值时直接对候选向量做精确计算（IVF 则搜索全部倒排表），保证严格过滤下的召回
+SMALL_CANDIDATE_SET = 4096
+# hybrid 检索时向量 / BM25 各取的候选数（再经 RRF 合并为 k 个）
+HYBRID_FETCH_K = 20
+
+
+def _normalize_filter(metadata_filter):
+    """{"year": 2023, "section": ["1A", "7"]} → [("year", [2023]), ("section", ["1A", "7"])]；空条件忽略"""
+    conditions = []
+    for field, value in (metadata_filter or {}).items():
+        values = list(value) if isinstance(value, (list, tuple, set)) else [value]
+        if not values:
+            continue
+        if field == "year" or field == "page":
+            values = [int(v) for v in values]
+        conditions.append((field, values))
+    return conditions
+
+
+class MetadataFilterIndex:
+    """metadata 条件 → 候选 position 数组
+
+    SQLite docstore 直接用带索引的列查询；内存 / 旧格式向量库在首次使用时扫描一遍 metadata 建倒排表。
+    """
+
+    def __init__(self, vectorstore):
+        docstore = vectorstore.docstore
+        self._sql = docstore if isinstance(docstore, SQLiteDocstore) and docstore.has_filter_columns else None
+        self._postings = {}
+        if self._sql is None:
+            postings = {field: {} for field in FILTER_FIELDS}
+            for position in range(vectorstore.index.ntotal):
+                metadata = docstore.search(vectorstore.index_to_docstore_id[position]).metadata
+                for field in FILTER_FIELDS:
+                    if metadata.get(field) is not None:
+                        postings[field].setdefault(metadata[field], []).append(position)
+            self._postings = {field: {value: np.asarray(p, dtype=np.int64) for value, p in values.items()}
+                              for field, values in postings.items()}
+
+    def positions(self, metadata_filter):
+        """返回升序 int64 数组；没有条件时返回 None（表示不限制）"""
+        conditions = _normalize_filter(metadata_filter)
+        if not conditions:
+            return None
+        if self._sql is not None:
+            return np.asarray(self._sql.filter_positions(conditions), dtype=np.int64)
+        result = None
+        for field, values in conditions:
+            if field not in self._postings:
+                raise ValueError(f"Cannot filter on {field!r}; filterable fields: {FILTER_FIELDS}")
+            postings = [self._postings[field][v] for v in values if v in self._postings[field]]
+            matched = np.unique(np.concatenate(postings)) if postings else np.empty(0, dtype=np.int64)
+            result = matched if result is None else np.intersect1d(result, matched, assume_unique=True)
+        return result
+
+    def values(self, field):
+        if self._sql is not None:
+            return self._sql.distinct_values(field)
+        return sorted(self._postings.get(field, {}))
+
+
+class KeywordIndex:
+    """BM25 关键词检索
+
+    docstore 自带 FTS5 索引时直接查询；内存 / 旧格式向量库在首次使用时建一个内存 SQLite 副本。
+    """
+
+    def __init__(self, vectorstore):
+        docstore = vectorstore.docstore
+        self._docstore = docstore if isinstance(docstore, SQLiteDocstore) and docstore.has_text_index else None
+        self._conn = None
+        self._lock = threading.Lock()
+        if self._docstore is None:
+            self._conn = sqlite3.connect(":memory:", check_same_thread=False)
+            write_chunks(self._conn, vectorstore)
+
+    def search(self, query, k, metadata_filter=None):
+        """[(position, BM25 分数)]，分数降序"""
+        conditions = _normalize_filter(metadata_filter)
+        if self._docstore is not None:
+            return self._docstore.text_search(query, k, conditions)
+        with self._lock:
+            return text_search(self._conn, query, k, conditions)
+
+
+_filter_indexes = weakref.WeakKeyDictionary()
+_keyword_indexes = weakref.WeakKeyDictionary()
+_filter_lock = threading.Lock()
+
+
+def get_filter_index(vectorstore):
+    """每个已加载的向量库共用一个过滤索引（随向量库对象释放）"""
+    with _filter_lock:
+        index = _filter_indexes.get(vectorstore)
+        if index is None:
+            index = _filter_indexes[vectorstore] = MetadataFilterIndex(vectorstore)
+        return index
+
+
+def get_keyword_index(vectorstore):
+    with _filter_lock:
+        index = _keyword_indexes.get(vectorstore)
+        if index is None:
+            index = _keyword_indexes[vectorstore] = KeywordIndex(vectorstore)
+        return index
+
+
+def _selector_params(index, selector, k, exhaustive):
+    concrete = faiss.downcast_index(index)
+    if isinstance(concrete, faiss.IndexRefine):
+        return faiss.IndexRefineSearchParameters(
+            k_factor=concrete.k_factor,
+            base_index_params=_selector_params(concrete.base_index, selector, k, exhaustive))
+    if isinstance(concrete, faiss.IndexIVF):
+        return faiss.SearchParametersIVF(sel=selector, nprobe=concrete.nlist if exhaustive else concrete.nprobe)
+    if isinstance(concrete, faiss.IndexHNSW):
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=max(concrete.hnsw.efSearch, k))
+    return faiss.SearchParameters(sel=selector)
+
+
+def search_positions(index, query_vector, k, positions=None):
+    """返回 [(position, L2 距离)]，按距离升序；positions 限定候选集"""
+    query = np.asarray(query_vector, dtype=np.float32).reshape(1, -1)
+    if positions is None:
+        distances, found = index.search(query, k)
+    elif len(positions) == 0:
+        return []
+    elif len(positions) <= SMALL_CANDIDATE_SET and exact_vectors(index) and faiss.try_extract_index_ivf(index) is None:
+        vectors = index.reconstruct_batch(positions)
+        scores = ((vectors - query) ** 2).sum(axis=1)
+        top = np.argsort(scores)[:k]
+        return [(int(positions[i]), float(scores[i])) for i in top]
+    else:
+        selector = faiss.IDSelectorBatch(positions)
+        params = _selector_params(index, selector, k, exhaustive=len(positions) <= SMALL_CANDIDATE_SET)
+        distances, found = index.search(query, k, params=params)
+    return [(int(i), float(d)) for d, i in zip(distances[0], found[0]) if i != -1]
+
+
+def _documents(vectorstore, scored_positions):
+    results = []
+    for position, score in scored_positions:
+        doc = vectorstore.docstore.search(vectorstore.index_to_docstore_id[position])
+        if isinstance(doc, Document):
+            results.append((doc, score))
+    return results
+
+
+def filtered_search(vectorstore, query, k, metadata_filter=None):
+    """[(Document, L2 距离)]：先按 metadata 取候选集，再做向量搜索"""
+    positions = get_filter_index(vectorstore).positions(metadata_filter)
+    return _documents(vectorstore, search_positions(vectorstore.index, vectorstore._embed_query(query), k, positions))
+
+
+def hybrid_search(vectorstore, query, k, metadata_filter=None, fetch_k=HYBRID_FETCH_K):
+    """[(Document, RRF 分数)]，分数降序：同一 metadata 候选集上的向量检索与 BM25 检索按排名融合"""
+    fetch_k = max(fetch_k, k)
+    positions = get_filter_index(vectorstore).positions(metadata_filter)
+    vector_hits = search_positions(vectorstore.index, vectorstore._embed_query(query), fetch_k, positions)
+    keyword_hits = get_keyword_index(vectorstore).search(query, fetch_k, metadata_filter)
+    fused = reciprocal_rank_fusion([[p for p, _ in vector_hits], [p for p, _ in keyword_hits]])
+    return _documents(vectorstore, fused[:k])
+
+
+class FilteredRetriever(BaseRetriever):
+    """LangChain 检索器：filter 如 {"ticker": "AAPL", "year": [2022, 2023], "section": ["1A"]}
+    hybrid=True 时融合 BM25 关键词检索结果；rerank=True 时先取 fetch_k 个候选，重排 + MMR 后保留 k 个
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    vectorstore: object
+    k: int = 3
+    metadata_filter: dict = {}
+    hybrid: bool = False
+    rerank: bool = False
+    fetch_k: int = RERANK_FETCH_K
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        search = hybrid_search if self.hybrid else filtered_search
+        if not self.rerank:
+            return [doc for doc, _ in search(self.vectorstore, query, self.k, self.metadata_filter)]
+        fetch_k = max(self.fetch_k, self.k)
+        candidates = [doc for doc, _ in search(self.vectorstore, query, fetch_k, self.metadata_filter)]
+        return [doc for doc, _ in rerank_documents(query, candidates, self.k)]
@@ -1,55 +1,87 @@
 # section2_upload_and_extract.py
 
-import os
 import streamlit as st
-from concurrent.futures import ThreadPoolExecutor
-from langchain_community.document_loaders import PyPDFLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-
-@st.cache_data
-def extract_paragraphs_from_pdf(file_content, file_id):
-    tmp_path = f"tmp_{file_id}.pdf"
+from pdf_extraction import iter_pdf_pages
+from extraction_cache import file_sha256, load_extraction, save_extraction
+from keyword_matcher import get_matcher
+from filing_sections import CORE_SECTIONS, SectionIndexer
+from chunk_dedupe import BoilerplateLineFilter, ChunkDeduplicator, dedupe_report
+from chunker import SectionAwareChunker, iter_filing_chunks
+from section3_summarizer import start_summary_precompute
+
+# === 关键词 & 切分参数 ===
+# 识别出 10-K 章节后只保留这些章节；文件中没有 Item 标题时回退到关键词过滤
+EXTRACT_SECTIONS = CORE_SECTIONS
+KEYWORDS = ["risk factors", "item 1a", "item 7", "management’s discussion", "footnotes", "note"]
+CHUNK_MAX_TOKENS = 300
+CHUNK_OVERLAP_TOKENS = 30
+
+
+def extract_filing(file_content, file_hash=None, max_workers=None, raise_errors=False):
+    """提取段落、页码及 10-K 章节索引；按文件 SHA-256 命中磁盘缓存时直接返回
+
+    返回 {"paragraphs", "page_map", "paragraph_sections", "sections", "fiscal_year", "dedupe_stats"}：
+    page_map[i] / paragraph_sections[i] 为第 i 段所在页码（从 0 开始）与章节 id，
+    sections 为 filing_sections.SectionIndexer 生成的章节索引，
+    dedupe_stats 为样板行 / 重复 chunk 的剔除统计（含节省的 token 数）。
+    max_workers 传给 iter_pdf_pages，批量并发处理多份文件时用来限制总进程数。
+    raise_errors=True 时提取 / 写缓存失败直接抛出异常而不是用 st.error / st.warning 提示
+    （工作线程中没有 Streamlit 上下文，提示会丢失），由调用方汇报。
+    """
+    file_hash = file_hash or file_sha256(file_content)
+    cached = load_extraction(file_hash)
+    if cached is not None:
+        return cached
+
+    indexer = SectionIndexer()
+    line_filter = BoilerplateLineFilter()
+    deduplicator = ChunkDeduplicator()
+
+    paragraphs, page_map, paragraph_sections = [], [], []
     try:
-        with open(tmp_path, "wb") as f:
-            f.write(file_content)
-
-        loader = PyPDFLoader(tmp_path)
-        all_pages = loader.load()
-
-        keywords = ["risk factors", "item 1a", "item 7", "management’s discussion", "footnotes", "note"]
-
-        def filter_doc(doc):
-            return any(kw.lower() in doc.page_content.lower() for kw in keywords)
-
-        with ThreadPoolExecutor() as executor:
-            filtered_results = list(executor.map(filter_doc, all_pages))
-        filtered_docs = [doc for doc, keep in zip(all_pages, filtered_results) if keep]
-
-        splitter = RecursiveCharacterTextSplitter(chunk_size=800, chunk_overlap=150)
-
-        def split_doc(doc):
-            try:
-                return splitter.split_text(doc.page_content)
-            except Exception as e:
-                st.warning(f"Error splitting document: {str(e)}")
-                return []
-
-        with ThreadPoolExecutor() as executor:
-            chunk_lists = list(executor.map(split_doc, filtered_docs))
-
-        all_chunks = [chunk for chunk_list in chunk_lists for chunk in chunk_list if chunk]
-
+        # 页面一解析出来就立即识别章节、切分、去重，无需等待整份文件解析完；
+        # 尚未出现任何 Item 标题（封面或非 10-K 文件）时按关键词过滤整页
+        chunks = iter_filing_chunks(
+            iter_pdf_pages(file_content, max_workers=max_workers),
+            indexer,
+            line_filter=line_filter,
+            deduplicator=deduplicator,
+            chunker=SectionAwareChunker(CHUNK_MAX_TOKENS, CHUNK_OVERLAP_TOKENS),
+            keep_sections=EXTRACT_SECTIONS,
+            page_filter=get_matcher(KEYWORDS).search
+        )
+        for chunk in chunks:
+            paragraphs.append(chunk.page_content)
+            page_map.append(chunk.metadata["page"])
+            paragraph_sections.append(chunk.metadata["section"])
     except Exception as e:
+        if raise_errors:
+            raise
         st.error(f"❌ Error processing PDF: {str(e)}")
-        return []
-    finally:
-        if os.path.exists(tmp_path):
-            try:
-                os.remove(tmp_path)
-            except Exception as e:
-                st.warning(f"Could not clean up temporary file: {str(e)}")
-
-    return all_chunks
+        return {"paragraphs": [], "page_map": [], "paragraph_sections": [], "sections": [], "fiscal_year": None,
+                "dedupe_stats": {}}
+
+    record = {
+        "paragraphs": paragraphs,
+        "page_map": page_map,
+        "paragraph_sections": paragraph_sections,
+        "sections": indexer.finish(),
+        "fiscal_year": indexer.fiscal_year,
+        "dedupe_stats": dedupe_report(deduplicator, line_filter),
+    }
+    if paragraphs:
+        try:
+            record = save_extraction(file_hash, record)
+        except OSError as e:
+            if raise_errors:
+                raise OSError(f"Could not write extraction cache: {e}") from e
+            st.warning(f"Could not write extraction cache: {str(e)}")
+    return record
+
+
+def extract_paragraphs_from_pdf(file_content, file_id=None):
+    """兼容旧接口：file_id 已忽略（旧调用方传的是 "文件名_大小"，不能作缓存键），始终按内容 SHA-256 缓存"""
+    return extract_filing(file_content)["paragraphs"]
 
 
 def handle_pdf_upload():
@@ -59,19 +91,43 @@ def handle_pdf_upload():
         st.session_state["last_uploaded_file_id"] = None
 
     if uploaded_file:
-        file_id = f"{uploaded_file.name}_{uploaded_file.size}"
+        file_content = uploaded_file.getvalue()
+        file_id = file_sha256(file_content)
         if st.session_state["last_uploaded_file_id"] != file_id:
             with st.spinner("📖 Reading PDF..."):
                 try:
-                    paragraphs = extract_paragraphs_from_pdf(uploaded_file.getvalue(), file_id)
+                    record = extract_filing(file_content, file_id)
+                    paragraphs = record["paragraphs"]
                     if not paragraphs:
                         st.error("❌ No paragraphs extracted.")
                     else:
                         st.session_state["paragraphs"] = paragraphs
+                        st.session_state["page_map"] = record["page_map"]
+                        st.session_state["paragraph_sections"] = record["paragraph_sections"]
+                        st.session_state["filing_sections"] = record["sections"]
                         st.session_state["last_uploaded_file_id"] = file_id
+                        st.session_state["uploaded_file"] = {
+                            "name": uploaded_file.name,
+                            "size": uploaded_file.size,
+                            "hash": file_id
+                        }
+                        # 两种风格的摘要立即在后台生成（已生成过的直接复用），摘要页无需等待
+                        for key in ("report_summary", "report_summary_stats", "report_summary_style"):
+                            st.session_state.pop(key, None)
+                        start_summary_precompute(file_id, paragraphs, record["paragraph_sections"])
                         st.success(f"✅ Extracted {len(paragraphs)} useful paragraphs.")
+                        stats = record.get("dedupe_stats") or {}
+                        if stats.get("total_tokens_saved"):
+                            st.caption(
+                                f"🧹 Removed {stats['exact_duplicates'] + stats['near_duplicates']} duplicate chunks "
+                                f"and repeated headers/footers (~{stats['total_tokens_saved']:,} tokens saved)."
+                            )
                 except Exception as e:
                     st.error(f"❌ Failed to extract: {str(e)}")
     else:
         st.session_state.pop("paragraphs", None)
+        st.session_state.pop("page_map", None)
+        st.session_state.pop("paragraph_sections", None)
+        st.session_state.pop("filing_sections", None)
         st.session_state.pop("last_uploaded_file_id", None)
+        st.session_state.pop("uploaded_file", None)
@@ -3,17 +3,25 @@
 import streamlit as st
 import bleach
 import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from langchain.prompts import ChatPromptTemplate
 from langchain.chat_models import ChatOpenAI
-from langchain_core.output_parsers import StrOutputParser
+from extraction_cache import EXTRACTION_CACHE_VERSION, load_summaries, save_summary
+from llm_streaming import stream_llm
+from map_reduce_summarizer import COMBINE_PROMPT_VERSION, MAP_PROMPT_VERSION, summary_content
 import time
 
 # === 常量定义 ===
-MAX_PARAGRAPHS = 30
+# 摘要覆盖全部核心章节（Item 1 / 1A / 7 / 7A / 8 及附注）：长文件先经 map_reduce_summarizer 并行提炼为笔记，再由下方模板生成最终摘要
 MODEL_NAME = "gpt-4o"
 TEMPERATURE = 0.1
 BEGINNER_TOKENS = 512
 PROFESSIONAL_TOKENS = 1024
+SUMMARY_PROMPT_VERSION = "v1"  # 修改下方模板时递增，使 llm_cache 和预生成的旧摘要失效
+SUMMARY_STYLES = ["🧠 Beginner-friendly Summary", "📊 Professional Summary"]
+PRECOMPUTE_WORKERS = 2         # 进程内同时预生成摘要的文件数
 
 # === 提示词模板 ===
 BEGINNER_PROMPT = """
@@ -46,19 +54,100 @@ def safe_markdown(text):
     cleaned = bleach.clean(text, tags=['div', 'h2', 'h4'], attributes={'div': ['style', 'class'], 'h2': ['style', 'class'], 'h4': ['style', 'class']})
     st.markdown(cleaned, unsafe_allow_html=True)
 
-def filter_relevant_paragraphs(paragraphs):
-    keywords = ["management's discussion", "risk factors", "financial condition"]
-    return [p for p in paragraphs if any(kw.lower() in p.lower() for kw in keywords)][:MAX_PARAGRAPHS]
-
-@st.cache_data
-def generate_summary(paragraphs, summary_mode):
-    prompt = ChatPromptTemplate.from_template(
-        BEGINNER_PROMPT if summary_mode == "Beginner-friendly Summary" else PROFESSIONAL_PROMPT
-    )
-    max_tokens = BEGINNER_TOKENS if summary_mode == "Beginner-friendly Summary" else PROFESSIONAL_TOKENS
-    full_text = "\n".join(paragraphs)
-    chain = prompt | ChatOpenAI(model=MODEL_NAME, temperature=TEMPERATURE, max_tokens=max_tokens) | StrOutputParser()
-    return chain.invoke({"content": full_text})
+def is_beginner_mode(summary_mode):
+    # 下拉框选项带 emoji 前缀（"🧠 Beginner-friendly Summary"）
+    return "Beginner-friendly" in summary_mode
+
+def stream_summary(content, summary_mode):
+    """content 为 summary_content() 的结果；逐段 yield 摘要文本（llm_cache 命中时一次性返回）"""
+    beginner = is_beginner_mode(summary_mode)
+    prompt = ChatPromptTemplate.from_template(BEGINNER_PROMPT if beginner else PROFESSIONAL_PROMPT)
+    max_tokens = BEGINNER_TOKENS if beginner else PROFESSIONAL_TOKENS
+    llm = ChatOpenAI(model=MODEL_NAME, temperature=TEMPERATURE, max_tokens=max_tokens)
+    return stream_llm(llm, prompt.format_prompt(content=content), prompt_version=SUMMARY_PROMPT_VERSION)
+
+def generate_summary(paragraphs, summary_mode, paragraph_sections=None):
+    content, _ = summary_content(paragraphs, paragraph_sections)
+    return "".join(stream_summary(content, summary_mode))
+
+# === 后台预生成：提取完成后立即为所有风格生成摘要，随文件保存（extraction_cache 中的 {hash}.summaries.json） ===
+# 摘要页直接读取，显示与切换风格都不等待 API；同一文件只会有一个预生成任务（多个会话上传同一文件时共用）
+_precompute_jobs = {}
+_precompute_lock = threading.RLock()
+
+@lru_cache(maxsize=1)
+def _precompute_executor():
+    # 进程级线程池，随进程存活
+    return ThreadPoolExecutor(max_workers=PRECOMPUTE_WORKERS, thread_name_prefix="summary-precompute")
+
+def _summary_versions():
+    # 摘要依赖的各处版本：最终摘要模板、map / reduce 笔记模板、段落提取（分块 / 章节识别）
+    return {"prompt_version": SUMMARY_PROMPT_VERSION, "map_prompt_version": MAP_PROMPT_VERSION,
+            "combine_prompt_version": COMBINE_PROMPT_VERSION, "extraction_version": EXTRACTION_CACHE_VERSION}
+
+def stored_summary(file_hash, summary_mode):
+    """预生成 / 之前生成的摘要 {"text", "stats", 各版本号}；没有或任一版本已更新时返回 None"""
+    summary = load_summaries(file_hash).get(summary_mode)
+    if summary is None or any(summary.get(key) != value for key, value in _summary_versions().items()):
+        return None
+    return summary
+
+def _store_summary(file_hash, summary_mode, text, stats):
+    save_summary(file_hash, summary_mode, {"text": text, "stats": stats, **_summary_versions()})
+
+def _precompute_summaries(file_hash, paragraphs, paragraph_sections):
+    missing = [style for style in SUMMARY_STYLES if stored_summary(file_hash, style) is None]
+    if not missing:
+        return
+    # map / reduce 只做一次，各风格的最终摘要并行生成
+    content, stats = summary_content(paragraphs, paragraph_sections)
+    with ThreadPoolExecutor(max_workers=len(missing)) as pool:
+        texts = pool.map(lambda style: "".join(stream_summary(content, style)), missing)
+        for style, text in zip(missing, texts):
+            _store_summary(file_hash, style, text, stats)
+
+def start_summary_precompute(file_hash, paragraphs, paragraph_sections=None):
+    """提交预生成任务（已有进行中的任务时直接返回它，上次失败时重新提交）；返回 Future"""
+    with _precompute_lock:
+        job = _precompute_jobs.get(file_hash)
+        if job is None or (job.done() and job.exception() is not None):
+            job = _precompute_executor().submit(_precompute_summaries, file_hash, paragraphs, paragraph_sections)
+            _precompute_jobs[file_hash] = job
+            job.add_done_callback(lambda f: _finish_precompute(file_hash, f))
+        return job
+
+def _finish_precompute(file_hash, job):
+    # 成功的任务不再保留（结果已写入磁盘）；失败的任务保留到页面显示过错误为止（见 _evict_precompute），
+    # 下次上传同一文件时重新提交
+    if job.exception() is None:
+        _evict_precompute(file_hash, job)
+
+def _evict_precompute(file_hash, job):
+    with _precompute_lock:
+        if _precompute_jobs.get(file_hash) is job:
+            del _precompute_jobs[file_hash]
+
+def precompute_job(file_hash):
+    with _precompute_lock:
+        return _precompute_jobs.get(file_hash)
+
+def wait_for_summary(file_hash, summary_mode):
+    """预生成任务进行中时等待它结束；返回已保存的摘要或 None（任务失败 / 未提交）"""
+    job = precompute_job(file_hash)
+    if job is not None:
+        try:
+            job.result()
+        except Exception:
+            pass
+    return stored_summary(file_hash, summary_mode)
+
+@st.fragment(run_every=2)
+def _precompute_progress(file_hash, summary_mode):
+    # 预生成进行中时每 2 秒检查一次，完成后刷新整页显示摘要
+    job = precompute_job(file_hash)
+    if stored_summary(file_hash, summary_mode) is not None or job is None or job.done():
+        st.rerun()
+    st.info("⏳ Preparing beginner-friendly and professional summaries in the background...")
 
 def render_summary_ui():
     st.markdown("""
@@ -78,7 +167,7 @@ def render_summary_ui():
     st.markdown("<div class='summary-selectbox'><label>🧠 Choose Summary Style</label></div>", unsafe_allow_html=True)
     summary_mode = st.selectbox(
         label="Choose Summary Style",
-        options=["🧠 Beginner-friendly Summary", "📊 Professional Summary"],
+        options=SUMMARY_STYLES,
         label_visibility="collapsed",
         key="summary_style_select"
     )
@@ -88,19 +177,52 @@ def render_summary_ui():
         st.warning("⚠️ No paragraphs found. Please upload a 10-K report first.")
         return
 
-    target_paras = filter_relevant_paragraphs(paragraphs)
+    file_hash = (st.session_state.get("uploaded_file") or {}).get("hash")
+    stored = stored_summary(file_hash, summary_mode) if file_hash else None
 
     if st.button("📝 Generate Summary"):
-        with st.spinner("Generating summary..."):
+        # 预生成任务进行中时等待其结果；没有预生成结果时现场生成：
+        # 长文件先并行提炼各部分要点（map / reduce），再逐 token 显示最终摘要；完成后由下方的摘要卡片替换
+        if stored is None and file_hash:
+            with st.spinner("⏳ Finishing the background summary..."):
+                stored = wait_for_summary(file_hash, summary_mode)
+        if stored is None:
+            live_output = st.empty()
             try:
-                summary_text = generate_summary(target_paras, summary_mode)
-                st.session_state["report_summary"] = summary_text
+                with live_output.container():
+                    with st.spinner("📚 Reading the core sections of the filing..."):
+                        content, stats = summary_content(paragraphs, st.session_state.get("paragraph_sections"))
+                    summary_text = st.write_stream(stream_summary(content, summary_mode))
+                stored = {"text": summary_text, "stats": stats}
+                if file_hash:
+                    _store_summary(file_hash, summary_mode, summary_text, stats)
             except Exception as e:
                 st.error(f"Failed to generate summary: {str(e)}")
-
-    if "report_summary" in st.session_state:
+            live_output.empty()
+
+    if stored is not None:
+        st.session_state["report_summary"] = stored["text"]
+        st.session_state["report_summary_stats"] = stored["stats"]
+        st.session_state["report_summary_style"] = summary_mode
+    elif file_hash and precompute_job(file_hash) is not None:
+        job = precompute_job(file_hash)
+        if not job.done():
+            _precompute_progress(file_hash, summary_mode)
+        elif job.exception() is not None:
+            # 错误只提示一次，之后释放任务（及其持有的段落）；点击 Generate Summary 会现场重新生成
+            _evict_precompute(file_hash, job)
+            st.warning(f"⚠️ Background summary failed: {job.exception()}. Click Generate Summary to retry.")
+
+    # 只显示当前所选风格的摘要
+    if st.session_state.get("report_summary_style", summary_mode) == summary_mode and "report_summary" in st.session_state:
         safe_markdown("<h4 class='summary-title'>📌 Summary Card</h4>")
         safe_markdown(f"<div class='summary-text'>{st.session_state['report_summary']}</div>")
+        stats = st.session_state.get("report_summary_stats")
+        if stats:
+            st.caption(f"📄 Covered {stats['paragraphs']} paragraphs ({stats['input_tokens']:,} tokens) · "
+                       f"{stats['map_calls']} parallel section calls, {stats['reduce_calls']} merge calls · "
+                       f"largest call {stats['max_call_tokens']:,} tokens"
+                       + (" · notes truncated to fit the prompt" if stats.get("truncated") else ""))
 
         if "suggest a chart" in st.session_state["report_summary"].lower():
             chart_data = {
@@ -1,13 +1,17 @@
 import streamlit as st
 from langchain.prompts import ChatPromptTemplate
 from langchain.chat_models import ChatOpenAI
-from langchain_core.output_parsers import StrOutputParser
+import time
 import uuid
 import re
 
+from llm_streaming import cached_response, stream_llm
+from semantic_cache import get_semantic_cache
+
 MODEL_NAME = "gpt-4o"
 TEMPERATURE = 0.3
 MAX_TOKENS = 1024
+GENERAL_QA_PROMPT_VERSION = "v1"  # 修改下方模板时递增，使 llm_cache 中的旧回答失效
 
 # ✅ 通用金融问题 Prompt 模板
 GENERAL_QA_TEMPLATES = {
@@ -23,11 +27,34 @@ Question: {question}
 """
 }
 
-@st.cache_data
-def answer_general_financial_question(question, style):
+def lookup_general_answer(question, style):
+    """语义缓存：同一风格下问过意思相同的问题时返回 SemanticHit（含原问题和相似度），否则 None"""
+    return get_semantic_cache().lookup(question, style, prompt_version=GENERAL_QA_PROMPT_VERSION)
+
+def stream_general_answer(question, style):
+    """逐段 yield 回答文本（llm_cache 命中时一次性返回）；新生成的回答完整结束后写入语义缓存"""
+    start = time.perf_counter()
     prompt = ChatPromptTemplate.from_template(GENERAL_QA_TEMPLATES[style])
-    chain = prompt | ChatOpenAI(model=MODEL_NAME, temperature=TEMPERATURE, max_tokens=MAX_TOKENS) | StrOutputParser()
-    return chain.invoke({"question": question})
+    llm = ChatOpenAI(model=MODEL_NAME, temperature=TEMPERATURE, max_tokens=MAX_TOKENS)
+    prompt_value = prompt.format_prompt(question=question)
+    cached = cached_response(llm, prompt_value, prompt_version=GENERAL_QA_PROMPT_VERSION)
+    if cached is not None:
+        # 同一问题已完整回答过，语义缓存中已有这一行，不重复写入
+        yield cached
+        return
+    parts = []
+    for text in stream_llm(llm, prompt_value, prompt_version=GENERAL_QA_PROMPT_VERSION):
+        parts.append(text)
+        yield text
+    if parts:
+        get_semantic_cache().add(question, style, "".join(parts), prompt_version=GENERAL_QA_PROMPT_VERSION,
+                                 elapsed=time.perf_counter() - start)
+
+def answer_general_financial_question(question, style):
+    hit = lookup_general_answer(question, style)
+    if hit is not None:
+        return hit.answer
+    return "".join(stream_general_answer(question, style))
 
 def highlight_keywords_general(answer):
     keywords = set(word.strip(".,()") for word in answer.split() if len(word) > 6)
@@ -74,20 +101,26 @@ def render_general_financial_qa():
             st.warning("Please enter a question.")
             return
 
-        with st.spinner("Thinking..."):
+        # 意思相同的问题问过时直接复用；否则生成过程中逐 token 显示，完成后由下方带关键词高亮的回答替换
+        live_output = st.empty()
+        with live_output.container():
             try:
-                answer = answer_general_financial_question(question, style)
+                hit = lookup_general_answer(question, style)
+                answer = hit.answer if hit is not None else st.write_stream(stream_general_answer(question, style))
                 answer_id = str(uuid.uuid4())[:8]
                 st.session_state["last_general_answer"] = {
                     "id": answer_id,
                     "question": question,
                     "style": style,
-                    "answer": answer
+                    "answer": answer,
+                    "matched_question": hit.question if hit is not None else None,
+                    "similarity": hit.similarity if hit is not None else None
                 }
                 st.session_state["general_qa_history"].insert(0, st.session_state["last_general_answer"])
             except Exception as e:
                 st.error(f"❌ Failed: {str(e)}")
                 return
+        live_output.empty()
 
     if "last_general_answer" in st.session_state:
         result = st.session_state["last_general_answer"]
@@ -97,6 +130,9 @@ def render_general_financial_qa():
         with col1:
             st.markdown(f"**📝 Question:** {result['question']}")
             st.markdown(f"**🎯 Style:** {result['style']}")
+            if result.get("matched_question"):
+                st.caption(f"⚡ Answered instantly from a similar question: “{result['matched_question']}” "
+                           f"(similarity {result['similarity']:.2f})")
         with col2:
             if st.button("⭐ Save to Favorites", key="save_" + result["id"]):
                 if "general_favorites" not in st.session_state:
@@ -107,6 +143,11 @@ def render_general_financial_qa():
         highlighted = highlight_keywords_general(result["answer"])
         st.markdown(f"<div style='line-height:1.7'>{highlighted}</div>", unsafe_allow_html=True)
 
+        stats = get_semantic_cache().stats()
+        st.caption(f"🧠 Semantic cache: {stats['entries']} answers, hit rate {stats['hit_rate']:.0%} "
+                   f"({stats['hits']}/{stats['hits'] + stats['misses']}), "
+                   f"avg {stats['avg_hit_ms'] or 0:.0f} ms on hit vs {stats['avg_miss_ms'] or 0:.0f} ms on miss")
+
     if st.toggle("📂 Show Past Questions", value=False):
         for idx, qa in enumerate(st.session_state["general_qa_history"][:3]):
             with st.expander(f"📌 {qa['question']} — {qa['style']}"):
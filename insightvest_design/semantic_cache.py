@@ -0,0 +1,236 @@
+# semantic_cache.py
+# 通用金融问答的语义缓存：措辞不同但意思相同的问题（"What is ROE?" / "Explain return on equity"）直接返回已有回答
+#
+# 问题先规范化（去掉功能词 / 口头语，展开常见财务缩写，保持词序与重复词）再做 embedding，与同一分区内的历史问题
+# 比较余弦相似度，超过阈值且方向一致才视为命中：embedding 对词序和 high / low 之类的反义词不敏感，
+# "ROE higher than ROA" 与 "ROA higher than ROE"、"high PEG" 与 "low PEG" 的向量几乎相同，
+# 因此还要求两问的方向词序列相同，含比较（than / vs）的问题要求规范化后的词序完全一致。分区键为 (回答风格, prompt 版本, embedding 模型)：不同风格的回答互不复用，
+# 修改 prompt 模板后旧回答自动失效，不同 embedding 模型的向量不会混在一起比较。
+# 存储为 SQLite（WAL 模式，与 llm_cache 共用 TTL 设置），各进程写入的问答在下一次查询时增量载入内存矩阵。
+
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+
+import numpy as np
+
+from bm25_index import query_terms
+from embedding_backends import default_backend, get_embeddings
+from llm_cache import DEFAULT_TTL_HOURS, TTL_ENV
+
+SEMANTIC_CACHE_PATH = "cache/semantic_qa.sqlite"
+THRESHOLD_ENV = "INSIGHTVEST_SEMANTIC_CACHE_THRESHOLD"
+# 命中阈值（规范化问题的余弦相似度）：哈希词袋只认几乎相同的检索词，transformer / OpenAI 向量可放宽
+DEFAULT_THRESHOLDS = {"openai": 0.92, "local": 0.88, "hashing": 0.9}
+MAX_CANDIDATES = 3
+
+# 问句里不影响语义的口头语（bm25_index 的功能词之外）
+_FILLER_WORDS = frozenset(
+    "explain define definition meaning mean means tell me can could would you please i s whats "
+    "briefly simple simply terms".split()
+)
+# 方向 / 极性词：两问在这些词上不一致时不复用回答（规范化时同样保留）
+POLARITY_WORDS = frozenset(
+    "high higher highest low lower lowest increase increases increasing decrease decreases decreasing rise rises "
+    "rising fall falls falling up down more less most least better worse good bad positive negative above below "
+    "over under gain loss growth decline strong weak overvalued undervalued long short buy sell not no without".split()
+)
+COMPARISON_WORDS = frozenset("than vs versus compared compare between".split())
+# 常见财务缩写 → 全称（两种写法规范化为同一组检索词）
+FINANCE_ABBREVIATIONS = {
+    "roe": "return on equity",
+    "roa": "return on assets",
+    "roic": "return on invested capital",
+    "eps": "earnings per share",
+    "pe": "price earnings",
+    "peg": "price earnings growth",
+    "fcf": "free cash flow",
+    "ebitda": "earnings before interest taxes depreciation amortization",
+    "ebit": "earnings before interest taxes",
+    "cagr": "compound annual growth rate",
+    "dcf": "discounted cash flow",
+    "wacc": "weighted average cost of capital",
+    "capex": "capital expenditures",
+    "etf": "exchange traded fund",
+    "ipo": "initial public offering",
+}
+
+
+def normalize_question(question):
+    """"What does ROE mean?" → "return equity"（小写、去功能词、展开缩写；保持词序，不去重）"""
+    terms = []
+    for token in question.lower().split():
+        for word in query_terms(token):
+            if word in _FILLER_WORDS:
+                continue
+            terms.extend(query_terms(FINANCE_ABBREVIATIONS.get(word, word)))
+    return " ".join(terms) or question.strip().lower()
+
+
+def same_direction(question, cached_question):
+    """两问的方向词序列相同；含比较时规范化后的词序也须一致（向量相似度之外的命中条件）"""
+    a, b = normalize_question(question).split(), normalize_question(cached_question).split()
+    if [t for t in a if t in POLARITY_WORDS] != [t for t in b if t in POLARITY_WORDS]:
+        return False
+    if COMPARISON_WORDS.intersection(a) or COMPARISON_WORDS.intersection(b):
+        return a == b
+    return True
+
+
+@dataclass
+class SemanticHit:
+    question: str        # 命中的历史问题（原始措辞）
+    answer: str
+    similarity: float
+
+
+class _Partition:
+    """一个分区的内存副本：L2 归一化后的问题向量矩阵 + 对应行号"""
+
+    def __init__(self):
+        self.row_ids = []
+        self.vectors = None
+        self.last_id = 0
+
+
+class SemanticCache:
+    """hits / misses / 耗时为本进程的计数"""
+
+    def __init__(self, path=SEMANTIC_CACHE_PATH, embeddings=None, threshold=None, ttl_seconds=None):
+        if embeddings is None:
+            embeddings, model = get_embeddings()
+            backend = default_backend()
+        else:
+            model = getattr(embeddings, "model_name", None) or getattr(embeddings, "model", type(embeddings).__name__)
+            backend = None
+        if threshold is None:
+            threshold = float(os.getenv(THRESHOLD_ENV, DEFAULT_THRESHOLDS.get(backend, 0.9)))
+        if ttl_seconds is None:
+            ttl_seconds = float(os.getenv(TTL_ENV, DEFAULT_TTL_HOURS)) * 3600
+        self.path = path
+        self.embeddings = embeddings
+        self.model = str(model)
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._partitions = {}
+        self.hits = self.misses = 0
+        self.hit_seconds = self.miss_seconds = 0.0
+        self._timed_misses = 0
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS qa (
+                    id INTEGER PRIMARY KEY,
+                    style TEXT NOT NULL,
+                    prompt_version TEXT,
+                    model TEXT NOT NULL,
+                    question TEXT NOT NULL,
+                    answer TEXT NOT NULL,
+                    vector BLOB NOT NULL,
+                    created_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_qa_partition ON qa (style, prompt_version, model, id)")
+        self.evict()
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _embed(self, question):
+        vector = np.asarray(self.embeddings.embed_query(normalize_question(question)), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _refresh(self, style, prompt_version):
+        """载入其他进程 / 线程新写入的行；调用方持有 self._lock"""
+        key = (style, prompt_version)
+        partition = self._partitions.setdefault(key, _Partition())
+        rows = self._connect().execute(
+            "SELECT id, vector FROM qa WHERE style = ? AND prompt_version IS ? AND model = ? AND id > ? ORDER BY id",
+            (style, prompt_version, self.model, partition.last_id)
+        ).fetchall()
+        if rows:
+            new = np.stack([np.frombuffer(blob, dtype=np.float32) for _, blob in rows])
+            partition.vectors = new if partition.vectors is None else np.vstack([partition.vectors, new])
+            partition.row_ids.extend(row_id for row_id, _ in rows)
+            partition.last_id = rows[-1][0]
+        return partition
+
+    def lookup(self, question, style, prompt_version=None):
+        """返回超过阈值、方向一致的最相似问答 SemanticHit，否则 None（超过阈值的候选最多检查 MAX_CANDIDATES 个）"""
+        start = time.perf_counter()
+        vector = self._embed(question)
+        candidates = []
+        with self._lock:
+            partition = self._refresh(style, prompt_version)
+            if partition.vectors is not None and vector.shape[0] == partition.vectors.shape[1]:
+                similarities = partition.vectors @ vector
+                for i in np.argsort(-similarities)[:MAX_CANDIDATES]:
+                    if similarities[i] < self.threshold:
+                        break
+                    candidates.append((partition.row_ids[i], float(similarities[i])))
+        hit = None
+        for row_id, similarity in candidates:
+            row = self._connect().execute("SELECT question, answer, created_at FROM qa WHERE id = ?",
+                                          (row_id,)).fetchone()
+            if row is not None and time.time() - row[2] <= self.ttl_seconds and same_direction(question, row[0]):
+                hit = SemanticHit(question=row[0], answer=row[1], similarity=similarity)
+                break
+        with self._lock:
+            if hit is not None:
+                self.hits += 1
+                self.hit_seconds += time.perf_counter() - start
+            else:
+                self.misses += 1
+        return hit
+
+    def add(self, question, style, answer, prompt_version=None, elapsed=None):
+        """写入一条新问答；elapsed 为未命中时从查询到完整回答的耗时（含 LLM 调用），计入 avg_miss_ms"""
+        if elapsed is not None:
+            with self._lock:
+                self.miss_seconds += elapsed
+                self._timed_misses += 1
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO qa (style, prompt_version, model, question, answer, vector, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (style, prompt_version, self.model, question, answer, self._embed(question).tobytes(), time.time())
+            )
+
+    def evict(self):
+        """删除过期问答，返回删除的条数（内存矩阵在下次重建时同步）"""
+        with self._connect() as conn:
+            removed = conn.execute("DELETE FROM qa WHERE created_at < ?",
+                                   (time.time() - self.ttl_seconds,)).rowcount
+        if removed:
+            with self._lock:
+                self._partitions.clear()
+        return removed
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": self._connect().execute("SELECT COUNT(*) FROM qa WHERE model = ?", (self.model,)).fetchone()[0],
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "avg_hit_ms": round(self.hit_seconds / self.hits * 1000, 1) if self.hits else None,
+            "avg_miss_ms": round(self.miss_seconds / self._timed_misses * 1000, 1) if self._timed_misses else None,
+            "threshold": self.threshold,
+        }
+
+
+@lru_cache(maxsize=1)
+def get_semantic_cache():
+    return SemanticCache()
@@ -0,0 +1,170 @@
+# sqlite_docstore.py
+# 向量库 docstore 的磁盘格式：SQLite 表 chunks(position, id, text, metadata)，按需逐条读取
+# 代替 LangChain 默认的 index.pkl（加载时需把全部 chunk 反序列化进内存）；同一文件内附带 BM25 关键词索引
+
+import json
+import os
+import sqlite3
+import threading
+from collections.abc import Mapping
+from typing import Union
+
+from langchain_community.docstore.base import Docstore
+from langchain_core.documents import Document
+
+from bm25_index import FTS_TABLE, create_text_index, match_expression
+
+DOCSTORE_FILE = "docstore.sqlite"
+# 写成独立列并建索引的 metadata 字段，用于检索前的候选集过滤
+FILTER_FIELDS = ("ticker", "year", "section", "page", "doc_id")
+
+
+def write_docstore(path, vectorstore):
+    """按索引位置顺序写出 vectorstore 的全部 chunk（position 即 FAISS 内部序号）"""
+    conn = sqlite3.connect(path)
+    try:
+        write_chunks(conn, vectorstore)
+    finally:
+        conn.close()
+
+
+def write_chunks(conn, vectorstore):
+    """在 conn 中建立 chunks 表、metadata 列索引和 BM25 倒排索引"""
+    conn.execute("""
+        CREATE TABLE chunks (
+            position INTEGER PRIMARY KEY,
+            id TEXT NOT NULL UNIQUE,
+            text TEXT NOT NULL,
+            metadata TEXT NOT NULL,
+            ticker TEXT,
+            year INTEGER,
+            section TEXT,
+            page INTEGER,
+            doc_id TEXT
+        )
+    """)
+    rows = []
+    for position in range(vectorstore.index.ntotal):
+        _id = vectorstore.index_to_docstore_id[position]
+        doc = vectorstore.docstore.search(_id)
+        rows.append((position, _id, doc.page_content, json.dumps(doc.metadata),
+                     *(doc.metadata.get(field) for field in FILTER_FIELDS)))
+    conn.executemany(f"INSERT INTO chunks VALUES (?, ?, ?, ?, {', '.join('?' * len(FILTER_FIELDS))})", rows)
+    conn.execute("CREATE INDEX idx_chunks_ticker_year_section ON chunks (ticker, year, section)")
+    conn.execute("CREATE INDEX idx_chunks_year ON chunks (year)")
+    conn.execute("CREATE INDEX idx_chunks_section ON chunks (section)")
+    conn.execute("CREATE INDEX idx_chunks_doc_id ON chunks (doc_id)")
+    create_text_index(conn)
+    conn.commit()
+
+
+class SQLiteDocstore(Docstore):
+    """只读 docstore：版本目录写出后不再修改，以 immutable 模式打开（无锁、多进程共享页缓存）
+
+    每个线程使用独立连接（Streamlit 各会话在不同线程中查询）。
+    """
+
+    def __init__(self, path):
+        if not os.path.exists(path):
+            raise FileNotFoundError(path)
+        self.path = path
+        self._local = threading.local()
+        self.id_map = _PositionIdMap(self)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(f"file:{os.path.abspath(self.path)}?mode=ro&immutable=1", uri=True,
+                                   check_same_thread=False)
+            self._local.conn = conn
+        return conn
+
+    def search(self, search: str) -> Union[str, Document]:
+        row = self._conn().execute("SELECT text, metadata FROM chunks WHERE id = ?", (search,)).fetchone()
+        if row is None:
+            return f"ID {search} not found."
+        return Document(page_content=row[0], metadata=json.loads(row[1]))
+
+    def delete(self, ids):
+        raise NotImplementedError("SQLiteDocstore is read-only; load the store with mmap=False to modify it")
+
+    @property
+    def has_filter_columns(self):
+        """040 版本写出的 docstore 没有 metadata 列"""
+        columns = {row[1] for row in self._conn().execute("PRAGMA table_info(chunks)")}
+        return set(FILTER_FIELDS) <= columns
+
+    @property
+    def has_text_index(self):
+        """041 及更早版本写出的 docstore 没有 BM25 索引"""
+        return self._conn().execute("SELECT 1 FROM sqlite_master WHERE name = ?", (FTS_TABLE,)).fetchone() is not None
+
+    def filter_positions(self, conditions):
+        """conditions: [(字段, [取值...])]，字段间为 AND、取值间为 OR；返回升序的 position 列表"""
+        clauses, params = filter_clauses(conditions)
+        sql = "SELECT position FROM chunks" + (f" WHERE {' AND '.join(clauses)}" if clauses else "")
+        return [row[0] for row in self._conn().execute(sql + " ORDER BY position", params)]
+
+    def text_search(self, query, k, conditions=()):
+        return text_search(self._conn(), query, k, conditions)
+
+    def distinct_values(self, field):
+        if field not in FILTER_FIELDS:
+            raise ValueError(f"Unknown filter field {field!r}")
+        return [row[0] for row in self._conn().execute(
+            f"SELECT DISTINCT {field} FROM chunks WHERE {field} IS NOT NULL ORDER BY {field}")]
+
+    def items(self):
+        """按 position 顺序 yield (id, Document)"""
+        for _id, text, metadata in self._conn().execute("SELECT id, text, metadata FROM chunks ORDER BY position"):
+            yield _id, Document(page_content=text, metadata=json.loads(metadata))
+
+
+def filter_clauses(conditions):
+    """[(字段, [取值...])] → (["字段 IN (?, ...)"], 参数)；字段必须在 FILTER_FIELDS 中"""
+    clauses, params = [], []
+    for field, values in conditions:
+        if field not in FILTER_FIELDS:
+            raise ValueError(f"Cannot filter on {field!r}; filterable fields: {FILTER_FIELDS}")
+        clauses.append(f"chunks.{field} IN ({', '.join('?' * len(values))})")
+        params.extend(values)
+    return clauses, params
+
+
+def text_search(conn, query, k, conditions=()):
+    """BM25 检索：返回 [(position, BM25 分数)]，分数越高越相关；conditions 同 filter_positions"""
+    expression = match_expression(query)
+    if not expression:
+        return []
+    clauses, params = filter_clauses(conditions)
+    # 没有 metadata 条件时不 join chunks 表（join 会让 FTS5 无法直接按 rank 取前 k 个）
+    join = f"JOIN chunks ON chunks.position = {FTS_TABLE}.rowid " if clauses else ""
+    sql = (f"SELECT {FTS_TABLE}.rowid, bm25({FTS_TABLE}) AS rank FROM {FTS_TABLE} {join}"
+           f"WHERE {' AND '.join([f'{FTS_TABLE} MATCH ?'] + clauses)} ORDER BY rank LIMIT ?")
+    # FTS5 的 bm25() 越小越相关，取负后与常规 BM25 分数同向
+    return [(position, -rank) for position, rank in conn.execute(sql, [expression, *params, k])]
+
+
+class _PositionIdMap(Mapping):
+    """FAISS 内部序号 → docstore id；代替 LangChain 加载时整体反序列化的 dict"""
+
+    def __init__(self, docstore):
+        self._docstore = docstore
+        self._len = None
+
+    def __getitem__(self, position):
+        row = self._docstore._conn().execute("SELECT id FROM chunks WHERE position = ?", (int(position),)).fetchone()
+        if row is None:
+            raise KeyError(position)
+        return row[0]
+
+    def __len__(self):
+        if self._len is None:
+            self._len = self._docstore._conn().execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+        return self._len
+
+    def __iter__(self):
+        return iter(range(len(self)))
+
+    def values(self):
+        return [row[0] for row in self._docstore._conn().execute("SELECT id FROM chunks ORDER BY position")]
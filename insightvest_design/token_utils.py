@@ -0,0 +1,32 @@
+# token_utils.py
+# 模型 token 计数：优先使用 tiktoken（OpenAI 模型的真实分词），不可用时按 4 字符 ≈ 1 token 估算
+
+from functools import lru_cache
+
+DEFAULT_ENCODING = "cl100k_base"  # gpt-4o 之前的 GPT-4 / text-embedding-* 系列
+
+
+@lru_cache(maxsize=4)
+def _get_encoding(name):
+    try:
+        import tiktoken
+        return tiktoken.get_encoding(name)
+    except Exception:
+        # 未安装，或离线环境下无法下载 BPE 文件
+        return None
+
+
+def count_tokens(text, encoding=DEFAULT_ENCODING):
+    enc = _get_encoding(encoding)
+    if enc is None:
+        return max(1, len(text) // 4) if text else 0
+    return len(enc.encode(text, disallowed_special=()))
+
+
+def truncate_tokens(text, max_tokens, encoding=DEFAULT_ENCODING):
+    """截断到不超过 max_tokens 个 token（无 tiktoken 时按 4 字符/token 估算）"""
+    enc = _get_encoding(encoding)
+    if enc is None:
+        return text[:max_tokens * 4]
+    tokens = enc.encode(text, disallowed_special=())
+    return text if len(tokens) <= max_tokens else enc.decode(tokens[:max_tokens])
@@ -0,0 +1,145 @@
+# vectorstore_registry.py
+# 进程级向量库注册表：同一向量库在一个进程内只加载一次，由所有 Streamlit 会话共享
+# 使用引用计数（lease）防止正在查询的库被卸载；超出内存预算时按 LRU 卸载空闲的库
+
+import contextlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from functools import lru_cache
+
+from vectorstore_storage import current_dir
+
+MEMORY_BUDGET_ENV = "INSIGHTVEST_VECTORSTORE_BUDGET_MB"
+DEFAULT_MEMORY_BUDGET_MB = 2048
+
+
+def store_footprint(version_dir):
+    """按版本目录的文件大小估算常驻内存（索引 + docstore）"""
+    total = 0
+    for name in os.listdir(version_dir):
+        path = os.path.join(version_dir, name)
+        if os.path.isfile(path):
+            total += os.path.getsize(path)
+    return total
+
+
+class _Entry:
+    __slots__ = ("key", "vectorstore", "size", "refs", "loaded_at", "last_used")
+
+    def __init__(self, key, vectorstore, size):
+        self.key = key
+        self.vectorstore = vectorstore
+        self.size = size
+        self.refs = 0
+        self.loaded_at = self.last_used = time.time()
+
+
+class VectorstoreRegistry:
+    """按 (向量库路径, 当前版本) 缓存已加载的向量库
+
+    向量库追加 / 压缩后 CURRENT 指向新版本，下一次 lease 自动加载新版本；
+    旧版本在最后一个使用者释放后立即卸载。所有库都在使用中时允许暂时超出预算。
+    """
+
+    def __init__(self, memory_budget_bytes=None, loader=None):
+        if memory_budget_bytes is None:
+            memory_budget_bytes = int(os.getenv(MEMORY_BUDGET_ENV, DEFAULT_MEMORY_BUDGET_MB)) * 1024 * 1024
+        if loader is None:
+            from rag_vectorstore import load_vectorstore as loader
+        self.memory_budget_bytes = memory_budget_bytes
+        self._loader = loader
+        self._entries = OrderedDict()   # LRU 顺序：最早使用的在前
+        self._loading = {}              # key -> Future，避免多个会话同时加载同一个库
+        self._lock = threading.Lock()
+        self.hits = self.loads = self.evictions = 0
+
+    @contextlib.contextmanager
+    def lease(self, path):
+        """with registry.lease("mycompany.faiss") as vectorstore: ..."""
+        entry = self.acquire(path)
+        try:
+            yield entry.vectorstore
+        finally:
+            self.release(entry)
+
+    def acquire(self, path):
+        key = (os.path.realpath(path), os.path.basename(current_dir(path)))
+        while True:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self._entries.move_to_end(key)
+                    entry.refs += 1
+                    entry.last_used = time.time()
+                    self.hits += 1
+                    return entry
+                pending = self._loading.get(key)
+                if pending is None:
+                    pending = self._loading[key] = Future()
+                    break
+            # 其他会话正在加载同一版本：等待后重试
+            pending.result()
+
+        try:
+            vectorstore = self._loader(path)
+            entry = _Entry(key, vectorstore, store_footprint(current_dir(path)))
+        except BaseException as e:
+            with self._lock:
+                del self._loading[key]
+            pending.set_exception(e)
+            raise
+        with self._lock:
+            entry.refs = 1
+            self._entries[key] = entry
+            self.loads += 1
+            del self._loading[key]
+            self._evict()
+        pending.set_result(None)
+        return entry
+
+    def release(self, entry):
+        with self._lock:
+            entry.refs -= 1
+            self._evict()
+
+    def _evict(self):
+        """调用方持有锁：先卸载被新版本取代的旧版本，再按 LRU 卸载到预算以内"""
+        latest = {}
+        for path, version in self._entries:
+            latest[path] = max(latest.get(path, version), version)
+        for key in [k for k, e in self._entries.items() if e.refs == 0 and k[1] != latest[k[0]]]:
+            self._drop(key)
+
+        total = sum(e.size for e in self._entries.values())
+        for key in list(self._entries):
+            if total <= self.memory_budget_bytes:
+                break
+            entry = self._entries[key]
+            if entry.refs == 0:
+                total -= entry.size
+                self._drop(key)
+
+    def _drop(self, key):
+        del self._entries[key]
+        self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "stores": [{"path": path, "version": version, "size_mb": round(e.size / 1e6, 1), "refs": e.refs}
+                           for (path, version), e in self._entries.items()],
+                "used_mb": round(sum(e.size for e in self._entries.values()) / 1e6, 1),
+                "budget_mb": round(self.memory_budget_bytes / 1e6, 1),
+                "hits": self.hits,
+                "loads": self.loads,
+                "evictions": self.evictions,
+            }
+
+
+@lru_cache(maxsize=1)
+def get_registry():
+    """进程内唯一的注册表（Streamlit 的所有会话运行在同一进程中）"""
+    return VectorstoreRegistry()
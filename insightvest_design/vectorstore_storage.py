@@ -0,0 +1,174 @@
+# vectorstore_storage.py
+# 向量库磁盘布局：每次保存写入一个新的版本目录，再原子替换 CURRENT 指针文件
+#
+#   mycompany.faiss/
+#     CURRENT              -> "v000003"
+#     v000003/index.faiss, docstore.sqlite, manifest.json
+#
+# 读者总是看到一个完整的版本；写入中途崩溃只会留下未被引用的临时目录。
+# 版本目录写出后不再修改，因此 index.faiss 可以 mmap、docstore.sqlite 以 immutable 模式打开，
+# 冷启动只需毫秒级，多个 worker 进程共享操作系统页缓存。
+# 旧格式（index.pkl，或文件直接位于目录下的旧布局）仍可读取，下次保存时迁移。
+
+import contextlib
+import json
+import os
+import shutil
+import time
+import uuid
+
+import faiss
+
+from sqlite_docstore import DOCSTORE_FILE, write_docstore
+
+MANIFEST_FILE = "manifest.json"
+CURRENT_FILE = "CURRENT"
+LOCK_FILE = ".lock"
+INDEX_FILE = "index.faiss"
+STORE_FORMAT = 2            # 1: LangChain save_local（index.pkl）；2: index.faiss + docstore.sqlite
+KEEP_VERSIONS = 2           # 保留最近的版本；仍被查询进程持有的更早版本也不删除（见 hold_version）
+LEASE_FILE = ".lease"       # 版本目录内的锁文件：查询进程持共享锁，prune_versions 试加排他锁判断是否仍在使用
+LEGACY_BACKEND = "openai"   # 没有 manifest 的旧向量库均由 OpenAIEmbeddings 构建
+_LEGACY_FILES = ("index.faiss", "index.pkl", MANIFEST_FILE)
+
+try:
+    import fcntl
+except ImportError:  # Windows：不做跨进程加锁
+    fcntl = None
+
+
+def current_dir(path):
+    """当前版本所在目录；旧布局返回 path 本身"""
+    pointer = os.path.join(path, CURRENT_FILE)
+    if os.path.exists(pointer):
+        with open(pointer, "r", encoding="utf-8") as f:
+            return os.path.join(path, f.read().strip())
+    return path
+
+
+def store_exists(path):
+    return os.path.exists(os.path.join(current_dir(path), INDEX_FILE))
+
+
+def list_stores(root="."):
+    """root 下的所有向量库目录（按名称排序）"""
+    return sorted(name for name in os.listdir(root)
+                  if os.path.isdir(os.path.join(root, name)) and store_exists(os.path.join(root, name)))
+
+
+def read_index(version_dir, mmap=True):
+    """读取 FAISS 索引；mmap=True 时向量 / 倒排表留在磁盘上按需换入（只读）"""
+    index_path = os.path.join(version_dir, INDEX_FILE)
+    if mmap:
+        # IO_FLAG_MMAP_IFC（faiss ≥ 1.9）覆盖 flat / HNSW / IVF 各类编码；更早的版本只支持 IVF 倒排表
+        flags = faiss.IO_FLAG_READ_ONLY | getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP)
+        try:
+            return faiss.read_index(index_path, flags)
+        except RuntimeError:
+            pass
+    return faiss.read_index(index_path)
+
+
+def read_manifest(path):
+    manifest_path = os.path.join(current_dir(path), MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        return {"embedding_backend": LEGACY_BACKEND}
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _versions(path):
+    return sorted(name for name in os.listdir(path) if name.startswith("v") and name[1:].isdigit())
+
+
+def save_version(path, vectorstore, manifest):
+    """写入新版本并原子切换 CURRENT；返回版本目录名"""
+    os.makedirs(path, exist_ok=True)
+    versions = _versions(path)
+    version = f"v{int(versions[-1][1:]) + 1 if versions else 1:06d}"
+    tmp_dir = os.path.join(path, f".tmp-{uuid.uuid4().hex}")
+    try:
+        os.makedirs(tmp_dir)
+        faiss.write_index(vectorstore.index, os.path.join(tmp_dir, INDEX_FILE))
+        write_docstore(os.path.join(tmp_dir, DOCSTORE_FILE), vectorstore)
+        manifest = dict(manifest, format=STORE_FORMAT, version=version, saved_at=time.strftime("%Y-%m-%dT%H:%M:%S"))
+        with open(os.path.join(tmp_dir, MANIFEST_FILE), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        os.rename(tmp_dir, os.path.join(path, version))
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    pointer_tmp = os.path.join(path, f"{CURRENT_FILE}.{uuid.uuid4().hex}")
+    with open(pointer_tmp, "w", encoding="utf-8") as f:
+        f.write(version)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(pointer_tmp, os.path.join(path, CURRENT_FILE))
+
+    for name in _LEGACY_FILES:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(os.path.join(path, name))
+    prune_versions(path)
+    return version
+
+
+def hold_version(version_dir):
+    """对版本目录加共享锁，返回需与向量库同生命周期保存的文件对象（关闭或被回收时释放）
+
+    mmap 加载的向量库按需读取 index.faiss / docstore.sqlite，SQLiteDocstore 还会在新线程中重新打开文件，
+    目录被删除后查询会失败；持有期间 prune_versions 跳过该版本（任意进程）。不支持 flock 或目录只读时返回 None。
+    """
+    if fcntl is None:
+        return None
+    try:
+        f = open(os.path.join(version_dir, LEASE_FILE), "a")
+    except OSError:
+        return None
+    fcntl.flock(f.fileno(), fcntl.LOCK_SH)
+    return f
+
+
+def _version_in_use(version_dir):
+    if fcntl is None:
+        return False
+    try:
+        f = open(os.path.join(version_dir, LEASE_FILE), "a")
+    except OSError:
+        return False
+    with f:
+        try:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            return True
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+        return False
+
+
+def prune_versions(path, keep=KEEP_VERSIONS):
+    """删除较早的版本目录和遗留的临时目录，返回删除的数量；仍被持有的版本留到下次保存时再删"""
+    current = os.path.basename(current_dir(path))
+    removed = 0
+    for name in _versions(path)[:-keep] if keep else _versions(path):
+        if name != current and not _version_in_use(os.path.join(path, name)):
+            shutil.rmtree(os.path.join(path, name), ignore_errors=True)
+            removed += 1
+    for name in os.listdir(path):
+        if name.startswith(".tmp-"):
+            shutil.rmtree(os.path.join(path, name), ignore_errors=True)
+            removed += 1
+    return removed
+
+
+@contextlib.contextmanager
+def store_lock(path):
+    """同一向量库的写操作（追加 / 删除 / 压缩）串行执行，读取不加锁"""
+    os.makedirs(path, exist_ok=True)
+    with open(os.path.join(path, LOCK_FILE), "a") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)